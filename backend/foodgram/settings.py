@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'recipes.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,6 +94,15 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -148,6 +158,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_RENDERER_CLASSES': [
+        'recipes.renderers.ORJSONRenderer',
+        'recipes.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'recipes.parsers.ORJSONParser',
+        'recipes.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -168,3 +189,45 @@ DJOSER = {
 AUTH_USER_MODEL = 'users.User'
 
 RECIPES_LIMIT = 10
+
+RECIPE_FRAGMENT_TIMEOUT = int(os.getenv(
+    'RECIPE_FRAGMENT_TIMEOUT', 24 * 60 * 60))
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+
+# Сколько новейших совпадений поиска ранжируется (см. recipes.search).
+SEARCH_RESULTS_LIMIT = int(os.getenv('SEARCH_RESULTS_LIMIT', 1000))
+
+SIMILAR_RECIPES_TOP_K = 10
+
+# Память процесса под битовые множества редких ингредиентов из недавних
+# запросов «что приготовить» (см. recipes.pantry).
+PANTRY_CACHE_SIZE = int(os.getenv('PANTRY_CACHE_SIZE', 32 * 1024 * 1024))
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (400, 400),
+    'detail': (1200, 1200),
+}
+RECIPE_IMAGE_FORMATS = ('webp', 'jpeg')
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv(
+    'RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv(
+    'RECIPE_IMAGE_MAX_PIXELS', 25 * 1000 * 1000))
+# Картинка в base64 и остальные поля рецепта.
+RECIPE_REQUEST_MAX_SIZE = RECIPE_IMAGE_MAX_SIZE * 4 // 3 + 64 * 1024
+# Загружаемые файлы больше этого размера пишутся во временные файлы.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+TRENDING_HALF_LIFE = int(os.getenv('TRENDING_HALF_LIFE', 24 * 60 * 60))
+
+# Ответы меньше этого размера отдаются без сжатия.
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv(
+    'RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+INGREDIENTS_AUTOCOMPLETE_LIMIT = 20
+INGREDIENTS_AUTOCOMPLETE_IN_MEMORY = strtobool(
+    os.getenv('INGREDIENTS_AUTOCOMPLETE_IN_MEMORY', default='True'))
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db import transaction
 
+from . import cart_totals, search
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, RecipeTag,
                      ShoppingCart, Tag)
 
@@ -23,12 +25,16 @@ class RecipeTagsInline(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Параметры админ зоны рецептов."""
-    list_display = ('pk', 'name', 'author', 'favorite')
+    list_display = ('pk', 'name', 'author', 'favorites_count')
     list_filter = ('name', 'author', 'tags')
     inlines = (RecipeIngredientsInline, RecipeTagsInline)
 
-    def favorite(self, obj):
-        return obj.favorite.all().count()
+    def save_related(self, request, form, formsets, change):
+        old_amounts = cart_totals.recipe_amounts(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        cart_totals.recipe_ingredients_changed(form.instance.pk, old_amounts)
+        search.update_search_vectors(
+            Recipe.objects.filter(pk=form.instance.pk))
 
 
 @admin.register(Ingredient)
@@ -48,10 +54,28 @@ class TagAdmin(admin.ModelAdmin):
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     """Параметры админ зоны избранных рецептов."""
-    list_display = ('pk', 'user', 'recipe')
+    list_display = ('pk', 'user', 'recipe', 'created')
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
-    """Параметры админ зоны продуктовой корзины."""
-    list_display = ('pk', 'user', 'recipe')
+    """Параметры админ зоны продуктовой корзины.
+    Итоги корзин затронутых пользователей пересчитываются целиком."""
+    list_display = ('pk', 'user', 'recipe', 'created')
+
+    def save_model(self, request, obj, form, change):
+        user_ids = {obj.user_id}
+        if change:
+            user_ids.add(ShoppingCart.objects.get(pk=obj.pk).user_id)
+        super().save_model(request, obj, form, change)
+        cart_totals.rebuild(user_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        cart_totals.rebuild([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            user_ids = set(queryset.values_list('user_id', flat=True))
+            super().delete_queryset(request, queryset)
+            cart_totals.rebuild(user_ids)
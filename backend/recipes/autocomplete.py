@@ -0,0 +1,169 @@
+from bisect import bisect_left
+from itertools import islice
+from threading import Lock
+
+from django.conf import settings
+
+from .models import Ingredient
+from .utils import normalize_name
+from .versions import get_version
+
+PREFIX, WORD_PREFIX, SUBSTRING, TYPO = range(4)
+# Длина ключа в индексе подстрок: более длинные запросы ищутся по первым
+# SUFFIX_KEY символам и проверяются по полному названию.
+SUFFIX_KEY = 12
+# Сколько совпадений по подстроке просматривается за запрос. Короткие
+# запросы (одна-две буквы) встречаются почти в каждом названии.
+SUBSTRING_SCAN_LIMIT = 500
+
+
+def max_typos(query):
+    """Допустимое число опечаток для запроса такой длины."""
+    if len(query) < 3:
+        return 0
+    if len(query) < 7:
+        return 1
+    return 2
+
+
+def prefix_distance(query, name, limit):
+    """Расстояние Дамерау-Левенштейна между запросом и лучшим префиксом
+    названия. Возвращает ``limit + 1``, если оно больше ``limit``.
+    """
+    previous2 = None
+    previous = list(range(len(name) + 1))
+    for i, query_char in enumerate(query, 1):
+        current = [i] + [0] * len(name)
+        for j, name_char in enumerate(name, 1):
+            cost = query_char != name_char
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + cost)
+            if (previous2 is not None and j > 1
+                    and query_char == name[j - 2]
+                    and query[i - 2] == name_char):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous)
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Кроме названий хранится отсортированный список их окончаний (со второго
+    символа), по которому совпадения внутри названия находятся бинарным
+    поиском, а не перебором всего каталога.
+    """
+
+    def __init__(self, rows):
+        self.entries = sorted((name, pk) for pk, name in rows)
+        self.names = [name for name, pk in self.entries]
+        self.suffixes = sorted(
+            (name[position:position + SUFFIX_KEY], position, index)
+            for index, (name, pk) in enumerate(self.entries)
+            for position in range(1, len(name)))
+        self.suffix_keys = [key for key, position, index in self.suffixes]
+
+    def substrings(self, query, limit):
+        """Совпадения внутри названий: ключи ранжирования по ``pk``."""
+        key = query[:SUFFIX_KEY]
+        start = bisect_left(self.suffix_keys, key)
+        found = {}
+        for suffix, position, index in islice(
+                self.suffixes, start, start + limit):
+            if not suffix.startswith(key):
+                break
+            name, pk = self.entries[index]
+            if not name.startswith(query, position):
+                continue
+            word_start = name[position - 1] == ' '
+            rank = (WORD_PREFIX if word_start else SUBSTRING, position, name)
+            if pk not in found or rank < found[pk]:
+                found[pk] = rank
+        return found
+
+    def search(self, query, limit):
+        """Первичные ключи ингредиентов в порядке релевантности:
+        совпадения с начала названия, с начала слова, подстрока,
+        затем названия с опечатками (кроме первой буквы).
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+        found = {}
+        start = bisect_left(self.names, query)
+        for name, pk in self.entries[start:start + limit]:
+            if not name.startswith(query):
+                break
+            found[pk] = (PREFIX, name)
+        if len(found) < limit:
+            for pk, rank in self.substrings(
+                    query, SUBSTRING_SCAN_LIMIT).items():
+                found.setdefault(pk, rank)
+        typos = max_typos(query)
+        if len(found) < limit and typos:
+            bigrams = {query[i:i + 2] for i in range(len(query) - 1)}
+            # Каждая правка разрушает не больше трех биграмм запроса.
+            required = len(bigrams) - 3 * typos
+            # Опечатки ищутся только среди названий на ту же букву.
+            first = bisect_left(self.names, query[0])
+            last = bisect_left(self.names, query[0] + '\uffff')
+            for name, pk in self.entries[first:last]:
+                if pk in found:
+                    continue
+                window = name[:len(query) + typos]
+                if (required > 0 and sum(
+                        bigram in window for bigram in bigrams) < required):
+                    continue
+                distance = prefix_distance(query, window, typos)
+                if distance <= typos:
+                    found[pk] = (TYPO, distance, name)
+        return sorted(found, key=found.get)[:limit]
+
+
+class DatabaseSearch:
+    """Поиск без индекса в памяти: префикс по индексу ``search_name``,
+    затем подстрока.
+    """
+
+    def search(self, query, limit):
+        query = normalize_name(query)
+        if not query:
+            return []
+        found = list(Ingredient.objects.filter(
+            search_name__startswith=query,
+        ).order_by('search_name').values_list('pk', flat=True)[:limit])
+        if len(found) < limit:
+            found += Ingredient.objects.filter(
+                search_name__contains=query,
+            ).exclude(pk__in=found).order_by(
+                'search_name').values_list('pk', flat=True)[
+                :limit - len(found)]
+        return found
+
+
+_index = None
+_index_version = None
+_lock = Lock()
+
+
+def get_index():
+    """Индекс каталога, перестраиваемый при смене версии ингредиентов."""
+    global _index, _index_version
+    version = get_version('ingredients')
+    if _index_version != version:
+        with _lock:
+            if _index_version != version:
+                _index = IngredientIndex(
+                    Ingredient.objects.values_list('pk', 'search_name'))
+                _index_version = version
+    return _index
+
+
+def search_ingredients(query):
+    """Ранжированный список первичных ключей ингредиентов по запросу."""
+    limit = settings.INGREDIENTS_AUTOCOMPLETE_LIMIT
+    if settings.INGREDIENTS_AUTOCOMPLETE_IN_MEMORY:
+        return get_index().search(query, limit)
+    return DatabaseSearch().search(query, limit)
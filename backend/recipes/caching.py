@@ -0,0 +1,185 @@
+import calendar
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags, urlencode
+
+from .compression import ENCODINGS, accepted_encoding, compress
+from .fieldsets import Fieldset
+from .models import Recipe
+from .versions import get_version, get_versions, version_time
+
+# Каталоги сжимаются один раз на версию, можно сжимать сильнее.
+CATALOG_QUALITY = 11
+LAST_MODIFIED_DELAY = timedelta(seconds=1)
+
+
+def etag_matches(etag, header):
+    """Проверка заголовка If-None-Match, слабые ETag тоже подходят."""
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags or f'W/{etag}' in etags
+
+
+class CachedCatalogMixin:
+    """Кэширует ответ списка каталога вместе со сжатыми копиями и ETag.
+
+    Ключ кэша содержит версию каталога ``catalog_version``: изменение
+    любой записи каталога меняет версию (см. recipes.signals), и все
+    воркеры начинают собирать ответ заново. Ответы в JSON и MessagePack
+    кэшируются отдельно; сжатые копии (см. recipes.compression) готовятся
+    один раз с наибольшей степенью сжатия.
+    """
+    catalog_version = None
+    cached_formats = ('json', 'msgpack')
+
+    def get_catalog_entry(self, request, *args, **kwargs):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        key = 'catalog:{}:{}:{}:{}'.format(
+            self.catalog_version, get_version(self.catalog_version),
+            request.accepted_renderer.format,
+            hashlib.md5(query.encode()).hexdigest())
+        entry = cache.get(key)
+        if entry is None:
+            response = super().list(request, *args, **kwargs)
+            body = request.accepted_renderer.render(
+                response.data, request.accepted_media_type,
+                self.get_renderer_context())
+            entry = {
+                'etag': '"{}"'.format(hashlib.md5(body).hexdigest()),
+                'body': body,
+                'encoded': {},
+            }
+            if len(body) >= settings.RESPONSE_COMPRESSION_MIN_SIZE:
+                entry['encoded'] = {
+                    encoding: compress(body, encoding, CATALOG_QUALITY)
+                    for encoding in ENCODINGS
+                }
+            cache.set(key, entry, None)
+        return entry
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format not in self.cached_formats:
+            return super().list(request, *args, **kwargs)
+        entry = self.get_catalog_entry(request, *args, **kwargs)
+        content_type = request.accepted_renderer.media_type
+        encoding = accepted_encoding(request, tuple(entry['encoded']))
+        if etag_matches(entry['etag'], request.META.get('HTTP_IF_NONE_MATCH')):
+            response = HttpResponseNotModified()
+        elif encoding is not None:
+            response = HttpResponse(
+                entry['encoded'][encoding], content_type=content_type)
+            response['Content-Encoding'] = encoding
+        else:
+            response = HttpResponse(entry['body'], content_type=content_type)
+        response['ETag'] = entry['etag']
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept, Accept-Encoding'
+        return response
+
+
+class ConditionalGetMixin:
+    """Условные GET: ETag и Last-Modified без сборки ответа.
+
+    Состояние ответа складывается из значений, прочитанных одним легким
+    запросом к БД (время изменения рецептов, их число), и версий наборов
+    данных из кэша, от которых зависит ответ (см. recipes.versions).
+    ETag - хэш состояния, адреса запроса, выбранного формата ответа
+    (JSON или MessagePack), выбранных полей (см. recipes.fieldsets) и
+    пользователя: в ответ входят его отметки избранного, корзины и
+    подписок. Ответ зависит от заголовков Accept и Authorization и
+    указывает их в Vary. Если копия клиента актуальна, отдается 304 и
+    ответ не собирается.
+    """
+
+    def conditional_response(self, respond, state, modified, versions,
+                             modified_versions=()):
+        """Ответ ``respond()`` с ETag и Last-Modified или 304.
+
+        ``state`` - значения из БД, ``modified`` - время их изменения,
+        ``versions`` - наборы данных, от которых зависит ответ.
+        ``modified_versions`` учитываются только в Last-Modified: для них
+        ETag точнее определяется по ``state``.
+        """
+        request = self.request
+        user = request.user
+        versions = list(versions)
+        if user.is_authenticated:
+            versions.append(f'marks:{user.pk}')
+        values = get_versions([*versions, *modified_versions])
+        parts = [request.build_absolute_uri(),
+                 request.accepted_media_type, Fieldset(request).key,
+                 str(user.pk),
+                 *(str(value) for value in state),
+                 *(values[name] for name in versions)]
+        etag = '"{}"'.format(hashlib.md5(':'.join(parts).encode()).hexdigest())
+        # Версия без времени считается измененной сейчас.
+        now = timezone.now()
+        times = [version_time(value) or now for value in values.values()]
+        if modified is not None:
+            times.append(modified)
+        last_modified = None
+        # Last-Modified точен до секунды: изменение в текущей секунде
+        # еще может повториться с тем же значением заголовка.
+        if now - max(times) >= LAST_MODIFIED_DELAY:
+            last_modified = calendar.timegm(max(times).utctimetuple())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = respond()
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = (
+            'private, no-cache' if user.is_authenticated else 'no-cache')
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+
+def fragment_versions(recipe):
+    """Наборы данных, от которых зависит общее представление рецепта."""
+    return ('tags', 'ingredients', f'recipe:{recipe.pk}',
+            f'user:{recipe.author_id}')
+
+
+def get_recipe_fragments(recipes, build, host='', fields=None):
+    """Общие для всех пользователей представления рецептов.
+
+    Представления берутся из кэша одним ``get_many``. Для промахов связи
+    предзагружаются разом, представление собирается функцией ``build`` и
+    сохраняется в кэш. Ключ содержит версии рецепта, автора, тегов и
+    ингредиентов (см. recipes.signals), а также хост запроса, так как
+    ссылки на изображения абсолютные. Представления с выборочными полями
+    ``fields`` (см. recipes.fieldsets) кэшируются отдельно, для них
+    предзагружаются только нужные связи.
+    """
+    versions = get_versions({
+        name for recipe in recipes for name in fragment_versions(recipe)})
+    prefix = [host]
+    if fields is not None:
+        prefix.append(','.join(fields))
+    keys = {}
+    for recipe in recipes:
+        state = ':'.join(
+            prefix + [versions[name] for name in fragment_versions(recipe)])
+        keys[recipe.pk] = 'recipe-fragment:{}:{}'.format(
+            recipe.pk, hashlib.md5(state.encode()).hexdigest())
+    fragments = cache.get_many(keys.values())
+    missing = [recipe for recipe in recipes
+               if keys[recipe.pk] not in fragments]
+    if missing:
+        prefetch_related_objects(
+            missing, *Recipe.objects.related_lookups(fields))
+        built = {keys[recipe.pk]: build(recipe) for recipe in missing}
+        cache.set_many(built, settings.RECIPE_FRAGMENT_TIMEOUT)
+        fragments.update(built)
+    return [fragments[keys[recipe.pk]] for recipe in recipes]
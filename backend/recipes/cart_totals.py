@@ -0,0 +1,154 @@
+"""Поддержка таблицы ShoppingCartIngredient.
+
+Все функции должны вызываться внутри транзакции, в которой меняется
+корзина или состав рецепта.
+"""
+from collections import Counter
+from threading import local
+
+from django.db.models import Sum
+
+from users.models import User
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingCartIngredient
+
+BATCH_SIZE = 1000
+
+# Рецепты, которые удаляются в текущем потоке: их ингредиенты убираются
+# из всех корзин сразу (recipe_deleting), каскадное удаление строк корзины
+# их повторно не вычитает.
+_deleting = local()
+
+
+def deleting_recipes():
+    if not hasattr(_deleting, 'recipe_ids'):
+        _deleting.recipe_ids = set()
+    return _deleting.recipe_ids
+
+
+def recipe_amounts(recipe_id):
+    """Количество каждого ингредиента в рецепте."""
+    return Counter(dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', 'amount')))
+
+
+def cart_user_ids(recipe_id):
+    return list(ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+def apply_changes(user_ids, changes):
+    """Прибавляет ``changes`` (ингредиент -> изменение количества)
+    к корзинам пользователей ``user_ids``.
+
+    Строки пользователей блокируются, чтобы параллельные изменения одной
+    корзины выполнялись по очереди.
+    """
+    changes = {pk: amount for pk, amount in changes.items() if amount}
+    if not user_ids or not changes:
+        return
+    list(User.objects.select_for_update().filter(
+        pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+    existing = {
+        (row.user_id, row.ingredient_id): row
+        for row in ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=changes)
+    }
+    to_update, to_create, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, amount in changes.items():
+            row = existing.get((user_id, ingredient_id))
+            if row is None:
+                if amount > 0:
+                    to_create.append(ShoppingCartIngredient(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        amount=amount))
+                continue
+            row.amount += amount
+            if row.amount > 0:
+                to_update.append(row)
+            else:
+                to_delete.append(row.pk)
+    ShoppingCartIngredient.objects.bulk_update(
+        to_update, ['amount'], batch_size=BATCH_SIZE)
+    ShoppingCartIngredient.objects.bulk_create(
+        to_create, batch_size=BATCH_SIZE)
+    if to_delete:
+        ShoppingCartIngredient.objects.filter(pk__in=to_delete).delete()
+
+
+def recipes_amounts(recipe_ids):
+    """Суммарное количество каждого ингредиента в рецептах."""
+    amounts = Counter()
+    for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def recipes_added(user_id, recipe_ids):
+    """Рецепты добавлены в корзину пользователя."""
+    apply_changes([user_id], recipes_amounts(recipe_ids))
+
+
+def recipes_removed(user_id, recipe_ids):
+    """Рецепты удалены из корзины пользователя."""
+    recipe_ids = [pk for pk in recipe_ids if pk not in deleting_recipes()]
+    if recipe_ids:
+        apply_changes([user_id], {
+            pk: -amount
+            for pk, amount in recipes_amounts(recipe_ids).items()})
+
+
+def recipe_ingredients_changed(recipe_id, old_amounts):
+    """Состав рецепта изменился: ``old_amounts`` — состав до изменения."""
+    changes = recipe_amounts(recipe_id)
+    changes.subtract(old_amounts)
+    recipe_amounts_changed(recipe_id, changes)
+
+
+def recipe_amounts_changed(recipe_id, changes):
+    """Количества ингредиентов рецепта изменились на ``changes``
+    (ингредиент -> изменение количества).
+    """
+    if any(changes.values()):
+        apply_changes(cart_user_ids(recipe_id), changes)
+
+
+def recipe_deleting(recipe_id):
+    """Рецепт удаляется: убирает его ингредиенты из всех корзин."""
+    apply_changes(cart_user_ids(recipe_id), {
+        pk: -amount for pk, amount in recipe_amounts(recipe_id).items()})
+    deleting_recipes().add(recipe_id)
+
+
+def recipe_deleted(recipe_id):
+    """Рецепт и строки корзин с ним удалены."""
+    deleting_recipes().discard(recipe_id)
+
+
+def rebuild(user_ids=None):
+    """Пересчитывает корзины пользователей (всех, если не указаны)
+    по таблицам ShoppingCart и RecipeIngredient.
+    """
+    rows = ShoppingCartIngredient.objects.all()
+    lookup = {'recipe__shopping_cart__isnull': False}
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+        lookup = {'recipe__shopping_cart__user_id__in': user_ids}
+    rows.delete()
+    totals = RecipeIngredient.objects.filter(**lookup).values(
+        'recipe__shopping_cart__user_id', 'ingredient_id',
+    ).annotate(total=Sum('amount')).order_by()
+    batch = []
+    created = 0
+    for item in totals.iterator(chunk_size=BATCH_SIZE):
+        batch.append(ShoppingCartIngredient(
+            user_id=item['recipe__shopping_cart__user_id'],
+            ingredient_id=item['ingredient_id'],
+            amount=item['total']))
+        if len(batch) == BATCH_SIZE:
+            created += len(ShoppingCartIngredient.objects.bulk_create(batch))
+            batch = []
+    created += len(ShoppingCartIngredient.objects.bulk_create(batch))
+    return created
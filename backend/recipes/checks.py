@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии наборов данных (см. recipes.versions) должны храниться в
+    общем для всех процессов кэше: в локальном кэше смена версии видна
+    только процессу, который ее сделал, и остальные воркеры отдают
+    устаревшие каталоги, представления рецептов и ETag.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'Кэш по умолчанию ({backend}) хранится в памяти процесса, '
+        'версии каталогов и представлений рецептов не будут общими '
+        'для воркеров.',
+        hint='Укажите общий кэш в CACHE_BACKEND и CACHE_LOCATION, '
+             'например memcached, или добавьте recipes.W001 в '
+             'SILENCED_SYSTEM_CHECKS, если backend работает в одном '
+             'процессе.',
+        id='recipes.W001',
+    )]
@@ -0,0 +1,86 @@
+"""Сжатие ответов API.
+
+``CompressionMiddleware`` сжимает ответы API в JSON и MessagePack
+не меньше ``RESPONSE_COMPRESSION_MIN_SIZE`` байт: brotli, если клиент
+его принимает, иначе gzip. Ответы меньше порога отдаются как есть:
+заголовок и словарь сжатия съели бы выигрыш. Уже сжатые ответы
+(каталоги, см. recipes.caching) и потоковые ответы не трогаются.
+
+HTML админки и браузерного API не сжимается: он содержит CSRF-токен
+рядом с данными из запроса, и по размеру сжатого ответа токен можно
+подобрать (BREACH).
+"""
+import re
+
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+# В порядке предпочтения.
+ENCODINGS = ('br', 'gzip')
+# Средний уровень: ответы сжимаются на каждый запрос.
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/msgpack',
+}
+QUALITY_RE = re.compile(r'\bq\s*=\s*([0-9.]+)')
+STRONG_ETAG_RE = re.compile(r'^"')
+
+
+def accepted_encoding(request, encodings=ENCODINGS):
+    """Первый из ``encodings`` алгоритм, который принимает клиент по
+    заголовку Accept-Encoding, или None.
+    """
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.partition(';')
+        match = QUALITY_RE.search(params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, quality=BROTLI_QUALITY):
+    if encoding == 'br':
+        return brotli.compress(content, quality=quality)
+    return compress_string(content)
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    return content_type.lower() in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответы brotli или gzip, см. описание модуля."""
+
+    def process_response(self, request, response):
+        if (response.streaming or response.has_header('Content-Encoding')
+                or not is_compressible(response)
+                or len(response.content)
+                < settings.RESPONSE_COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        # Сжатый ответ не совпадает побайтно с несжатым, поэтому сильный
+        # ETag становится слабым (RFC 7232, раздел 2.1).
+        if response.has_header('ETag'):
+            response['ETag'] = STRONG_ETAG_RE.sub('W/"', response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,16 @@
+"""Денормализованные счетчики рецептов и пользователей.
+
+Счетчики меняются только функцией ``change_counter``, расхождения
+с таблицами исправляет команда reconcile_counters.
+"""
+from django.db.models import F
+
+
+def change_counter(model, pks, field, delta):
+    """Атомарно меняет счетчик ``field`` у объектов ``model`` с первичными
+    ключами ``pks`` на ``delta``. Счетчик не уходит ниже нуля.
+    """
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
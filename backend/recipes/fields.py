@@ -0,0 +1,127 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+from . import images
+
+# Кратно 4, чтобы части строки base64 декодировались независимо.
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+class RecipeImageField(serializers.ImageField):
+    """Картинка рецепта: файл из multipart-запроса или строка base64
+    (``data:image/png;base64,...``).
+
+    Строка base64 декодируется частями во временный файл. Размер файла
+    и число пикселей из заголовка картинки проверяются до декодирования
+    самой картинки.
+    """
+    default_error_messages = {
+        'invalid_base64': 'Картинка должна быть файлом или строкой base64.',
+        'too_large': 'Размер картинки больше {max_size} байт.',
+        'too_many_pixels': 'Картинка больше {max_pixels} пикселей.',
+    }
+    formats = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = self.decode(data)
+        if getattr(data, 'size', 0) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        if hasattr(data, 'seek'):
+            data.name = f'image.{self.check_image(data).lower()}'
+        return super().to_internal_value(data)
+
+    def decode(self, data):
+        """Декодирует строку base64 во временный файл. Переносы строк
+        и пробелы в строке допускаются.
+        """
+        data = data.partition(';base64,')[2] or data
+        data = ''.join(data.split())
+        if len(data) // 4 * 3 > settings.RECIPE_IMAGE_MAX_SIZE + 2:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        file = TemporaryUploadedFile('image', None, 0, None)
+        try:
+            for start in range(0, len(data), DECODE_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    data[start:start + DECODE_CHUNK_SIZE], validate=True))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_base64')
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+    def check_image(self, data):
+        """Формат картинки по заголовку, без декодирования пикселей."""
+        try:
+            with Image.open(data, formats=self.formats) as image:
+                image_format = image.format
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels',
+                      max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS)
+        except (OSError, SyntaxError, ValueError):
+            self.fail('invalid_image')
+        finally:
+            data.seek(0)
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels',
+                      max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS)
+        return image_format
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки рецепта:
+    вариант -> формат -> URL.
+    """
+
+    def to_representation(self, value):
+        names = images.variant_names(value.name if value else None)
+        if names is None:
+            return None
+        request = self.context.get('request')
+
+        def url(name):
+            url = value.storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            variant: {image_format: url(name)
+                      for image_format, name in formats.items()}
+            for variant, formats in names.items()
+        }
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """Список первичных ключей объектов ``queryset``.
+
+    В отличие от ``PrimaryKeyRelatedField(many=True)`` все ключи
+    проверяются одним запросом ``IN``. Ошибки возвращаются по позициям
+    списка, объекты - в порядке ключей.
+    """
+    default_error_messages = {
+        'does_not_exist': serializers.PrimaryKeyRelatedField
+        .default_error_messages['does_not_exist'],
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        kwargs.setdefault('child', serializers.IntegerField(min_value=1))
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        keys = super().to_internal_value(data)
+        objects = self.queryset.in_bulk(set(keys))
+        errors = {
+            index: [self.error_messages['does_not_exist'].format(
+                pk_value=key)]
+            for index, key in enumerate(keys) if key not in objects
+        }
+        if errors:
+            raise serializers.ValidationError(errors, code='does_not_exist')
+        return [objects[key] for key in keys]
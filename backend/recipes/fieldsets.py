@@ -0,0 +1,75 @@
+"""Выборочные поля ответа.
+
+``?fields=id,name,image`` оставляет в ответе только перечисленные поля,
+``?omit=text,ingredients`` убирает перечисленные. Параметры действуют на
+поля верхнего уровня; неизвестные имена пропускаются. Вьюсеты по набору
+полей сокращают запрос: читают только нужные столбцы и не предзагружают
+ненужные связи.
+"""
+from collections import OrderedDict
+
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class Fieldset:
+    """Набор полей, выбранный параметрами запроса."""
+
+    def __init__(self, request=None):
+        params = request.query_params if request is not None else {}
+        self.fields = (parse_names(params[FIELDS_PARAM])
+                       if FIELDS_PARAM in params else None)
+        self.omit = parse_names(params.get(OMIT_PARAM, ''))
+
+    @property
+    def sparse(self):
+        return self.fields is not None or bool(self.omit)
+
+    @property
+    def key(self):
+        """Выбор полей одной строкой, не зависящей от порядка имен."""
+        fields = ('*' if self.fields is None
+                  else ','.join(sorted(self.fields)))
+        return f'{fields};{",".join(sorted(self.omit))}'
+
+    def __contains__(self, name):
+        return ((self.fields is None or name in self.fields)
+                and name not in self.omit)
+
+    def columns(self, field_columns, *always):
+        """Столбцы модели для ``only()``: ``always`` и столбцы выбранных
+        полей по словарю поле -> столбцы.
+        """
+        columns = set(always)
+        for name, names in field_columns.items():
+            if name in self:
+                columns.update(names)
+        return sorted(columns)
+
+
+class SparseFieldsetMixin:
+    """Сериализатор, оставляющий поля, выбранные ``?fields=`` и ``?omit=``.
+    Вложенные сериализаторы отдают все свои поля.
+    """
+
+    @property
+    def fieldset(self):
+        return Fieldset(self.context.get('request'))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+        fieldset = self.fieldset
+        return OrderedDict(
+            (name, field) for name, field in fields.items()
+            if name in fieldset)
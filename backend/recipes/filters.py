@@ -1,6 +1,10 @@
+from django.db.models import Case, IntegerField, When
 from django_filters import rest_framework as filters
 
+from . import trending
+from .autocomplete import search_ingredients
 from .models import Ingredient, Recipe, Tag
+from .search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
@@ -12,24 +16,34 @@ class RecipeFilter(filters.FilterSet):
     )
     author = filters.CharFilter(lookup_expr='exact')
     is_in_shopping_cart = filters.BooleanFilter(
-        field_name='is_in_shopping_cart', method='filter'
+        field_name='shopping_cart__user', method='filter'
     )
     is_favorited = filters.BooleanFilter(
-        field_name='is_favorited', method='filter'
+        field_name='favorite__user', method='filter'
+    )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('trending', 'В тренде'),),
+        method='filter_ordering',
     )
 
     def filter(self, queryset, name, value):
         """Метод фильтрации рецептов"""
-        if name == 'is_in_shopping_cart' and value:
-            queryset = queryset.filter(
-                shopping_cart__user=self.request.user
-            )
-        if name == 'is_favorited' and value:
-            queryset = queryset.filter(
-                favorite__user=self.request.user
-            )
+        if value:
+            user = self.request.user
+            if not user.is_authenticated:
+                return queryset.none()
+            queryset = queryset.filter(**{name: user})
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск с сортировкой по релевантности"""
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        """Сортировка по рейтингу в тренде"""
+        return queryset.order_by(*trending.ORDERING)
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags', 'is_in_shopping_cart', 'is_favorited',)
@@ -37,7 +51,17 @@ class RecipeFilter(filters.FilterSet):
 
 class IngredientsFilter(filters.FilterSet):
     """Фильтр ингредиентов"""
-    name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        """Ранжированный поиск ингредиентов по названию"""
+        ids = search_ingredients(value)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(pk__in=ids).order_by(Case(
+            *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+            output_field=IntegerField(),
+        ))
 
     class Meta:
         model = Ingredient
@@ -0,0 +1,129 @@
+"""Картинки рецептов и их уменьшенные копии.
+
+Загруженная картинка сохраняется по пути из SHA-256 содержимого
+(``recipes/<ab>/<хэш>/original.<расширение>``), поэтому одинаковые
+загрузки хранятся один раз. Рядом с оригиналом лежат копии
+``<вариант>.<расширение>`` размеров ``RECIPE_IMAGE_VARIANTS`` в форматах
+``RECIPE_IMAGE_FORMATS``. Файлы по таким путям не меняются, и их можно
+кэшировать в браузере без ограничения срока.
+"""
+import hashlib
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+UPLOAD_DIR = 'recipes'
+ORIGINAL_RE = re.compile(
+    rf'^{UPLOAD_DIR}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})/original\.\w+$')
+EXTENSIONS = {
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def directory(digest):
+    return f'{UPLOAD_DIR}/{digest[:2]}/{digest}'
+
+
+def original_name(digest, name):
+    extension = os.path.splitext(name)[1].lower() or '.jpg'
+    return f'{directory(digest)}/original{extension}'
+
+
+def variant_name(digest, variant, image_format):
+    return f'{directory(digest)}/{variant}.{EXTENSIONS[image_format]}'
+
+
+def variant_names(name):
+    """Пути копий картинки: вариант -> формат -> путь.
+    None для картинок, сохраненных не по хэшу содержимого.
+    """
+    match = ORIGINAL_RE.match(name or '')
+    if match is None:
+        return None
+    return {
+        variant: {
+            image_format: variant_name(match['digest'], variant, image_format)
+            for image_format in settings.RECIPE_IMAGE_FORMATS
+        }
+        for variant in settings.RECIPE_IMAGE_VARIANTS
+    }
+
+
+def flatten(image):
+    """Картинка без прозрачности на белом фоне, для JPEG."""
+    if image.mode in ('RGB', 'L'):
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def encode(image, image_format):
+    if image_format == 'jpeg':
+        image = flatten(image)
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, image_format.upper(), **SAVE_OPTIONS[image_format])
+    return ContentFile(buffer.getvalue())
+
+
+def create_variants(content, digest, storage=default_storage):
+    """Сохраняет уменьшенные копии картинки. Копии строятся от большей
+    к меньшей, каждая из предыдущей.
+    """
+    variants = sorted(settings.RECIPE_IMAGE_VARIANTS.items(),
+                      key=lambda item: item[1], reverse=True)
+    content.seek(0)
+    with Image.open(content) as image:
+        # JPEG сразу декодируется в уменьшенном масштабе, поворот по EXIF
+        # делается уже на уменьшенной копии.
+        image.draft('RGB', variants[0][1])
+        image.thumbnail(variants[0][1], Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        for variant, size in variants:
+            image.thumbnail(size, Image.LANCZOS)
+            for image_format in settings.RECIPE_IMAGE_FORMATS:
+                name = variant_name(digest, variant, image_format)
+                if storage.exists(name):
+                    storage.delete(name)
+                storage.save(name, encode(image, image_format))
+
+
+def store(content, name, storage=default_storage):
+    """Сохраняет картинку с копиями, если такого содержимого еще нет.
+    Возвращает путь оригинала.
+    """
+    digest = content_hash(content)
+    target = original_name(digest, name)
+    if storage.exists(target):
+        return target
+    create_variants(content, digest, storage)
+    # Оригинал пишется последним: его наличие означает, что копии готовы.
+    content.seek(0)
+    saved = storage.save(target, content)
+    if hasattr(content, 'temporary_file_path'):
+        # FileSystemStorage перенес временный файл, закрываем его сразу.
+        content.close()
+    if saved != target:
+        # Такое же содержимое одновременно сохранил другой запрос.
+        storage.delete(saved)
+    return target
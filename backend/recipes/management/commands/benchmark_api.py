@@ -0,0 +1,481 @@
+import base64
+import io
+import json
+import math
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection, reset_queries
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import cart_totals, search, timeline
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+USERS = 20
+TAGS = 6
+INGREDIENTS = 200
+RECIPES_PER_USER = 5
+INGREDIENTS_PER_RECIPE = 8
+FAVORITES_PER_USER = 15
+CARTS_PER_USER = 6
+SUBSCRIPTIONS_PER_USER = 8
+BATCH = 20
+PASSWORD = 'benchmark-password'
+# Запас сверх бюджета запросов (доля, с округлением вверх): бюджеты -
+# число запросов, измеренное на PostgreSQL, а запас позволяет мелкие
+# изменения без правки бюджетов. Ошибки N+1 дают запрос на строку
+# и запас превышают.
+QUERY_MARGIN = 0.1
+# С базовой линией сравнивается медиана: p95 из нескольких десятков
+# замеров близок к максимуму и зависит от случайных пауз. Рост медианы
+# меньше LATENCY_SLACK (мс) не считается регрессией: у быстрых маршрутов
+# относительный порог меньше разброса замеров.
+LATENCY_SLACK = 2.0
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def query_limit(budget):
+    """Допустимое число запросов с запасом QUERY_MARGIN."""
+    return budget + math.ceil(budget * QUERY_MARGIN)
+
+
+def image_base64():
+    """Небольшая картинка для создания рецептов."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class Case:
+    """Сценарий замера одного маршрута API.
+
+    ``setup`` выполняется перед каждым повтором вне замера и возвращает
+    словарь, которым форматируются ``path`` и значения ``headers``.
+    """
+
+    def __init__(self, name, method, path, budget, data=None, user=True,
+                 setup=None, status=200, headers=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.data = data
+        self.user = user
+        self.setup = setup
+        self.status = status
+        self.headers = headers or {}
+
+
+class Dataset:
+    """Фиксированный набор данных для замеров."""
+
+    def __init__(self, seed):
+        rnd = random.Random(seed)
+        User.objects.bulk_create(
+            User(username=f'bench{i}', email=f'bench{i}@example.com',
+                 first_name='Имя', last_name='Фамилия')
+            for i in range(USERS)
+        )
+        self.users = list(User.objects.filter(username__startswith='bench')
+                          .order_by('id'))
+        for user in self.users:
+            user.set_password(PASSWORD)
+        User.objects.bulk_update(self.users, ['password'])
+        self.user = self.users[0]
+        self.token = Token.objects.create(user=self.user).key
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', color=f'#{i:06X}', slug=f'tag{i}')
+            for i in range(TAGS)
+        )
+        self.tags = list(Tag.objects.order_by('id'))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'продукт {i:03}', measurement_unit='г',
+                       search_name=f'продукт {i:03}')
+            for i in range(INGREDIENTS)
+        )
+        self.ingredients = list(Ingredient.objects.order_by('id'))
+        Recipe.objects.bulk_create(
+            Recipe(author=user, name=f'Рецепт {user.pk}-{i}',
+                   image='recipes/benchmark.png', text='Описание рецепта',
+                   cooking_time=rnd.randint(1, 120))
+            for user in self.users for i in range(RECIPES_PER_USER)
+        )
+        self.recipes = list(Recipe.objects.order_by('id'))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=rnd.randint(1, 500))
+            for recipe in self.recipes
+            for ingredient in rnd.sample(self.ingredients,
+                                         INGREDIENTS_PER_RECIPE)
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag)
+            for recipe in self.recipes for tag in rnd.sample(self.tags, 2)
+        )
+        for user in self.users:
+            Favorite.objects.bulk_create(
+                Favorite(user=user, recipe=recipe)
+                for recipe in rnd.sample(self.recipes, FAVORITES_PER_USER))
+            ShoppingCart.objects.bulk_create(
+                ShoppingCart(user=user, recipe=recipe)
+                for recipe in rnd.sample(self.recipes, CARTS_PER_USER))
+            others = [author for author in self.users if author != user]
+            Subscribe.objects.bulk_create(
+                Subscribe(user=user, author=author)
+                for author in rnd.sample(others, SUBSCRIPTIONS_PER_USER))
+        cart_totals.rebuild()
+        call_command('reconcile_counters', full=True, stdout=io.StringIO())
+        timeline.rebuild()
+        search.rebuild(Recipe.objects.all())
+        call_command('build_similar_recipes', full=True, min_common=1,
+                     stdout=io.StringIO())
+        call_command('update_trending_scores', full=True,
+                     stdout=io.StringIO())
+        self.free_recipe = Recipe.objects.exclude(
+            favorite__user=self.user).exclude(
+            shopping_cart__user=self.user).first()
+        self.batch_recipes = list(Recipe.objects.exclude(
+            favorite__user=self.user).exclude(
+            shopping_cart__user=self.user).exclude(
+            pk=self.free_recipe.pk).values_list('pk', flat=True)[:BATCH])
+        self.stranger = User.objects.exclude(
+            subscribing__user=self.user).exclude(pk=self.user.pk).first()
+
+    def recipe_payload(self):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': image_base64(),
+            'tags': [tag.pk for tag in self.tags[:2]],
+            'ingredients': [{'id': ingredient.pk, 'amount': 10}
+                            for ingredient in self.ingredients[:10]],
+        }
+
+    def own_recipe(self):
+        recipe = Recipe.objects.create(
+            author=self.user, name='Временный рецепт',
+            image='recipes/benchmark.png', text='Описание', cooking_time=5)
+        recipe.tags.set(self.tags[:1])
+        return {'id': recipe.pk}
+
+    def toggle(self, model, exists):
+        def setup():
+            model.objects.filter(user=self.user,
+                                 recipe=self.free_recipe).delete()
+            if exists:
+                model.objects.create(user=self.user, recipe=self.free_recipe)
+            if model is ShoppingCart:
+                cart_totals.rebuild([self.user.pk])
+            return {'id': self.free_recipe.pk}
+        return setup
+
+    def toggle_batch(self, model, exists):
+        def setup():
+            model.objects.filter(user=self.user,
+                                 recipe__in=self.batch_recipes).delete()
+            if exists:
+                model.objects.bulk_create(
+                    model(user=self.user, recipe_id=pk)
+                    for pk in self.batch_recipes)
+            if model is ShoppingCart:
+                cart_totals.rebuild([self.user.pk])
+            return {}
+        return setup
+
+    def subscription(self, exists):
+        def setup():
+            Subscribe.objects.filter(user=self.user,
+                                     author=self.stranger).delete()
+            if exists:
+                Subscribe.objects.create(user=self.user, author=self.stranger)
+            return {'id': self.stranger.pk}
+        return setup
+
+    def etag(self, path):
+        """ETag текущего ответа, для замера ответа 304."""
+        def setup():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+            return {'etag': client.get(path)['ETag']}
+        return setup
+
+    def fresh_token(self):
+        Token.objects.filter(user=self.user).delete()
+        self.token = Token.objects.create(user=self.user).key
+        return {}
+
+    def new_user(self):
+        User.objects.filter(username='bench-new').delete()
+        return {}
+
+    def cases(self):
+        recipe = self.recipes[-1].pk
+        author = self.users[1].pk
+        return [
+            Case('recipes-list', 'get', '/api/recipes/', 3, user=False),
+            Case('recipes-list-auth', 'get', '/api/recipes/', 7),
+            Case('recipes-list-limit-50', 'get', '/api/recipes/?limit=50', 7),
+            Case('recipes-list-304', 'get', '/api/recipes/?limit=50', 2,
+                 setup=self.etag('/api/recipes/?limit=50'), status=304,
+                 headers={'HTTP_IF_NONE_MATCH': '{etag}'}),
+            Case('recipes-list-cursor', 'get',
+                 '/api/recipes/?cursor=&limit=50', 6),
+            Case('recipes-list-cards', 'get',
+                 '/api/recipes/?limit=50'
+                 '&fields=id,name,images,cooking_time', 4),
+            Case('recipes-list-filtered', 'get',
+                 f'/api/recipes/?tags=tag0&tags=tag1&author={author}'
+                 '&is_favorited=1', 8),
+            Case('recipes-cart-filter', 'get',
+                 '/api/recipes/?is_in_shopping_cart=1', 7),
+            Case('recipes-search', 'get', '/api/recipes/?search=продукт',
+                 7),
+            Case('recipes-cookable', 'get', '/api/recipes/cookable/?'
+                 + '&'.join(f'ingredients={ingredient.pk}'
+                            for ingredient in self.ingredients[:20]), 6),
+            Case('recipes-trending', 'get',
+                 '/api/recipes/?ordering=trending', 7),
+            Case('recipes-trending-cursor', 'get',
+                 '/api/recipes/?ordering=trending&cursor=&limit=50', 6),
+            Case('recipes-feed', 'get', '/api/recipes/feed/', 6),
+            Case('recipes-feed-304', 'get', '/api/recipes/feed/', 2,
+                 setup=self.etag('/api/recipes/feed/'), status=304,
+                 headers={'HTTP_IF_NONE_MATCH': '{etag}'}),
+            Case('recipes-similar', 'get', f'/api/recipes/{recipe}/similar/',
+                 5),
+            Case('recipes-detail', 'get', f'/api/recipes/{recipe}/', 6),
+            Case('recipes-detail-304', 'get', f'/api/recipes/{recipe}/', 2,
+                 setup=self.etag(f'/api/recipes/{recipe}/'), status=304,
+                 headers={'HTTP_IF_NONE_MATCH': '{etag}'}),
+            Case('recipes-create', 'post', '/api/recipes/', 14,
+                 data=self.recipe_payload(), status=201),
+            Case('recipes-update', 'patch', '/api/recipes/{id}/', 15,
+                 data=self.recipe_payload(), setup=self.own_recipe),
+            Case('recipes-delete', 'delete', '/api/recipes/{id}/', 15,
+                 setup=self.own_recipe, status=204),
+            Case('favorite-add', 'post', '/api/recipes/{id}/favorite/', 7,
+                 setup=self.toggle(Favorite, False), status=201),
+            Case('favorite-delete', 'delete', '/api/recipes/{id}/favorite/',
+                 7, setup=self.toggle(Favorite, True), status=204),
+            Case('cart-add', 'post', '/api/recipes/{id}/shopping_cart/', 11,
+                 setup=self.toggle(ShoppingCart, False), status=201),
+            Case('cart-delete', 'delete',
+                 '/api/recipes/{id}/shopping_cart/', 11,
+                 setup=self.toggle(ShoppingCart, True), status=204),
+            Case('favorite-batch-add', 'post', '/api/recipes/favorite/', 6,
+                 data={'recipes': self.batch_recipes},
+                 setup=self.toggle_batch(Favorite, False)),
+            Case('favorite-batch-delete', 'delete', '/api/recipes/favorite/',
+                 7, data={'recipes': self.batch_recipes},
+                 setup=self.toggle_batch(Favorite, True)),
+            Case('cart-batch-add', 'post', '/api/recipes/shopping_cart/', 10,
+                 data={'recipes': self.batch_recipes},
+                 setup=self.toggle_batch(ShoppingCart, False)),
+            Case('cart-batch-delete', 'delete',
+                 '/api/recipes/shopping_cart/', 11,
+                 data={'recipes': self.batch_recipes},
+                 setup=self.toggle_batch(ShoppingCart, True)),
+            Case('cart-download', 'get',
+                 '/api/recipes/download_shopping_cart/', 2),
+            Case('ingredients-list', 'get', '/api/ingredients/', 0,
+                 user=False),
+            Case('ingredients-search', 'get', '/api/ingredients/?name=прод',
+                 0, user=False),
+            Case('ingredients-detail', 'get',
+                 f'/api/ingredients/{self.ingredients[0].pk}/', 1,
+                 user=False),
+            Case('tags-list', 'get', '/api/tags/', 0, user=False),
+            Case('tags-detail', 'get', f'/api/tags/{self.tags[0].pk}/', 1,
+                 user=False),
+            Case('subscriptions', 'get', '/api/users/subscriptions/', 4),
+            Case('subscriptions-sparse', 'get',
+                 '/api/users/subscriptions/?omit=recipes', 3),
+            Case('subscribe', 'post', '/api/users/{id}/subscribe/', 7,
+                 setup=self.subscription(False), status=201),
+            Case('unsubscribe', 'delete', '/api/users/{id}/subscribe/', 6,
+                 setup=self.subscription(True), status=204),
+            Case('users-list', 'get', '/api/users/', 2, user=False),
+            Case('users-detail', 'get', f'/api/users/{author}/', 3),
+            Case('users-me', 'get', '/api/users/me/', 2),
+            Case('users-create', 'post', '/api/users/', 3, user=False,
+                 data={'email': 'bench-new@example.com',
+                       'username': 'bench-new', 'first_name': 'Имя',
+                       'last_name': 'Фамилия',
+                       'password': 'Xq7-benchmark-pass'},
+                 setup=self.new_user, status=201),
+            Case('set-password', 'post', '/api/users/set_password/', 3,
+                 data={'current_password': PASSWORD,
+                       'new_password': PASSWORD},
+                 status=204),
+            Case('token-login', 'post', '/api/auth/token/login/', 3,
+                 user=False, data={'email': self.user.email,
+                                   'password': PASSWORD}),
+            Case('token-logout', 'post', '/api/auth/token/logout/', 2,
+                 setup=self.fresh_token, status=204),
+        ]
+
+
+class Command(BaseCommand):
+    help = ('Замер количества запросов к БД и задержек маршрутов API '
+            'на тестовой базе с фиксированным набором данных. Бюджеты '
+            'запросов измерены на PostgreSQL: на других СУБД они '
+            'не проверяются, а задержки сравниваются только с базовой '
+            'линией, снятой на той же СУБД')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'benchmark_baseline.json'),
+            help='Файл с сохраненными результатами для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Допустимый рост p50 относительно базовой линии (доля)')
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument('--only', nargs='*', default=(),
+                            help='Имена сценариев для замера')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            results = self.run_cases(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+        self.report(results, options)
+
+    def run_cases(self, options):
+        dataset = Dataset(options['seed'])
+        results = {}
+        for case in dataset.cases():
+            if options['only'] and case.name not in options['only']:
+                continue
+            results[case.name] = self.measure(
+                dataset, case, options['iterations'])
+        return results
+
+    def measure(self, dataset, case, iterations):
+        """Прогоняет сценарий: первый прогон прогревочный, не учитывается."""
+        timings = []
+        queries = 0
+        for iteration in range(iterations + 1):
+            kwargs = case.setup() if case.setup else {}
+            client = APIClient()
+            if case.user:
+                client.credentials(
+                    HTTP_AUTHORIZATION=f'Token {dataset.token}')
+            request = getattr(client, case.method)
+            path = case.path.format(**kwargs)
+            headers = {name: value.format(**kwargs)
+                       for name, value in case.headers.items()}
+            # Журнал запросов ограничен 9000 записями, заполненный журнал
+            # дал бы ноль запросов.
+            reset_queries()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = request(path, case.data, format='json',
+                                   **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - start
+            if response.status_code != case.status:
+                raise CommandError(
+                    f'{case.name}: {case.method.upper()} {path} вернул '
+                    f'{response.status_code}, ожидался {case.status}')
+            if iteration:
+                timings.append(elapsed * 1000)
+                queries = max(queries, len(context.captured_queries))
+        return {
+            'queries': queries,
+            'budget': case.budget,
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+        }
+
+    def load_baseline(self, path):
+        """Результаты сценариев из базовой линии, снятой на той же СУБД."""
+        if not os.path.exists(path):
+            self.stdout.write(self.style.WARNING(
+                f'Базовая линия {path} не найдена, задержки не сравниваются'))
+            return {}
+        with open(path, encoding='UTF-8') as file:
+            baseline = json.load(file)
+        if baseline.get('database') != connection.vendor:
+            self.stdout.write(self.style.WARNING(
+                f'Базовая линия {path} снята на {baseline.get("database")}, '
+                f'а не на {connection.vendor}, задержки не сравниваются'))
+            return {}
+        return baseline['cases']
+
+    def report(self, results, options):
+        baseline = self.load_baseline(options['baseline'])
+        # На других СУБД число запросов отличается: SQLite, например,
+        # считает отдельным запросом BEGIN каждой транзакции.
+        check_budgets = connection.vendor == 'postgresql'
+        if not check_budgets:
+            self.stdout.write(self.style.WARNING(
+                f'Бюджеты запросов измерены на PostgreSQL, на '
+                f'{connection.vendor} они не проверяются (столбец «-»)'))
+        failures = []
+        self.stdout.write(f'{"сценарий":<24}{"запросы":>10}{"p50, мс":>10}'
+                          f'{"p95, мс":>10}{"база p50":>10}')
+        for name, result in results.items():
+            base = baseline.get(name, {}).get('p50')
+            base_text = f'{base:.2f}' if base is not None else '-'
+            limit = query_limit(result['budget'])
+            limit_text = limit if check_budgets else '-'
+            self.stdout.write(
+                f'{name:<24}{result["queries"]:>6}/{limit_text:<3}'
+                f'{result["p50"]:>10.2f}{result["p95"]:>10.2f}'
+                f'{base_text:>10}')
+            if check_budgets and result['queries'] > limit:
+                failures.append(
+                    f'{name}: {result["queries"]} запросов при бюджете '
+                    f'{result["budget"]} (с запасом {limit})')
+            if base is not None and (
+                    result['p50'] > base * (1 + options['threshold'])
+                    and result['p50'] - base > LATENCY_SLACK):
+                failures.append(
+                    f'{name}: p50 {result["p50"]:.2f} мс против '
+                    f'{base:.2f} мс в базовой линии')
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='UTF-8') as file:
+                json.dump({
+                    'database': connection.vendor,
+                    'iterations': options['iterations'],
+                    'cases': results,
+                }, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+            self.stdout.write(f'Базовая линия сохранена в '
+                              f'{options["baseline"]}')
+        if failures:
+            raise CommandError('Регрессия производительности:\n'
+                               + '\n'.join(failures))
+        if not check_budgets:
+            self.stdout.write(self.style.WARNING(
+                f'Бюджеты запросов не проверены: {connection.vendor}'))
+            return
+        self.stdout.write(self.style.SUCCESS('Successfully'))
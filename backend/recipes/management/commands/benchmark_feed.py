@@ -0,0 +1,97 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from recipes import timeline
+from recipes.management.commands.benchmark_api import percentile
+from recipes.models import Recipe, TimelineEntry
+from users.models import User
+
+STRATEGIES = {
+    'fan-out on write': timeline.feed,
+    'fan-out on read': timeline.feed_on_read,
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнение ленты подписок на таблице TimelineEntry с чтением '
+            'через Subscribe на текущей базе (см. generate_fixtures)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько самых активных подписчиков взять')
+        parser.add_argument('--authors', type=int, default=10,
+                            help='Сколько самых популярных авторов взять')
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        users = list(User.objects.annotate(
+            subscriptions=Count('subscriber'),
+        ).filter(subscriptions__gt=0).order_by('-subscriptions')[
+            :options['users']])
+        if not users:
+            raise CommandError('В базе нет подписок, запустите '
+                               'generate_fixtures')
+        self.stdout.write(
+            f'Записей в лентах: {TimelineEntry.objects.count()}, '
+            f'подписок у пользователей: {users[-1].subscriptions}'
+            f'-{users[0].subscriptions}')
+        self.stdout.write(f'{"чтение":<20}{"стр. 1 p50":>12}'
+                          f'{"p95":>9}{"стр. N p50":>12}{"p95":>9}')
+        for name, strategy in STRATEGIES.items():
+            first, deep = self.measure_reads(strategy, users, options)
+            self.stdout.write(
+                f'{name:<20}{percentile(first, 50):>12.2f}'
+                f'{percentile(first, 95):>9.2f}'
+                f'{percentile(deep, 50):>12.2f}{percentile(deep, 95):>9.2f}')
+        self.stdout.write(f'{"запись":<20}{"подписчиков":>12}{"мс":>9}'
+                          f'{"в ленты":>9}')
+        for author in User.objects.order_by('-subscribers_count')[
+                :options['authors']]:
+            fans_out = timeline.fans_out(author.pk)
+            self.stdout.write(
+                f'{author.username:<20}{author.subscribers_count:>12}'
+                f'{self.measure_write(author, fans_out):>9.2f}'
+                f'{"да" if fans_out else "нет":>9}')
+        self.stdout.write(self.style.SUCCESS('Successfully'))
+
+    def measure_reads(self, strategy, users, options):
+        """Время первой и последней из ``pages`` страниц ленты, в мс.
+        Страницы читаются по курсору, как в RecipeCursorPagination.
+        """
+        first, deep = [], []
+        for user in users:
+            queryset = strategy(user).order_by('-id')
+            cursor = None
+            for page in range(options['pages']):
+                start = time.perf_counter()
+                ids = list((queryset.filter(pk__lt=cursor) if cursor
+                            else queryset).values_list(
+                    'pk', flat=True)[:options['limit']])
+                elapsed = (time.perf_counter() - start) * 1000
+                if not page:
+                    first.append(elapsed)
+                if not ids or page == options['pages'] - 1:
+                    deep.append(elapsed)
+                    break
+                cursor = ids[-1]
+        return first, deep
+
+    def measure_write(self, author, fans_out):
+        """Время рассылки нового рецепта автора по лентам, в мс.
+        Рецепт и записи лент откатываются.
+        """
+        with transaction.atomic():
+            recipe = Recipe(author=author, name='Замер', text='Замер',
+                            image='recipes/benchmark.png', cooking_time=1,
+                            in_timelines=fans_out)
+            Recipe.objects.bulk_create([recipe])
+            recipe = Recipe.objects.filter(author=author).latest('id')
+            start = time.perf_counter()
+            timeline.recipe_published(recipe)
+            elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        return elapsed
@@ -0,0 +1,90 @@
+import json
+import time
+from io import BytesIO
+
+from django.core.management import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from recipes.compression import compress
+from recipes.management.commands.benchmark_api import percentile
+from recipes.models import Recipe
+from recipes.parsers import MessagePackParser, ORJSONParser
+from recipes.renderers import MessagePackRenderer, ORJSONRenderer
+from users.models import User
+
+FORMATS = (
+    ('json', JSONRenderer(), JSONParser()),
+    ('orjson', ORJSONRenderer(), ORJSONParser()),
+    ('msgpack', MessagePackRenderer(), MessagePackParser()),
+)
+
+
+def timing(function, iterations):
+    """Медиана времени вызова ``function`` в миллисекундах."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentile(timings, 50)
+
+
+class Command(BaseCommand):
+    help = ('Время сериализации и разбора и размер ответов основных '
+            'маршрутов API в JSON (стандартный модуль и orjson) и '
+            'MessagePack, без сжатия и со сжатием gzip и brotli, '
+            'на текущей базе (см. generate_fixtures)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def endpoints(self):
+        recipe = Recipe.objects.order_by('-id').first()
+        if recipe is None:
+            raise CommandError('В базе нет рецептов, запустите '
+                               'generate_fixtures')
+        return (
+            ('ingredients', '/api/ingredients/'),
+            ('recipes-50', '/api/recipes/?limit=50'),
+            ('recipes-50-cards',
+             '/api/recipes/?limit=50&fields=id,name,images,cooking_time'),
+            ('recipe-detail', f'/api/recipes/{recipe.pk}/'),
+            ('subscriptions', '/api/users/subscriptions/?limit=20'),
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(subscriber__isnull=False).first()
+        client = APIClient()
+        client.force_authenticate(user or User.objects.first())
+        iterations = options['iterations']
+        self.stdout.write(
+            f'{"маршрут":<18}{"формат":<9}{"КБ":>8}{"gzip КБ":>9}'
+            f'{"br КБ":>8}{"вывод, мс":>11}{"разбор, мс":>12}'
+            f'{"gzip, мс":>10}{"br, мс":>8}')
+        for name, path in self.endpoints():
+            response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{path} вернул {response.status_code}')
+            data = json.loads(response.content)
+            for label, renderer, parser in FORMATS:
+                body = renderer.render(data, renderer.media_type, {})
+                render_ms = timing(
+                    lambda: renderer.render(data, renderer.media_type, {}),
+                    iterations)
+                parse_ms = timing(
+                    lambda: parser.parse(BytesIO(body)), iterations)
+                sizes = {}
+                compress_ms = {}
+                for encoding in ('gzip', 'br'):
+                    sizes[encoding] = len(compress(body, encoding))
+                    compress_ms[encoding] = timing(
+                        lambda: compress(body, encoding), iterations)
+                self.stdout.write(
+                    f'{name:<18}{label:<9}{len(body) / 1024:>8.1f}'
+                    f'{sizes["gzip"] / 1024:>9.1f}{sizes["br"] / 1024:>8.1f}'
+                    f'{render_ms:>11.3f}{parse_ms:>12.3f}'
+                    f'{compress_ms["gzip"]:>10.3f}{compress_ms["br"]:>8.3f}')
+        self.stdout.write(self.style.SUCCESS('Successfully'))
@@ -0,0 +1,136 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+from scipy import sparse
+
+from recipes.models import Favorite, Recipe, SimilarRecipe
+
+CHUNK_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ('Пересчет похожих рецептов по совместному добавлению '
+            'в избранное (косинусная мера по матрице пользователь-рецепт)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать все рецепты, а не только '
+                                 'те, у которых менялось избранное')
+        parser.add_argument('--top-k', type=int,
+                            default=settings.SIMILAR_RECIPES_TOP_K)
+        parser.add_argument('--min-common', type=int, default=2,
+                            help='Минимум пользователей, добавивших '
+                                 'оба рецепта')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Рецептов в одном умножении матриц')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        recipes = Recipe.objects.all()
+        if not options['full']:
+            recipes = recipes.filter(similar_stale=True)
+        targets = list(recipes.order_by('pk').values_list(
+            'pk', flat=True).iterator(chunk_size=CHUNK_SIZE))
+        size = options['batch_size']
+        self.stored_counts = dict(Recipe.objects.filter(
+            favorites_count__gt=0,
+        ).values_list('pk', 'favorites_count').iterator(
+            chunk_size=CHUNK_SIZE))
+        if options['full']:
+            # Флаг снимается до чтения избранного: изменения во время
+            # пересчета снова пометят рецепт.
+            Recipe.objects.update(similar_stale=False)
+            model = self.load_matrix(Favorite.objects.all())
+        created = 0
+        for offset in range(0, len(targets), size):
+            batch = targets[offset:offset + size]
+            if not options['full']:
+                # Сходство считается только по пользователям, добавившим
+                # в избранное рецепты пакета.
+                Recipe.objects.filter(pk__in=batch).update(
+                    similar_stale=False)
+                model = self.load_matrix(Favorite.objects.filter(
+                    user_id__in=Favorite.objects.filter(
+                        recipe_id__in=batch).values('user_id')))
+            created += self.save(
+                batch, self.neighbours(*model, batch, options))
+            self.stdout.write(
+                f'\rРецептов: {offset + len(batch)} из {len(targets)}',
+                ending='')
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully: {len(targets)} рецептов, {created} связей '
+            f'за {time.monotonic() - start:.1f} с'))
+
+    def load_matrix(self, favorites):
+        """Разреженная матрица пользователь x рецепт, она же
+        транспонированная, id рецептов ее столбцов и число добавлений
+        рецептов в избранное.
+        """
+        pairs = np.fromiter(
+            (value for pair in favorites.values_list(
+                'user_id', 'recipe_id').order_by().iterator(
+                chunk_size=CHUNK_SIZE) for value in pair),
+            dtype=np.int64).reshape(-1, 2)
+        user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        recipe_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+            shape=(len(user_ids), len(recipe_ids)))
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return (matrix, matrix.T.tocsr(), recipe_ids,
+                self.favorites_counts(matrix, recipe_ids))
+
+    def favorites_counts(self, matrix, recipe_ids):
+        """Число добавлений в избранное для столбцов матрицы. Матрица может
+        содержать не всех пользователей, поэтому берется и счетчик рецепта.
+        """
+        counts = np.asarray(matrix.sum(axis=0)).ravel()
+        return np.maximum(counts, np.fromiter(
+            (self.stored_counts.get(pk, 0) for pk in recipe_ids.tolist()),
+            dtype=np.float64, count=len(recipe_ids)))
+
+    def neighbours(self, matrix, transposed, recipe_ids, counts, batch,
+                   options):
+        """Top-K похожих рецептов для рецептов ``batch``:
+        рецепт -> [(похожий рецепт, сходство)].
+        """
+        columns = np.searchsorted(recipe_ids, batch)
+        columns = columns[columns < len(recipe_ids)]
+        columns = columns[np.isin(recipe_ids[columns], batch)]
+        if not len(columns):
+            return {}
+        common = (transposed[columns] @ matrix).tocsr()
+        norms = np.sqrt(counts)
+        result = {}
+        for row, column in enumerate(columns):
+            start, end = common.indptr[row], common.indptr[row + 1]
+            others = common.indices[start:end]
+            together = common.data[start:end]
+            keep = (others != column) & (together >= options['min_common'])
+            others, together = others[keep], together[keep]
+            if not len(others):
+                continue
+            scores = together.astype(np.float64) / (
+                norms[column] * norms[others])
+            if len(scores) > options['top_k']:
+                best = np.argpartition(-scores, options['top_k'])[
+                    :options['top_k']]
+                others, scores = others[best], scores[best]
+            result[int(recipe_ids[column])] = [
+                (int(recipe_ids[other]), float(score))
+                for other, score in zip(others, scores)]
+        return result
+
+    def save(self, recipe_ids, neighbours):
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+            return len(SimilarRecipe.objects.bulk_create(
+                SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                              score=score)
+                for recipe_id, similar in neighbours.items()
+                for similar_id, score in similar))
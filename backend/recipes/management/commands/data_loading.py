@@ -1,22 +1,105 @@
 import csv
+import json
+import os
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
 from recipes.models import Ingredient
+from recipes.utils import normalize_name
+from recipes.versions import bump_version
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Строки CSV вида ``name,measurement_unit``, заголовок пропускается."""
+    for row in csv.reader(file):
+        if not row:
+            continue
+        name, measurement_unit = row
+        if name != 'name':
+            yield name, measurement_unit
+
+
+def read_json(file):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise CommandError('Ожидается JSON-массив ингредиентов')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started and buffer[:1] == ',':
+            buffer = buffer[1:]
+            continue
+        if started and buffer[:1] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise CommandError('Некорректный JSON-файл ингредиентов')
+            chunk = file.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = 'Load csv data'
-
-    def handle(self, *args, **kwargs):
-        with open('./data/ingredients.csv',
-                  newline='', encoding='UTF-8') as file:
-            file_reader = csv.reader(file)
-            for row in file_reader:
-                name, measurement_unit = row
-                if name != 'name':
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
-
-        self.stdout.write(self.style.SUCCESS('Successfully'))
+    help = 'Load ingredients from csv or json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'))
+        parser.add_argument('--format', choices=READERS,
+                            help='По умолчанию определяется по расширению')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        existing = set(Ingredient.objects.values_list(
+            'name', 'measurement_unit'))
+        read = inserted = 0
+        with open(path, newline='', encoding='UTF-8') as file:
+            rows = READERS[file_format](file)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                read += len(batch)
+                new = []
+                for key in batch:
+                    if key not in existing:
+                        existing.add(key)
+                        new.append(Ingredient(
+                            name=key[0], measurement_unit=key[1],
+                            search_name=normalize_name(key[0])))
+                Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+                inserted += len(new)
+                self.stdout.write(f'Прочитано {read}, добавлено {inserted}')
+        if inserted:
+            bump_version('ingredients')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully: прочитано {read}, добавлено {inserted}, '
+            f'пропущено {read - inserted}'))
@@ -0,0 +1,254 @@
+import csv
+import io
+import random
+import time
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, call_command
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes import cart_totals
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCart, Tag)
+from recipes.versions import bump_version
+from users.models import Subscribe, User
+
+PASSWORD = 'fixtures-password'
+
+
+class SkewedChoice:
+    """Выбор элементов со степенным (Zipf) распределением популярности:
+    несколько элементов выбираются очень часто, остальные — редко.
+    """
+
+    def __init__(self, items, skew, rnd):
+        self.items = list(items)
+        rnd.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, len(self.items) + 1)))
+        self.rnd = rnd
+
+    def one(self):
+        point = self.rnd.random() * self.cum_weights[-1]
+        return self.items[bisect_left(self.cum_weights, point)]
+
+    def unique(self, count, exclude=None):
+        """До ``count`` различных элементов, кроме ``exclude``."""
+        count = min(count, len(self.items) - (exclude is not None))
+        chosen = set()
+        attempts = 0
+        while len(chosen) < count and attempts < count * 10:
+            item = self.one()
+            if item != exclude:
+                chosen.add(item)
+            attempts += 1
+        return chosen
+
+
+class Writer:
+    """Пакетная запись строк: COPY на PostgreSQL, bulk_create на
+    остальных СУБД.
+    """
+
+    def __init__(self, batch_size, stdout):
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.copy = connection.vendor == 'postgresql'
+
+    def write(self, model, fields, rows):
+        start = time.monotonic()
+        total = 0
+        rows = iter(rows)
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                if self.copy:
+                    self.copy_batch(model, fields, batch)
+                else:
+                    model.objects.bulk_create(
+                        model(**dict(zip(fields, row))) for row in batch)
+                total += len(batch)
+                self.stdout.write(
+                    f'\r{model._meta.db_table}: {total}', ending='')
+                self.stdout.flush()
+        self.stdout.write(
+            f'\r{model._meta.db_table}: {total} строк '
+            f'за {time.monotonic() - start:.1f} с')
+        return total
+
+    def copy_batch(self, model, fields, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+                f'({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+class Command(BaseCommand):
+    help = ('Генерация большого синтетического набора данных '
+            'для нагрузочного тестирования')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=50000)
+        parser.add_argument('--tags', type=int, default=10,
+                            help='Минимальное число тегов')
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Ингредиенты создаются, если их нет в базе')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Среднее число избранных на пользователя')
+        parser.add_argument('--carts', type=int, default=3,
+                            help='Среднее число рецептов в корзине')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Среднее число подписок на пользователя')
+        parser.add_argument('--days', type=int, default=14,
+                            help='За сколько дней распределить добавления '
+                                 'в избранное и корзины')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель распределения популярности')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['seed'])
+        self.writer = Writer(options['batch_size'], self.stdout)
+        start = time.monotonic()
+        users = self.create_users(options['users'])
+        tags = self.ensure_tags(options['tags'])
+        ingredients = self.ensure_ingredients(options['ingredients'])
+        recipes = self.create_recipes(
+            options['recipes'], SkewedChoice(users, options['skew'], self.rnd))
+        self.create_recipe_relations(recipes, tags, ingredients, options)
+        popular = SkewedChoice(recipes, options['skew'], self.rnd)
+        self.create_user_relations(Favorite, users, popular,
+                                   options['favorites'], options['days'])
+        self.create_user_relations(ShoppingCart, users, popular,
+                                   options['carts'], options['days'])
+        with transaction.atomic():
+            self.stdout.write(f'Итоги корзин: {cart_totals.rebuild()} строк')
+        self.create_subscriptions(
+            users, SkewedChoice(users, options['skew'], self.rnd),
+            options['subscriptions'])
+        call_command('reconcile_counters', full=True, stdout=self.stdout)
+        call_command('rebuild_timelines', stdout=self.stdout)
+        call_command('rebuild_search_vectors', stdout=self.stdout)
+        # Строки записаны без сигналов: кэши запущенного сервера
+        # сбрасываются сменой версий, как в data_loading.
+        bump_version('recipes')
+        bump_version('pantry')
+        call_command('build_similar_recipes', full=True, stdout=self.stdout)
+        call_command('update_trending_scores', full=True, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully за {time.monotonic() - start:.1f} с'))
+
+    def new_ids(self, model, last_id):
+        return list(model.objects.filter(pk__gt=last_id).order_by('pk')
+                    .values_list('pk', flat=True))
+
+    def last_id(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def spread(self, average):
+        """Число связей для одного пользователя со средним ``average``."""
+        return self.rnd.randint(0, 2 * average)
+
+    def create_users(self, count):
+        last_id = self.last_id(User)
+        password = make_password(PASSWORD)
+        now = timezone.now()
+        self.writer.write(User, (
+            'username', 'email', 'first_name', 'last_name', 'password',
+            'role', 'is_superuser', 'is_staff', 'is_active', 'date_joined',
+            'recipes_count', 'subscribers_count',
+        ), (
+            (f'user{last_id + i}', f'user{last_id + i}@example.com',
+             'Имя', 'Фамилия', password, User.USER, False, False, True, now,
+             0, 0)
+            for i in range(1, count + 1)
+        ))
+        return self.new_ids(User, last_id)
+
+    def ensure_tags(self, count):
+        existing = Tag.objects.count()
+        if existing < count:
+            self.writer.write(Tag, ('name', 'color', 'slug'), (
+                (f'Тег {i}', f'#{i:06X}', f'tag-{i}')
+                for i in range(existing, count)
+            ))
+            bump_version('tags')
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def ensure_ingredients(self, count):
+        if not Ingredient.objects.exists():
+            self.writer.write(Ingredient, (
+                'name', 'measurement_unit', 'search_name',
+            ), (
+                (f'продукт {i}', self.rnd.choice(('г', 'мл', 'шт.')),
+                 f'продукт {i}')
+                for i in range(count)
+            ))
+            bump_version('ingredients')
+        return list(Ingredient.objects.values_list('pk', flat=True))
+
+    def create_recipes(self, count, authors):
+        last_id = self.last_id(Recipe)
+        now = timezone.now()
+        self.writer.write(Recipe, (
+            'author_id', 'name', 'image', 'text', 'cooking_time',
+            'favorites_count', 'in_carts_count', 'in_timelines',
+            'similar_stale', 'trending_score', 'updated_at',
+        ), (
+            (authors.one(), f'Рецепт {last_id + i}', 'recipes/fixture.png',
+             'Описание рецепта ' * self.rnd.randint(1, 20),
+             self.rnd.randint(1, 180), 0, 0, True, True, 0.0, now)
+            for i in range(1, count + 1)
+        ))
+        return self.new_ids(Recipe, last_id)
+
+    def create_recipe_relations(self, recipes, tags, ingredients, options):
+        common = SkewedChoice(ingredients, options['skew'], self.rnd)
+        self.writer.write(RecipeIngredient, (
+            'recipe_id', 'ingredient_id', 'amount',
+        ), (
+            (recipe, ingredient, self.rnd.randint(1, 1000))
+            for recipe in recipes
+            for ingredient in common.unique(self.rnd.randint(
+                1, 2 * options['ingredients_per_recipe']))
+        ))
+        self.writer.write(RecipeTag, ('recipe_id', 'tag_id'), (
+            (recipe, tag)
+            for recipe in recipes
+            for tag in self.rnd.sample(
+                tags, min(options['tags_per_recipe'], len(tags)))
+        ))
+
+    def create_user_relations(self, model, users, recipes, average, days):
+        now = timezone.now()
+        period = int(timedelta(days=days).total_seconds())
+        self.writer.write(model, ('user_id', 'recipe_id', 'created'), (
+            (user, recipe,
+             now - timedelta(seconds=self.rnd.randint(0, period)))
+            for user in users
+            for recipe in recipes.unique(self.spread(average))
+        ))
+
+    def create_subscriptions(self, users, authors, average):
+        self.writer.write(Subscribe, ('user_id', 'author_id'), (
+            (user, author)
+            for user in users
+            for author in authors.unique(self.spread(average), exclude=user)
+        ))
@@ -0,0 +1,46 @@
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes import images
+from recipes.models import Recipe
+from recipes.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки рецептов в хранилище по хэшу содержимого '
+            'и создает их уменьшенные копии')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать копии и для уже перенесенных '
+                                 'картинок, например после изменения '
+                                 'RECIPE_IMAGE_VARIANTS')
+
+    def handle(self, *args, **options):
+        stored = {}
+        moved = 0
+        for pk, name in Recipe.objects.order_by('pk').values_list(
+                'pk', 'image').iterator():
+            if name in stored:
+                new_name = stored[name]
+            elif images.variant_names(name) is not None:
+                if options['all']:
+                    with default_storage.open(name) as content:
+                        images.create_variants(
+                            content, images.ORIGINAL_RE.match(name)['digest'])
+                new_name = stored[name] = name
+            elif not name or not default_storage.exists(name):
+                self.stderr.write(f'Рецепт {pk}: нет файла {name}')
+                continue
+            else:
+                with default_storage.open(name) as content:
+                    new_name = stored[name] = images.store(content, name)
+            if new_name != name:
+                Recipe.objects.filter(pk=pk).update(
+                    image=new_name, updated_at=timezone.now())
+                bump_version(f'recipe:{pk}')
+                bump_version('recipes')
+                moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully: {len(stored)} картинок, '
+            f'{moved} рецептов перенесено'))
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+from recipes import search
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search vectors of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipe', type=int, nargs='*',
+                            help='id рецептов, по умолчанию все')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options['recipe']:
+            recipes = recipes.filter(pk__in=options['recipe'])
+        updated = search.rebuild(recipes)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully: {updated} рецептов'))
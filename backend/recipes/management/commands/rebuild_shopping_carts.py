@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes import cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuild shopping cart ingredient totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, nargs='*',
+                            help='id пользователей, по умолчанию все')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = cart_totals.rebuild(options['user'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully: {created} строк'))
@@ -0,0 +1,54 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+BATCH_SIZE = 1000
+
+
+def count_of(model, field):
+    """Подзапрос: число строк ``model``, ссылающихся на внешний объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Repair denormalized recipe and user counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все строки одним UPDATE, например после '
+                 'массовой загрузки данных')
+
+    def handle(self, *args, **options):
+        for model, field, source, source_field in COUNTERS:
+            actual = count_of(source, source_field)
+            if options['full']:
+                updated = model.objects.update(**{field: actual})
+                self.stdout.write(
+                    f'{model._meta.model_name}.{field}: пересчитано {updated}')
+                continue
+            drifted = model.objects.annotate(actual=actual).exclude(
+                **{field: F('actual')}).values_list('pk', 'actual')
+            repaired = 0
+            with transaction.atomic():
+                for pk, value in drifted.iterator(chunk_size=BATCH_SIZE):
+                    model.objects.filter(pk=pk).update(**{field: value})
+                    repaired += 1
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: исправлено {repaired}')
+        self.stdout.write(self.style.SUCCESS('Successfully'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes import trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчет рейтинга рецептов в тренде по событиям избранного '
+            'и корзин с прошлого запуска')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать рейтинг заново по событиям '
+                                 'за последние периоды полураспада')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        updated = trending.update(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully: {updated} рецептов с новыми событиями '
+            f'за {time.monotonic() - start:.1f} с'))
@@ -0,0 +1,112 @@
+"""Добавление рецептов в избранное и корзину и удаление из них.
+
+Отметки через API (по одной и пакетом) ставятся и снимаются функциями
+``add`` и ``remove``. Они блокируют строки рецептов, поэтому параллельные
+запросы меняют отметки одного рецепта по очереди и не учитывают одну
+отметку дважды. Строки пишутся и удаляются без сигналов: счетчики
+рецептов, признак пересчета похожих рецептов, рейтинг в тренде и версия
+отметок пользователя обновляются сразу для всего пакета функциями
+``recipes_marked`` и ``recipes_unmarked``. Эти же функции вызывают
+сигналы при изменении отметок через ORM (см. recipes.signals). Функции
+должны вызываться внутри транзакции.
+"""
+from django.db import connection
+
+from . import cart_totals, trending
+from .counters import change_counter
+from .models import Favorite, Recipe, ShoppingCart
+from .versions import bump_version_on_commit
+
+ADDED = 'added'
+EXISTS = 'exists'
+NOT_FOUND = 'not_found'
+REMOVED = 'removed'
+MISSING = 'missing'
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def mark_similar_stale(recipe_ids):
+    """Помечает похожие рецепты для пересчета build_similar_recipes."""
+    Recipe.objects.filter(
+        pk__in=recipe_ids, similar_stale=False,
+    ).update(similar_stale=True)
+
+
+def recipes_marked(model, user_id, recipe_ids):
+    """Рецепты добавлены в список ``model`` пользователя."""
+    change_counter(Recipe, recipe_ids, RECIPE_COUNTERS[model], 1)
+    if model is Favorite:
+        mark_similar_stale(recipe_ids)
+    bump_version_on_commit(f'marks:{user_id}')
+
+
+def recipes_unmarked(model, user_id, events):
+    """Отметки ``events`` удалены из списка ``model`` пользователя."""
+    recipe_ids = [event.recipe_id for event in events]
+    change_counter(Recipe, recipe_ids, RECIPE_COUNTERS[model], -1)
+    if model is Favorite:
+        mark_similar_stale(recipe_ids)
+    trending.events_removed(model, events)
+    bump_version_on_commit(f'marks:{user_id}')
+
+
+def lock_recipes(recipe_ids):
+    """Блокирует строки рецептов до конца транзакции.
+    Возвращает id найденных рецептов.
+    """
+    return set(Recipe.objects.select_for_update().filter(
+        pk__in=recipe_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def delete_rows(model, pks):
+    """Удаляет строки ``model`` одним запросом, без сигналов."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {column} IN ({placeholders})', pks)
+
+
+def add(model, user, recipe_ids):
+    """Добавляет рецепты в список ``model`` пользователя.
+    Возвращает состояние каждого рецепта: ADDED, EXISTS или NOT_FOUND.
+    """
+    found = lock_recipes(recipe_ids)
+    # Отдельный запрос после блокировки видит отметки, добавленные
+    # параллельными запросами до снятия их блокировок.
+    marked = set(model.objects.filter(
+        user=user, recipe_id__in=found).values_list('recipe_id', flat=True))
+    added = [pk for pk in recipe_ids if pk in found and pk not in marked]
+    if added:
+        model.objects.bulk_create(
+            model(user=user, recipe_id=pk) for pk in added)
+        recipes_marked(model, user.pk, added)
+        if model is ShoppingCart:
+            cart_totals.recipes_added(user.pk, added)
+    return {
+        pk: NOT_FOUND if pk not in found else EXISTS if pk in marked
+        else ADDED
+        for pk in recipe_ids
+    }
+
+
+def remove(model, user, recipe_ids):
+    """Удаляет рецепты из списка ``model`` пользователя.
+    Возвращает состояние каждого рецепта: REMOVED или MISSING.
+    """
+    lock_recipes(recipe_ids)
+    events = list(model.objects.filter(
+        user=user, recipe_id__in=recipe_ids,
+    ).only('recipe_id', 'created'))
+    removed = {event.recipe_id for event in events}
+    if events:
+        delete_rows(model, [event.pk for event in events])
+        recipes_unmarked(model, user.pk, events)
+        if model is ShoppingCart:
+            cart_totals.recipes_removed(user.pk, removed)
+    return {pk: REMOVED if pk in removed else MISSING for pk in recipe_ids}
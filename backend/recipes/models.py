@@ -1,11 +1,92 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator, MaxLengthValidator)
 from django.db import models
+from django.db.models import F, Prefetch, Window
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import images
+from .utils import normalize_name
 
 User = get_user_model()
 
 
+class SearchVectorIndex(GinIndex):
+    """GIN-индекс на PostgreSQL. На остальных СУБД (SQLite при локальной
+    разработке) создается обычный индекс, чтобы схема собиралась.
+    """
+
+    def create_sql(self, model, schema_editor, using=''):
+        if schema_editor.connection.vendor != 'postgresql':
+            return models.Index.create_sql(self, model, schema_editor, using)
+        return super().create_sql(model, schema_editor, using)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов"""
+
+    @staticmethod
+    def related_lookups(fields=None):
+        """Связи, нужные для представления рецепта с полями ``fields``
+        (по умолчанию полного).
+        """
+        lookups = {
+            'author': 'author',
+            'tags': 'tags',
+            'ingredients': Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        }
+        return tuple(lookup for name, lookup in lookups.items()
+                     if fields is None or name in fields)
+
+    def with_related(self):
+        """Предзагружает автора, теги и ингредиенты рецептов."""
+        return self.prefetch_related(*self.related_lookups())
+
+    def latest_per_author(self, author_ids, limit):
+        """Не больше ``limit`` новейших рецептов каждого автора одним
+        запросом: рецепты нумеруются оконной функцией внутри автора.
+        """
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=F('id').desc(),
+            ),
+        ).values('id', 'author_id', 'name', 'image', 'cooking_time',
+                 'position')
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE position <= %s '
+            'ORDER BY author_id, id DESC',
+            (*params, limit),
+        )
+
+
+class RecipeImageFieldFile(ImageFieldFile):
+    """Файл картинки, сохраняемый по хэшу содержимого вместе
+    с уменьшенными копиями (см. recipes.images).
+    """
+
+    def save(self, name, content, save=True):
+        self.name = images.store(content, name, self.storage)
+        setattr(self.instance, self.field.name, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+    save.alters_data = True
+
+
+class RecipeImageField(models.ImageField):
+    attr_class = RecipeImageFieldFile
+
+
 class Recipe(models.Model):
     """Модель рецепта"""
     author = models.ForeignKey(
@@ -18,7 +99,7 @@ class Recipe(models.Model):
         max_length=200,
         verbose_name='Название рецепта'
     )
-    image = models.ImageField(
+    image = RecipeImageField(
         upload_to='recipes/',
         verbose_name='Картинка',
     )
@@ -46,11 +127,71 @@ class Recipe(models.Model):
         ],
         verbose_name='Время приготовления (в минутах)',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='В избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+    )
+    in_timelines = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name='Разослан в ленты подписчиков',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+    similar_stale = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name='Похожие рецепты устарели',
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Рейтинг в тренде',
+    )
+    # Время последнего изменения представления рецепта: самого рецепта,
+    # его ингредиентов, тегов, картинки или автора (см. recipes.signals).
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменен',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_not_in_timelines',
+                condition=models.Q(in_timelines=False),
+            ),
+            SearchVectorIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector',
+            ),
+            models.Index(
+                fields=('id',),
+                name='recipe_similar_stale',
+                condition=models.Q(similar_stale=True),
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -102,15 +243,37 @@ class Ingredient(models.Model):
         max_length=200,
         verbose_name='Единица измерения',
     )
+    search_name = models.CharField(
+        max_length=200,
+        editable=False,
+        verbose_name='Название для поиска',
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('search_name',),
+                name='ingredient_search_prefix',
+                opclasses=('varchar_pattern_ops',),
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
 
 class RecipeIngredient(models.Model):
     """Модель количества ингридиентов в конкретном рецепте"""
@@ -185,6 +348,12 @@ class Favorite(models.Model):
         related_name='favorite',
         verbose_name='Избранные',
     )
+    created = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name='Добавлено',
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -213,15 +382,145 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         verbose_name='Продуктовая корзина',
     )
-    constraints = [
-        models.UniqueConstraint(
-            fields=['user', 'recipe'], name='unique_shopping_cart'
-        )
-    ]
+    created = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name='Добавлено',
+    )
 
     class Meta:
         verbose_name = 'Продуктовая корзина'
         verbose_name_plural = 'Продуктовые корзины'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_shopping_cart'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} имеет {self.recipe} в Корзине покупок'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Модель суммарного количества ингредиента в корзине пользователя.
+
+    Поддерживается при изменении корзины и ингредиентов рецептов
+    (см. recipes.cart_totals), чтобы список покупок читался без
+    агрегации.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзинах'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_ingredient'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} – {self.amount}'
+
+
+class TimelineEntry(models.Model):
+    """Модель записи в ленте подписок пользователя.
+
+    Заполняется при публикации рецепта (см. recipes.timeline).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    """Модель похожего рецепта: рецепты, которые часто добавляют
+    в избранное вместе. Заполняется командой build_similar_recipes.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}: {self.score:.3f}'
+
+
+class TrendingCheckpoint(models.Model):
+    """Момент, на который посчитан Recipe.trending_score.
+    Единственная запись, обновляется командой update_trending_scores.
+    """
+    computed_at = models.DateTimeField(
+        null=True,
+        verbose_name='Рейтинг посчитан на',
+    )
+
+    class Meta:
+        verbose_name = 'Пересчет рейтинга в тренде'
+        verbose_name_plural = 'Пересчеты рейтинга в тренде'
+
+    def __str__(self):
+        return f'{self.computed_at}'
@@ -1,6 +1,179 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (CursorPagination, PageNumberPagination,
+                                       _reverse_ordering)
+
+from . import search, trending
+
+# Разделитель значения сортировки и id в составной позиции курсора.
+POSITION_SEPARATOR = '|'
 
 
 class CustomPageNumberPaginator(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсорная пагинация по -id: каждая страница читается запросом
+    ``WHERE id < <курсор> ORDER BY id DESC LIMIT <limit>`` без OFFSET и
+    COUNT(*), поэтому ее стоимость не зависит от глубины. Общего числа
+    рецептов в ответе нет: только ``next``, ``previous`` и ``results``.
+
+    При сортировке по рейтингу или релевантности (``ordering`` из двух
+    полей, последнее - id) позиция курсора составная: значение первого
+    поля и id. Позиции уникальны, поэтому страницы с одинаковыми
+    рейтингами тоже листаются по ключу, а не смещением.
+    """
+    ordering = '-id'
+    page_size = 6
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        """С ``?ordering=trending`` страницы читаются по рейтингу, с
+        поиском (``?search=``) - по релевантности.
+        """
+        if request.query_params.get('ordering') == 'trending':
+            return trending.ORDERING
+        if 'rank' in queryset.query.annotations:
+            return search.ORDERING
+        return super().get_ordering(request, queryset, view)
+
+    def filter_position(self, queryset, position, reverse):
+        """Строки после позиции ``position`` в порядке чтения.
+
+        Составная позиция по столбцу таблицы сравнивается как строка
+        ``(столбец, id) < (значение, id)``, которую PostgreSQL целиком
+        проверяет по составному индексу (например, recipe_trending).
+        Для вычисляемого поля (ранг поиска) то же условие записано через
+        OR: совпадений поиска не больше SEARCH_RESULTS_LIMIT.
+        """
+        lookups = [
+            (order.lstrip('-'),
+             'lt' if order.startswith('-') != reverse else 'gt')
+            for order in self.ordering]
+        field, lookup = lookups[0]
+        if len(lookups) == 1:
+            return queryset.filter(**{f'{field}__{lookup}': position})
+        value, separator, pk = position.rpartition(POSITION_SEPARATOR)
+        if not separator:
+            raise NotFound(self.invalid_cursor_message)
+        tiebreaker, tiebreaker_lookup = lookups[-1]
+        if field in queryset.query.annotations:
+            return queryset.filter(
+                Q(**{f'{field}__{lookup}e': value}),
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{f'{tiebreaker}__{tiebreaker_lookup}': pk}))
+        model = queryset.model
+        quote_name = connections[queryset.db].ops.quote_name
+        columns = [
+            '{}.{}'.format(quote_name(model._meta.db_table),
+                           quote_name(model._meta.get_field(name).column))
+            for name in (field, tiebreaker)]
+        params = [model._meta.get_field(name).to_python(raw)
+                  for name, raw in ((field, value), (tiebreaker, pk))]
+        operator = '<' if lookup == 'lt' else '>'
+        return queryset.extra(
+            where=[f'({", ".join(columns)}) {operator} (%s, %s)'],
+            params=params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """CursorPagination.paginate_queryset с фильтром по составной
+        позиции (см. ``filter_position``)."""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            try:
+                queryset = self.filter_position(
+                    queryset, current_position, reverse)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (
+                (current_position is not None) or (offset > 0))
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = super()._get_position_from_instance(instance, ordering)
+        if len(ordering) == 1:
+            return position
+        return f'{position}{POSITION_SEPARATOR}{instance.pk}'
+
+
+class RecipePagination(CustomPageNumberPaginator):
+    """Постраничная пагинация рецептов.
+    С параметром ``?cursor=`` (пустым для первой страницы) включается
+    курсорная пагинация.
+    """
+    cursor_pagination_class = RecipeCursorPagination
+
+    def __init__(self):
+        self.cursor_pagination = self.cursor_pagination_class()
+
+    def use_cursor(self, request):
+        return (self.cursor_pagination.cursor_query_param
+                in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request)
+        if self.cursor_mode:
+            return self.cursor_pagination.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_mode:
+            return self.cursor_pagination.to_html()
+        return super().to_html()
@@ -0,0 +1,383 @@
+"""Поиск рецептов по имеющимся ингредиентам.
+
+Индекс в памяти процесса хранит для каждого ингредиента множество
+рецептов и битовые множества рецептов по числу ингредиентов. Запрос
+складывает множества ингредиентов побитовым сумматором и получает для
+каждого рецепта число имеющихся ингредиентов, не обращаясь
+к RecipeIngredient.
+
+Множество рецептов ингредиента хранится в меньшем из представлений:
+битовое множество (бит с номером id рецепта в целом числе Python, id/8
+байт) или отсортированный массив id (4 байта на рецепт). Поэтому индекс
+занимает не больше 4 байт на строку RecipeIngredient (около 32 МБ на
+миллион рецептов по 8 ингредиентов) плюс по id/8 байт на каждое число
+ингредиентов в рецепте. Массивы редких ингредиентов переводятся
+в битовые множества при запросе; последние из них хранятся в кэше
+размером ``PANTRY_CACHE_SIZE`` байт.
+
+Изменения состава рецептов записываются в журнал в кэше Django
+(см. ``record_change``), и каждый процесс перечитывает из базы только
+изменившиеся рецепты. Полная перестройка нужна при первом запросе,
+сбросе кэша или слишком длинном журнале.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from functools import partial
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import RecipeIngredient
+from .versions import get_version
+
+SEQUENCE_KEY = 'pantry:sequence'
+CHANGE_KEY = 'pantry:change:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+# Длиннее журнал не читается, индекс перестраивается целиком.
+JOURNAL_LIMIT = 10000
+# Запись журнала может появиться чуть позже номера, пропуск дальше
+# этого расстояния от конца считается вытесненной записью.
+JOURNAL_LAG = 100
+CHUNK_SIZE = 10000
+# Множество хранится массивом (32 бита на рецепт), если битовое
+# множество (бит на каждый id до наибольшего) больше массива вдвое:
+# перевод массива в битовое множество при запросе не бесплатен.
+SPARSE_RATIO = 64
+
+Match = namedtuple('Match', ('recipe_id', 'owned', 'total'))
+
+
+def popcount(bits):
+    if hasattr(bits, 'bit_count'):
+        return bits.bit_count()
+    return bin(bits).count('1')
+
+
+def to_bitset(positions):
+    """Битовое множество из номеров битов за один проход."""
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def from_bitset(bits):
+    """Номера установленных битов по возрастанию."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    return [offset * 8 + bit
+            for offset, byte in enumerate(data) if byte
+            for bit in range(8) if byte >> bit & 1]
+
+
+def pack(positions):
+    """Множество номеров в меньшем представлении: отсортированный массив
+    или битовое множество.
+    """
+    positions = sorted(positions)
+    if len(positions) * SPARSE_RATIO < positions[-1]:
+        return array('I', positions)
+    return to_bitset(positions)
+
+
+def merge(members, positions):
+    """Добавляет номера ``positions`` к множеству ``members`` (или None)."""
+    if isinstance(members, int):
+        return members | to_bitset(positions)
+    if members is not None:
+        positions = list(members) + list(positions)
+    return pack(positions)
+
+
+def discard(members, positions, mask):
+    """Убирает номера ``positions`` (по возрастанию, ``mask`` - их битовое
+    множество) из множества ``members``.
+    """
+    if isinstance(members, int):
+        if not members & mask:
+            return members
+        members &= ~mask
+        if popcount(members) * SPARSE_RATIO < members.bit_length():
+            return pack(from_bitset(members))
+        return members
+    indexes = []
+    for position in positions:
+        index = bisect_left(members, position)
+        if index < len(members) and members[index] == position:
+            indexes.append(index)
+    if not indexes:
+        return members
+    # Новый массив: параллельные запросы читают индекс без блокировки.
+    members = array('I', members)
+    for index in reversed(indexes):
+        del members[index]
+    return members
+
+
+def record_change(recipe_id):
+    """Записывает изменение состава рецепта в журнал после фиксации
+    транзакции.
+    """
+    transaction.on_commit(partial(append_change, recipe_id))
+
+
+def append_change(recipe_id):
+    cache.add(SEQUENCE_KEY, 0, None)
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.add(SEQUENCE_KEY, 0, None)
+        sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(CHANGE_KEY.format(sequence), recipe_id, CHANGE_TIMEOUT)
+
+
+class Matches:
+    """Найденные рецепты в порядке убывания доли имеющихся ингредиентов,
+    при равной доле — по числу имеющихся, затем от новых к старым.
+
+    Поддерживает ``len`` и срезы, поэтому подходит для пагинаторов DRF.
+    Пересечения множеств и подсчет битов выполняются только для групп,
+    до которых дошел срез.
+    """
+
+    def __init__(self, groups, total):
+        self.groups = groups
+        self.total = total
+        self.counts = {}
+
+    def __len__(self):
+        return self.total
+
+    def group_bits(self, index):
+        owned, total, exact, with_size = self.groups[index]
+        return exact & with_size
+
+    def group_count(self, index, bits):
+        if index not in self.counts:
+            self.counts[index] = popcount(bits)
+        return self.counts[index]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('Поддерживаются только срезы с шагом 1')
+        start, stop, _ = key.indices(self.total)
+        found = []
+        for index, (owned, total, _, _) in enumerate(self.groups):
+            if start >= stop:
+                break
+            bits = self.group_bits(index)
+            if not bits:
+                continue
+            count = self.group_count(index, bits)
+            if start >= count:
+                start -= count
+                stop -= count
+                continue
+            position = 0
+            while bits and position < stop:
+                recipe_id = bits.bit_length() - 1
+                bits ^= 1 << recipe_id
+                if position >= start:
+                    found.append(Match(recipe_id, owned, total))
+                position += 1
+            start = 0
+            stop -= position
+        return found
+
+
+class DenseCache:
+    """Битовые множества ингредиентов, хранящихся массивами, в порядке
+    последнего использования. Занимают не больше ``limit`` байт.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key, members):
+        if isinstance(members, int):
+            return members
+        with self.lock:
+            bits = self.items.get(key)
+            if bits is not None:
+                self.items.move_to_end(key)
+                return bits
+        bits = to_bitset(members)
+        with self.lock:
+            self.discard(key)
+            self.items[key] = bits
+            self.size += (bits.bit_length() + 7) // 8
+            while self.size > self.limit and self.items:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= (evicted.bit_length() + 7) // 8
+        return bits
+
+    def discard(self, key):
+        bits = self.items.pop(key, None)
+        if bits is not None:
+            self.size -= (bits.bit_length() + 7) // 8
+
+    def invalidate(self, keys):
+        with self.lock:
+            for key in keys:
+                self.discard(key)
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент -> множество рецептов."""
+
+    def __init__(self):
+        self.ingredients = {}
+        self.sizes = {}
+        self.dense = DenseCache(settings.PANTRY_CACHE_SIZE)
+
+    def add(self, rows):
+        """Добавляет рецепты из пар (рецепт, ингредиент)."""
+        positions = defaultdict(list)
+        sizes = Counter()
+        for recipe_id, ingredient_id in rows:
+            positions[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        by_size = defaultdict(list)
+        for recipe_id, size in sizes.items():
+            by_size[size].append(recipe_id)
+        for ingredient_id, recipe_ids in positions.items():
+            self.ingredients[ingredient_id] = merge(
+                self.ingredients.get(ingredient_id), recipe_ids)
+        self.dense.invalidate(positions)
+        # Чисел ингредиентов в рецепте немного, их множества плотные.
+        for size, recipe_ids in by_size.items():
+            self.sizes[size] = self.sizes.get(size, 0) | to_bitset(recipe_ids)
+
+    def remove(self, recipe_ids):
+        positions = sorted(set(recipe_ids))
+        mask = to_bitset(positions)
+        changed = []
+        for key, members in list(self.ingredients.items()):
+            updated = discard(members, positions, mask)
+            if updated is members:
+                continue
+            changed.append(key)
+            if updated:
+                self.ingredients[key] = updated
+            else:
+                del self.ingredients[key]
+        self.dense.invalidate(changed)
+        for key, bits in list(self.sizes.items()):
+            if bits & mask:
+                bits &= ~mask
+                if bits:
+                    self.sizes[key] = bits
+                else:
+                    del self.sizes[key]
+
+    def build(self):
+        self.add(RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id').order_by().iterator(
+            chunk_size=CHUNK_SIZE))
+
+    def update(self, recipe_ids):
+        """Перечитывает состав рецептов ``recipe_ids`` из базы."""
+        self.remove(recipe_ids)
+        self.add(RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).values_list('recipe_id', 'ingredient_id').order_by())
+
+    def search(self, ingredient_ids):
+        """Рецепты, в которых есть хотя бы один из ингредиентов."""
+        sizes = self.sizes.copy()
+        planes = []
+        candidates = 0
+        for ingredient_id in set(ingredient_ids):
+            carry = self.dense.get(
+                ingredient_id, self.ingredients.get(ingredient_id, 0))
+            candidates |= carry
+            for level, plane in enumerate(planes):
+                if not carry:
+                    break
+                planes[level], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        exact = {}
+        for owned in range(1, 2 ** len(planes)):
+            bits = candidates
+            for level, plane in enumerate(planes):
+                bits &= plane if owned >> level & 1 else ~plane
+                if not bits:
+                    break
+            if bits:
+                exact[owned] = bits
+        groups = sorted(
+            ((owned, size, bits, with_size)
+             for owned, bits in exact.items()
+             for size, with_size in sizes.items() if size >= owned),
+            key=lambda group: (-group[0] / group[1], -group[0]),
+        )
+        return Matches(groups, popcount(candidates))
+
+
+_index = None
+_index_state = None
+_lock = Lock()
+
+
+def get_index():
+    """Индекс процесса, догоняющий журнал изменений рецептов."""
+    global _index, _index_state
+    epoch = get_version('pantry')
+    sequence = cache.get(SEQUENCE_KEY, 0)
+    if _index_state == (epoch, sequence):
+        return _index
+    with _lock:
+        if _index_state is not None and _index_state[0] == epoch:
+            if _index_state[1] >= sequence:
+                return _index
+            applied = catch_up(_index, _index_state[1], sequence)
+            if applied is not None:
+                _index_state = (epoch, applied)
+                return _index
+        index = PantryIndex()
+        index.build()
+        _index, _index_state = index, (epoch, sequence)
+    return _index
+
+
+def catch_up(index, applied, sequence):
+    """Применяет журнал с номера ``applied`` до ``sequence``. Возвращает
+    номер последней примененной записи или None, если журнал неполон.
+    """
+    if not applied <= sequence <= applied + JOURNAL_LIMIT:
+        return None
+    numbers = range(applied + 1, sequence + 1)
+    found = cache.get_many([CHANGE_KEY.format(number) for number in numbers])
+    changed = set()
+    for number in numbers:
+        key = CHANGE_KEY.format(number)
+        if key not in found:
+            if sequence - number > JOURNAL_LAG:
+                return None
+            break
+        changed.add(found[key])
+        applied = number
+    if changed:
+        index.update(changed)
+    return applied
+
+
+def missing_ingredients(recipe_ids, ingredient_ids):
+    """Недостающие ингредиенты рецептов: рецепт -> список Ingredient."""
+    missing = defaultdict(list)
+    for item in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).exclude(
+        ingredient_id__in=ingredient_ids,
+    ).select_related('ingredient').order_by('ingredient__name'):
+        missing[item.recipe_id].append(item.ingredient)
+    return missing
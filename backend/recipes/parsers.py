@@ -0,0 +1,109 @@
+"""Парсеры запросов: JSON на orjson, MessagePack и парсеры запросов
+рецептов с ограничением размера тела.
+
+Размер проверяется по заголовку Content-Length до чтения тела и по числу
+прочитанных байт при чтении. Запрос с телом без Content-Length
+(Transfer-Encoding: chunked) отклоняется до разбора
+(``check_content_length``). Файлы из multipart-запросов больше
+``FILE_UPLOAD_MAX_MEMORY_SIZE`` Django пишет во временные файлы, а не
+в память.
+"""
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import BaseParser, JSONParser, MultiPartParser
+
+
+class ORJSONParser(JSONParser):
+    """JSON-парсер на orjson."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackParser(BaseParser):
+    """Тело запроса в MessagePack (``Content-Type: application/msgpack``)."""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - {}'.format(
+                exc or type(exc).__name__))
+
+
+class PayloadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Слишком большой запрос.'
+    default_code = 'payload_too_large'
+
+
+class LengthRequired(APIException):
+    status_code = status.HTTP_411_LENGTH_REQUIRED
+    default_detail = 'Укажите размер тела запроса в заголовке Content-Length.'
+    default_code = 'length_required'
+
+
+def content_length(request):
+    """Размер тела из заголовка Content-Length или None."""
+    try:
+        return int(request.META['CONTENT_LENGTH'])
+    except (KeyError, ValueError):
+        return None
+
+
+def check_content_length(request):
+    """Отклоняет запрос с телом без Content-Length: DRF не читает такое
+    тело и молча считал бы его пустым, а размер нельзя проверить заранее.
+    """
+    if (content_length(request) is None
+            and 'HTTP_TRANSFER_ENCODING' in request.META):
+        raise LengthRequired()
+
+
+class SizeLimitedStream:
+    """Поток тела запроса, прерывающий чтение после ``limit`` байт."""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.remaining = limit
+
+    def read(self, size=-1):
+        # Читается на байт больше остатка, чтобы заметить превышение.
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining + 1
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        if self.remaining < 0:
+            raise PayloadTooLarge()
+        return data
+
+
+class LimitedSizeMixin:
+    max_size_setting = 'RECIPE_REQUEST_MAX_SIZE'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        limit = getattr(settings, self.max_size_setting)
+        length = content_length(parser_context['request'])
+        if length is not None and length > limit:
+            raise PayloadTooLarge()
+        return super().parse(
+            SizeLimitedStream(stream, limit), media_type, parser_context)
+
+
+class LimitedJSONParser(LimitedSizeMixin, ORJSONParser):
+    pass
+
+
+class LimitedMessagePackParser(LimitedSizeMixin, MessagePackParser):
+    pass
+
+
+class LimitedMultiPartParser(LimitedSizeMixin, MultiPartParser):
+    pass
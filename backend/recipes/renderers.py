@@ -0,0 +1,171 @@
+import csv
+from abc import ABC, abstractmethod
+from tempfile import SpooledTemporaryFile
+
+import msgpack
+import orjson
+from django.conf import settings
+from django.http import Http404
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+SPOOL_SIZE = 1024 * 1024
+# Типы, которых нет в orjson и msgpack (ленивые строки, Decimal, QuerySet),
+# приводятся так же, как в стандартном рендерере DRF.
+encode_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson. Ответ с отступами для браузерного API
+    собирается стандартным рендерером.
+    """
+    # Даты и время orjson записывает иначе, чем DRF (``+00:00`` вместо
+    # ``Z``), поэтому они тоже приводятся через encode_default.
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=encode_default, option=self.options)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029, чтобы ответ
+        # оставался корректным JavaScript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в MessagePack по заголовку ``Accept: application/msgpack``
+    или параметру ``?format=msgpack``.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+def as_rows(data):
+    """Строки списка покупок или строки сообщения об ошибке."""
+    if isinstance(data, dict):
+        return ((f'{key}: {value}', '', '') for key, value in data.items())
+    return ((item['ingredient__name'], item['amount'],
+             item['ingredient__measurement_unit']) for item in data)
+
+
+def as_line(name, amount, unit):
+    """Строка списка покупок для текстовых форматов."""
+    if not unit:
+        return name
+    return f'{name} - {amount} {unit}'
+
+
+class Echo:
+    """Псевдобуфер: csv.writer пишет строку и сразу получает ее обратно."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer, ABC):
+    """Базовый рендерер списка покупок.
+
+    ``stream`` отдает файл частями, чтобы ответ можно было передавать
+    через ``StreamingHttpResponse`` без сборки в памяти.
+    """
+    charset = 'utf-8'
+
+    @abstractmethod
+    def stream(self, data):
+        """Части файла в байтах."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(data))
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, data):
+        for row in as_rows(data):
+            yield f'{as_line(*row)}\n'.encode()
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, data):
+        writer = csv.writer(Echo())
+        yield '\ufeff'.encode()
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')).encode()
+        for row in as_rows(data):
+            yield writer.writerow(row).encode()
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """PDF собирается во временный файл, который в памяти держится
+    только до ``SPOOL_SIZE`` байт, и отдается частями.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+
+    def register_font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT))
+
+    def stream(self, data):
+        self.register_font()
+        with SpooledTemporaryFile(max_size=SPOOL_SIZE) as file:
+            pdf = canvas.Canvas(file, pagesize=A4)
+            width, height = A4
+            line_height = self.font_size * 1.5
+            y = height - self.margin
+            pdf.setFont(self.font_name, self.font_size)
+            pdf.drawString(self.margin, y, 'Список покупок')
+            for row in as_rows(data):
+                y -= line_height
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(self.font_name, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(self.margin, y, as_line(*row))
+            pdf.save()
+            file.seek(0)
+            yield from iter(lambda: file.read(64 * 1024), b'')
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Выбор формата списка покупок.
+
+    Если запрошенного формата нет (``?format=json`` или неподходящий
+    Accept), выбирается JSON: вьюсет отвечает 406 с перечнем форматов
+    вместо 404 в текстовом формате.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except (Http404, NotAcceptable):
+            renderer = ORJSONRenderer()
+            return renderer, renderer.media_type
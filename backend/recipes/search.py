@@ -0,0 +1,112 @@
+"""Полнотекстовый поиск рецептов.
+
+На PostgreSQL у рецепта хранится ``search_vector`` с конфигурацией
+``russian``: название (вес A), названия ингредиентов (B) и описание (C).
+Вектор пересчитывается при сохранении рецепта и ингредиента
+(см. recipes.signals), поиск идет по GIN-индексу с ранжированием.
+На остальных СУБД поиск упрощенный: подстрока в названии, описании
+или названиях ингредиентов. Подстрока ищется регулярным выражением без
+учета регистра: LIKE в SQLite не различает регистр только латиницы.
+
+Ранжируются только ``SEARCH_RESULTS_LIMIT`` новейших совпадений: для
+частых слов вычисление ранга по всем найденным рецептам стоит дороже
+самого поиска, а число результатов (и ``count`` ответа) ограничено.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, F, FloatField, IntegerField, OuterRef, Q,
+                              Subquery, TextField, Value, When)
+from django.db.models.functions import Cast, Coalesce
+
+from .models import RecipeIngredient
+from .utils import normalize_name
+
+SEARCH_CONFIG = 'russian'
+BATCH_SIZE = 10000
+# Релевантность входит в курсор курсорной пагинации (см.
+# recipes.paginator.RecipeCursorPagination).
+ORDERING = ('-rank', '-id')
+
+
+def full_text_supported(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_document():
+    """Выражение поискового вектора рецепта."""
+    ingredient_names = RecipeIngredient.objects.filter(
+        recipe=OuterRef('pk'),
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' '),
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(ingredient_names, output_field=TextField()),
+                     Value('')),
+            weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipes):
+    """Пересчитывает поисковые векторы рецептов ``recipes`` (QuerySet)."""
+    if full_text_supported(recipes):
+        recipes.update(search_vector=search_document())
+
+
+def rebuild(recipes):
+    """Пересчитывает векторы пакетами по диапазонам id, чтобы не держать
+    одну длинную транзакцию на всей таблице. Возвращает число рецептов.
+    """
+    if not full_text_supported(recipes):
+        return 0
+    ids = recipes.order_by('pk').values_list('pk', flat=True)
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return updated
+        update_search_vectors(recipes.filter(pk__gte=batch[0],
+                                             pk__lte=batch[-1]))
+        updated += len(batch)
+        last_id = batch[-1]
+
+
+def search_recipes(queryset, value):
+    """Рецепты по запросу ``value`` в порядке релевантности."""
+    if full_text_supported(queryset):
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        matches = queryset.filter(search_vector=query)
+        # ts_rank возвращает real; double precision без потерь переходит
+        # в значение курсора и обратно.
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+    else:
+        words = normalize_name(value).split()
+        if not words:
+            return queryset
+        matches = queryset
+        for word in words:
+            pattern = re.escape(word)
+            matches = matches.filter(
+                Q(name__iregex=pattern)
+                | Q(text__iregex=pattern)
+                | Q(pk__in=RecipeIngredient.objects.filter(
+                    ingredient__search_name__contains=word,
+                ).values('recipe_id'))
+            )
+        rank = Case(
+            When(name__iregex=re.escape(' '.join(words)), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    candidates = matches.order_by('-id').values('pk')[
+        :settings.SEARCH_RESULTS_LIMIT]
+    return queryset.filter(pk__in=candidates).annotate(
+        rank=rank).order_by(*ORDERING)
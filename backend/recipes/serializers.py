@@ -1,11 +1,18 @@
-from drf_extra_fields.fields import Base64ImageField
+from collections import Counter
+
+from django.db import models, transaction
 from rest_framework.exceptions import ValidationError
 from rest_framework import serializers
+from users.models import Subscribe
 from users.serializers import CustomUserSerializer
-from django.shortcuts import get_object_or_404
 
+from . import cart_totals, pantry, search
+from .caching import get_recipe_fragments
+from .fields import ImageVariantsField, PrimaryKeyListField, RecipeImageField
+from .fieldsets import SparseFieldsetMixin
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     RecipeTag, ShoppingCart, Tag)
+from .versions import bump_version_on_commit
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для модели ингридиентов"""
@@ -44,58 +51,67 @@ class TagSerializer(serializers.ModelSerializer):
         lookup_field = 'slug'
 
 
+class AddRecipeIngredientsListSerializer(serializers.ListSerializer):
+    """Продукты рецепта: все продукты проверяются одним запросом ``IN``,
+    ошибки возвращаются по позициям списка.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = Ingredient.objects.in_bulk(
+            {item['id'] for item in items})
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist']
+        errors = [
+            {} if item['id'] in ingredients
+            else {'id': [message.format(pk_value=item['id'])]}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors, code='does_not_exist')
+        for item in items:
+            item['ingredient'] = ingredients[item.pop('id')]
+        return items
+
+
 class AddRecipeIngredientsSerializer(serializers.ModelSerializer):
     """Сериализатор для продуктов при создании рецепта"""
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
-    )
+    id = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = AddRecipeIngredientsListSerializer
 
 
 class AddRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для рецептов"""
     author = CustomUserSerializer(read_only=True)
     ingredients = AddRecipeIngredientsSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = PrimaryKeyListField(queryset=Tag.objects.all())
     cooking_time = serializers.IntegerField()
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = RecipeImageField(max_length=None, use_url=True)
+    images = ImageVariantsField(source='image')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'images', 'text', 'cooking_time')
 
     def validate_ingredients(self, data):
         """Валидатор ингридиентов"""
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        if not data:
             raise serializers.ValidationError(
                 'Нужно выбрать минимум 1 ингредиент!')
         unique_ingredients = set()
-        for ingredient in ingredients:
-            if ingredient['id'] in unique_ingredients:
+        for ingredient in data:
+            if ingredient['ingredient'] in unique_ingredients:
                 raise serializers.ValidationError(
                              'В рецепте ингредиенты не должны повторяться')
-            unique_ingredients.add(ingredient['id'])
-            try:
-                if int(ingredient.get('amount')) <= 0:
-                    raise serializers.ValidationError(
-                        'Количество должно быть положительным!')
-            except Exception:
-                raise serializers.ValidationError({'amount': 'Количество должно'
-                                      'быть целым числом'})
-            check_id = ingredient['id']
-            check_ingredient = Ingredient.objects.filter(id=check_id)
-            if not check_ingredient.exists():
+            unique_ingredients.add(ingredient['ingredient'])
+            if ingredient['amount'] <= 0:
                 raise serializers.ValidationError(
-                    'Данного продукта нет в базе!')
+                    'Количество должно быть положительным!')
         return data
 
     def validate_cooking_time(self, data):
@@ -116,18 +132,11 @@ class AddRecipeSerializer(serializers.ModelSerializer):
 
     def validate_tags(self, data):
         """Валидатор тегов"""
-        tags = self.initial_data.get('tags')
-        if not tags:
+        if not data:
             raise serializers.ValidationError(
                 'Рецепт не может быть без тегов'
             )
-        for tag_id in tags:
-            if not Tag.objects.filter(id=tag_id).exists():
-                raise serializers.ValidationError(
-                    f'Тег с id = {tag_id} не существует'
-                )
-        tags_bd = set(tags)
-        if len(tags) != len(tags_bd):
+        if len(data) != len(set(data)):
             raise ValidationError('Теги должны быть уникальными')
         return data
 
@@ -139,18 +148,65 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             recipe=recipe,
             amount=ingredient['amount']
         ) for ingredient in ingredients_data])
+        # bulk_create не отправляет сигналы, кэш рецепта и поисковый
+        # вектор обновляются явно.
+        bump_version_on_commit(f'recipe:{recipe.pk}')
+        search.update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+        pantry.record_change(recipe.pk)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Метод создания рецепта"""
         author = self.context.get('request').user
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.save()
-        recipe.tags.set(tags_data)
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag) for tag in tags_data)
         self.create_bulk(recipe, ingredients_data)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """Добавляет, изменяет и удаляет только отличающиеся
+        ингредиенты рецепта."""
+        existing = {item.ingredient_id: item
+                    for item in RecipeIngredient.objects.filter(recipe=recipe)}
+        amounts = {item['ingredient'].pk: item['amount']
+                   for item in ingredients_data}
+        changes = Counter(amounts)
+        changes.subtract({pk: item.amount for pk, item in existing.items()})
+        to_create = [
+            RecipeIngredient(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items() if pk not in existing]
+        to_update = []
+        for pk, item in existing.items():
+            if pk in amounts and item.amount != amounts[pk]:
+                item.amount = amounts[pk]
+                to_update.append(item)
+        to_delete = [item.pk for pk, item in existing.items()
+                     if pk not in amounts]
+        if not (to_create or to_update or to_delete):
+            return
+        if to_delete:
+            RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        RecipeIngredient.objects.bulk_create(to_create)
+        RecipeIngredient.objects.bulk_update(to_update, ('amount',))
+        # bulk_create и bulk_update не отправляют сигналы.
+        pantry.record_change(recipe.pk)
+        cart_totals.recipe_amounts_changed(recipe.pk, changes)
+
+    def update_tags(self, recipe, tags_data):
+        """Добавляет и удаляет только отличающиеся теги рецепта."""
+        existing = set(RecipeTag.objects.filter(
+            recipe=recipe).values_list('tag_id', flat=True))
+        tag_ids = {tag.pk for tag in tags_data}
+        if existing - tag_ids:
+            RecipeTag.objects.filter(
+                recipe=recipe, tag_id__in=existing - tag_ids).delete()
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=pk) for pk in tag_ids - existing)
+
+    @transaction.atomic
     def update(self, recipe, validated_data):
         """Метод редактирования рецепта"""
         recipe.name = validated_data.get('name', recipe.name)
@@ -159,18 +215,12 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             'cooking_time', recipe.cooking_time
         )
         recipe.image = validated_data.get('image', recipe.image)
-        if 'ingredients' in self.initial_data:
-            ingredients = validated_data.pop('ingredients')
-            recipe.ingredients.clear()
-            for ingredient in ingredients:
-                RecipeIngredient.objects.create(
-                    recipe=recipe,
-                    ingredient=ingredient['ingredient'],
-                    amount=ingredient['amount'],
-                )
-        if 'tags' in self.initial_data:
-            tags_data = validated_data.pop('tags')
-            recipe.tags.set(tags_data)
+        if 'ingredients' in validated_data:
+            self.update_ingredients(recipe, validated_data['ingredients'])
+        if 'tags' in validated_data:
+            self.update_tags(recipe, validated_data['tags'])
+        # Сохранение рецепта сбрасывает его кэш и обновляет поисковый
+        # вектор уже по новому составу.
         recipe.save()
         return recipe
 
@@ -182,53 +232,146 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         representation = super().to_representation(recipe)
         representation['ingredients'] = RecipeIngredientSerializer(
             RecipeIngredient.objects.filter(
-                recipe=recipe).all(), many=True).data
+                recipe=recipe).select_related('ingredient'), many=True).data
         return representation
 
 
-class ShowRecipeFullSerializer(serializers.ModelSerializer):
-    """Сериализатор для рецептов."""
+class RecipeAuthorSerializer(CustomUserSerializer):
+    """Автор рецепта без признака подписки текущего пользователя"""
+
+    class Meta(CustomUserSerializer.Meta):
+        fields = ('id', 'email', 'username', 'first_name', 'last_name')
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов, собираемый из кэша одним пакетом"""
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        return self.child.represent(list(recipes))
+
+
+class ShowRecipeFullSerializer(SparseFieldsetMixin,
+                               serializers.ModelSerializer):
+    """Сериализатор для рецептов.
+
+    Общая часть представления кэшируется (см. recipes.caching), поверх
+    нее накладываются признаки текущего пользователя: избранное, корзина
+    и подписка на автора. Поля выбираются параметрами ``?fields=`` и
+    ``?omit=`` (см. recipes.fieldsets).
+    """
     tags = TagSerializer(many=True, read_only=True)
-    author = CustomUserSerializer(read_only=True)
-    ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
+    author = RecipeAuthorSerializer(read_only=True)
+    ingredients = RecipeIngredientSerializer(
+        source='recipeingredient_set', many=True, read_only=True
+    )
+    images = ImageVariantsField(source='image')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'name',
-                  'image', 'text', 'cooking_time', 'is_favorited',
-                  'is_in_shopping_cart')
+                  'image', 'images', 'text', 'cooking_time')
+        list_serializer_class = RecipeListSerializer
+
+    # Столбцы рецепта, которые читают поля представления.
+    FIELD_COLUMNS = {
+        'author': ('author',),
+        'name': ('name',),
+        'image': ('image',),
+        'images': ('image',),
+        'text': ('text',),
+        'cooking_time': ('cooking_time',),
+    }
+
+    def get_user_flags(self, recipes, fieldset):
+        """Избранное, корзина и подписки пользователя в пределах страницы.
+        Признаки, не выбранные в ``fieldset``, не запрашиваются.
+        """
+        favorited, in_cart, subscribed = set(), set(), set()
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return favorited, in_cart, subscribed
+        user = request.user
+        recipe_ids = [recipe.pk for recipe in recipes]
+        if 'is_favorited' in fieldset:
+            favorited = set(Favorite.objects.filter(
+                user=user, recipe_id__in=recipe_ids,
+            ).values_list('recipe_id', flat=True))
+        if 'is_in_shopping_cart' in fieldset:
+            in_cart = set(ShoppingCart.objects.filter(
+                user=user, recipe_id__in=recipe_ids,
+            ).values_list('recipe_id', flat=True))
+        if 'author' in fieldset:
+            subscribed = set(Subscribe.objects.filter(
+                user=user,
+                author_id__in={recipe.author_id for recipe in recipes},
+            ).values_list('author_id', flat=True))
+        return favorited, in_cart, subscribed
+
+    def represent(self, recipes):
+        """Представления рецептов: кэшированная общая часть и признаки
+        текущего пользователя.
+        """
+        if not recipes:
+            return []
+        request = self.context.get('request')
+        host = request.build_absolute_uri('/') if request else ''
+        fieldset = self.fieldset
+        fragments = get_recipe_fragments(
+            recipes, super().to_representation, host,
+            tuple(self.fields) if fieldset.sparse else None)
+        favorited, in_cart, subscribed = self.get_user_flags(
+            recipes, fieldset)
+        representations = []
+        for recipe, fragment in zip(recipes, fragments):
+            representation = dict(fragment)
+            if 'author' in representation:
+                representation['author'] = {
+                    **fragment['author'],
+                    'is_subscribed': recipe.author_id in subscribed,
+                }
+            if 'is_favorited' in fieldset:
+                representation['is_favorited'] = recipe.pk in favorited
+            if 'is_in_shopping_cart' in fieldset:
+                representation['is_in_shopping_cart'] = recipe.pk in in_cart
+            representations.append(representation)
+        return representations
 
-    def get_ingredients(self, obj):
-        """Получает список ингридиентов для рецепта."""
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
-        return RecipeIngredientSerializer(ingredients, many=True).data
+    def to_representation(self, recipe):
+        return self.represent([recipe])[0]
 
-    def get_is_favorited(self, obj):
-        """Проверяет находится ли рецепт в избранном."""
-        request = self.context.get('request')
-        return (request.user.is_authenticated
-                and Favorite.objects.filter(recipe=obj, user=request.user).exists())
 
-    def get_is_in_shopping_cart(self, obj):
-        """Проверяет находится ли рецепт в продуктовой корзине."""
-        request = self.context.get('request')
-        return (request.user.is_authenticated
-                and ShoppingCart.objects.filter(recipe=obj, user=request.user).exists())
+class CookableQuerySerializer(serializers.Serializer):
+    """Параметры поиска рецептов по имеющимся ингредиентам"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=50,
+    )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список рецептов для пакетного добавления и удаления"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=100,
+    )
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
-    """Сериализатор избранных рецептов"""
-    id = serializers.CharField(
+    """Сериализатор избранных рецептов: краткое представление рецепта
+    записи избранного."""
+    id = serializers.IntegerField(
         read_only=True, source='recipe.id',
     )
-    cooking_time = serializers.CharField(
+    cooking_time = serializers.IntegerField(
         read_only=True, source='recipe.cooking_time',
     )
-    image = serializers.CharField(
+    image = serializers.ImageField(
         read_only=True, source='recipe.image',
     )
+    images = ImageVariantsField(source='recipe.image')
     name = serializers.CharField(
         read_only=True, source='recipe.name',
     )
@@ -250,23 +393,25 @@ class FavoriteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Favorite
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор продуктовой корзины"""
-    id = serializers.CharField(
+    """Сериализатор продуктовой корзины: краткое представление рецепта
+    записи корзины."""
+    id = serializers.IntegerField(
         read_only=True,
         source='recipe.id',
     )
-    cooking_time = serializers.CharField(
+    cooking_time = serializers.IntegerField(
         read_only=True,
         source='recipe.cooking_time',
     )
-    image = serializers.CharField(
+    image = serializers.ImageField(
         read_only=True,
         source='recipe.image',
     )
+    images = ImageVariantsField(source='recipe.image')
     name = serializers.CharField(
         read_only=True,
         source='recipe.name',
@@ -274,4 +419,4 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ShoppingCart
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
@@ -0,0 +1,178 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Subscribe, User
+
+from . import cart_totals, marks, pantry, search, timeline
+from .counters import change_counter
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     RecipeTag, ShoppingCart, Tag)
+from .versions import bump_version_on_commit
+
+
+def touch_recipes(**filters):
+    """Отмечает изменение представления рецептов для условных GET."""
+    Recipe.objects.filter(**filters).update(updated_at=timezone.now())
+    bump_version_on_commit('recipes')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    """Сбрасывает индексы и кэш каталога ингредиентов."""
+    bump_version_on_commit('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Обновляет поисковые векторы рецептов с этим ингредиентом."""
+    if not created:
+        search.update_search_vectors(Recipe.objects.filter(
+            recipeingredient__ingredient=instance))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(sender, **kwargs):
+    """Сбрасывает кэш каталога тегов."""
+    bump_version_on_commit('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    """Сбрасывает кэшированное представление рецепта и обновляет
+    его поисковый вектор. У нового рецепта еще нет ингредиентов, вектор
+    строится после их добавления (сериализатор, админка).
+    """
+    bump_version_on_commit(f'recipe:{instance.pk}')
+    bump_version_on_commit('recipes')
+    if not created:
+        search.update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=RecipeTag)
+def recipe_relation_changed(sender, instance, **kwargs):
+    bump_version_on_commit(f'recipe:{instance.recipe_id}')
+    if sender is RecipeIngredient:
+        pantry.record_change(instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeTag)
+def recipe_relation_saved(sender, instance, **kwargs):
+    """Удаление связей не трогает рецепт: оно идет вместе с сохранением
+    рецепта (API, админка) или с удалением рецепта, тега или ингредиента,
+    которые меняют свои версии.
+    """
+    touch_recipes(pk=instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith('post_'):
+        return
+    if sender is Recipe.ingredients.through:
+        if not reverse:
+            pantry.record_change(instance.pk)
+        elif pk_set is None:
+            bump_version_on_commit('pantry')
+        else:
+            for pk in pk_set:
+                pantry.record_change(pk)
+    if not reverse:
+        bump_version_on_commit(f'recipe:{instance.pk}')
+        touch_recipes(pk=instance.pk)
+    elif pk_set is None:
+        # clear() со стороны тега или ингредиента: затронутые рецепты
+        # неизвестны, сбрасывается весь каталог.
+        bump_version_on_commit(
+            'tags' if sender is Recipe.tags.through else 'ingredients')
+    else:
+        for pk in pk_set:
+            bump_version_on_commit(f'recipe:{pk}')
+        touch_recipes(pk__in=pk_set)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает представления рецептов автора."""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_version_on_commit(f'user:{instance.pk}')
+    if not kwargs.get('created'):
+        touch_recipes(author_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """Убирает ингредиенты удаляемого рецепта из корзин."""
+    cart_totals.recipe_deleting(instance.pk)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_publishing(sender, instance, **kwargs):
+    """Решает, рассылать ли новый рецепт по лентам подписчиков."""
+    if instance._state.adding:
+        instance.in_timelines = timeline.fans_out(instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, [instance.author_id], 'recipes_count', 1)
+        timeline.recipe_published(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, [instance.author_id], 'recipes_count', -1)
+    cart_totals.recipe_deleted(instance.pk)
+    pantry.record_change(instance.pk)
+    bump_version_on_commit('recipes')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_marked(sender, instance, created, **kwargs):
+    """Отметка добавлена через ORM (админка, скрипты), см. recipes.marks."""
+    if created:
+        marks.recipes_marked(sender, instance.user_id, [instance.recipe_id])
+        if sender is ShoppingCart:
+            # Сохранение через ORM может идти вне транзакции.
+            with transaction.atomic():
+                cart_totals.recipes_added(
+                    instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_unmarked(sender, instance, **kwargs):
+    """Отметка удалена через ORM, в том числе каскадно."""
+    marks.recipes_unmarked(sender, instance.user_id, [instance])
+    if sender is ShoppingCart:
+        with transaction.atomic():
+            cart_totals.recipes_removed(
+                instance.user_id, [instance.recipe_id])
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def subscriptions_changed(sender, instance, **kwargs):
+    """Меняет версию отметок пользователя: от подписок зависят его
+    ответы со списками рецептов.
+    """
+    bump_version_on_commit(f'marks:{instance.user_id}')
+
+
+@receiver(post_save, sender=Subscribe)
+def author_followed(sender, instance, created, **kwargs):
+    if created:
+        timeline.author_followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def author_unfollowed(sender, instance, **kwargs):
+    timeline.author_unfollowed(instance.user_id, instance.author_id)
@@ -0,0 +1,88 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_content(size=(40, 30), color='red', format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format)
+    return buffer.getvalue()
+
+
+def image(**kwargs):
+    """Картинка в виде data URI, как ее присылает фронтенд."""
+    return 'data:image/png;base64,{}'.format(
+        base64.b64encode(image_content(**kwargs)).decode())
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', password='pw',
+        first_name=name, last_name=name)
+
+
+# Изменения версий применяются после фиксации транзакции, поэтому тесты
+# работают с настоящими транзакциями (TransactionTestCase).
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeAPITestCase(TransactionTestCase):
+    """Пользователи, теги и ингредиенты для тестов API рецептов."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author, self.user, self.other = (
+            create_user(name) for name in ('author', 'user', 'other'))
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        self.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'молоко', 'сахар')]
+        self.author_client = client_for(self.author)
+        self.user_client = client_for(self.user)
+        self.other_client = client_for(self.other)
+
+    def recipe_payload(self, amounts, name='Блины', **fields):
+        """Данные рецепта, ``amounts`` - количества ингредиентов
+        по порядку, нулевые пропускаются.
+        """
+        return {
+            'name': name,
+            'text': 'Смешать и пожарить',
+            'cooking_time': 20,
+            'image': image(),
+            'tags': [self.tag.pk],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient, amount in zip(self.ingredients, amounts)
+                if amount],
+            **fields,
+        }
+
+    def create_recipe(self, amounts, name='Блины', client=None, **fields):
+        """Создает рецепт через API, по умолчанию от имени автора."""
+        response = (client or self.author_client).post(
+            '/api/recipes/', self.recipe_payload(amounts, name, **fields),
+            format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Recipe.objects.get(pk=response.json()['id'])
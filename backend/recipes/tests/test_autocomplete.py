@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from rest_framework.test import APIClient
+
+from recipes import autocomplete
+from recipes.autocomplete import IngredientIndex
+from recipes.models import Ingredient
+
+NAMES = (
+    'молоко', 'молоко кокосовое', 'сгущенное молоко', 'кокосовое молоко',
+    'томаты', 'соус томатный', 'перец черный', 'перец чили', 'паприка',
+)
+
+
+class IngredientIndexTests(SimpleTestCase):
+    """Ранжирование и опечатки в индексе ингредиентов."""
+
+    def setUp(self):
+        self.index = IngredientIndex(enumerate(NAMES))
+
+    def search(self, query, limit=10):
+        return [NAMES[pk] for pk in self.index.search(query, limit)]
+
+    def test_ranking(self):
+        # Начало названия, начало слова (раньше в названии - выше),
+        # затем подстрока.
+        self.assertEqual(self.search('молок'), [
+            'молоко', 'молоко кокосовое', 'кокосовое молоко',
+            'сгущенное молоко'])
+        self.assertEqual(self.search('томат'), ['томаты', 'соус томатный'])
+        self.assertEqual(self.search('ри'), ['паприка'])
+
+    def test_limit(self):
+        self.assertEqual(self.search('молок', limit=2),
+                         ['молоко', 'молоко кокосовое'])
+        self.assertEqual(self.search('пер', limit=1), ['перец черный'])
+
+    def test_typos(self):
+        self.assertEqual(self.search('малоко')[:2],
+                         ['молоко', 'молоко кокосовое'])
+        self.assertEqual(self.search('перец чилли'), ['перец чили'])
+        self.assertEqual(self.search('паприак'), ['паприка'])
+        # Первая буква и короткие запросы без опечаток.
+        self.assertEqual(self.search('априка'), ['паприка'])
+        self.assertEqual(self.search('мл'), [])
+
+    def test_normalization(self):
+        self.assertEqual(self.search('  СГУЩЁННОЕ  '), ['сгущенное молоко'])
+        self.assertEqual(self.search(''), [])
+
+    def test_substring_scan_bounded(self):
+        index = IngredientIndex(
+            (pk, f'продукт {pk:04}') for pk in range(2000))
+        self.assertEqual(len(index.substrings('одукт', 50)), 50)
+        self.assertEqual(len(index.substrings('0', 10)), 10)
+
+    def test_long_query(self):
+        self.assertEqual(self.search('кокосовое моло'), ['кокосовое молоко'])
+        self.assertEqual(self.search('олоко кокосовое'), ['молоко кокосовое'])
+        self.assertEqual(self.search('олоко кокосовый'), [])
+
+
+class IngredientSearchTests(TransactionTestCase):
+    """Автодополнение через API и обновление индекса после фиксации
+    изменений каталога.
+    """
+
+    def setUp(self):
+        cache.clear()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г', search_name=name)
+            for name in NAMES)
+        self.client = APIClient()
+
+    def names(self, query):
+        response = self.client.get('/api/ingredients/', {'name': query})
+        return [item['name'] for item in response.json()]
+
+    def test_in_memory(self):
+        self.assertEqual(self.names('Перец'), ['перец черный', 'перец чили'])
+        Ingredient.objects.create(name='Перец душистый', measurement_unit='г')
+        self.assertEqual(self.names('перец'), [
+            'Перец душистый', 'перец черный', 'перец чили'])
+
+    @override_settings(INGREDIENTS_AUTOCOMPLETE_IN_MEMORY=False)
+    def test_database(self):
+        self.assertEqual(
+            self.names('томат'), ['томаты', 'соус томатный'])
+        self.assertEqual(autocomplete.search_ingredients('xyz'), [])
@@ -0,0 +1,101 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+
+from recipes import cart_totals
+from recipes.models import (RecipeIngredient, ShoppingCart,
+                            ShoppingCartIngredient)
+from recipes.tests.base import RecipeAPITestCase
+
+
+class CartTotalsTests(RecipeAPITestCase):
+    """ShoppingCartIngredient совпадает с суммой ингредиентов корзины."""
+
+    def setUp(self):
+        super().setUp()
+        self.pancakes = self.create_recipe([200, 300, 0])
+        self.cake = self.create_recipe([100, 0, 50], name='Пирог')
+
+    def aggregated_cart(self, user):
+        totals = Counter()
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe__shopping_cart__user=user,
+        ).values_list('ingredient_id', 'amount'):
+            totals[ingredient_id] += amount
+        return dict(totals)
+
+    def assertCartTotals(self, user):
+        stored = dict(ShoppingCartIngredient.objects.filter(
+            user=user).values_list('ingredient_id', 'amount'))
+        self.assertEqual(stored, self.aggregated_cart(user))
+
+    def test_add_and_remove(self):
+        url = f'/api/recipes/{self.pancakes.pk}/shopping_cart/'
+        self.assertEqual(self.user_client.post(url).status_code, 201)
+        self.assertCartTotals(self.user)
+        self.assertEqual(self.user_client.post(url).status_code, 400)
+        self.assertCartTotals(self.user)
+        self.assertEqual(self.user_client.delete(url).status_code, 204)
+        self.assertFalse(
+            ShoppingCartIngredient.objects.filter(user=self.user).exists())
+
+    def test_batch(self):
+        url = '/api/recipes/shopping_cart/'
+        ids = [self.pancakes.pk, self.cake.pk]
+        self.user_client.post(url, {'recipes': ids}, format='json')
+        self.assertCartTotals(self.user)
+        self.assertEqual(
+            ShoppingCartIngredient.objects.get(
+                user=self.user, ingredient=self.ingredients[0]).amount,
+            300)
+        self.user_client.delete(
+            url, {'recipes': [self.cake.pk]}, format='json')
+        self.assertCartTotals(self.user)
+
+    def test_recipe_changed(self):
+        for client in (self.user_client, self.other_client):
+            client.post(f'/api/recipes/{self.pancakes.pk}/shopping_cart/')
+        response = self.author_client.patch(
+            f'/api/recipes/{self.pancakes.pk}/', {'ingredients': [
+                {'id': self.ingredients[1].pk, 'amount': 100},
+                {'id': self.ingredients[2].pk, 'amount': 10},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCartTotals(self.user)
+        self.assertCartTotals(self.other)
+
+    def test_recipe_deleted(self):
+        self.user_client.post(
+            '/api/recipes/shopping_cart/',
+            {'recipes': [self.pancakes.pk, self.cake.pk]}, format='json')
+        response = self.author_client.delete(
+            f'/api/recipes/{self.cake.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertCartTotals(self.user)
+
+    def test_orm_changes(self):
+        # Админка и скрипты меняют корзину через ORM.
+        cart = ShoppingCart.objects.create(user=self.user, recipe=self.cake)
+        ShoppingCart.objects.create(user=self.other, recipe=self.cake)
+        self.assertCartTotals(self.user)
+        cart.delete()
+        self.assertCartTotals(self.user)
+        self.cake.delete()
+        self.assertCartTotals(self.other)
+
+    def test_user_deleted(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.cake)
+        self.user.delete()
+        self.assertFalse(ShoppingCartIngredient.objects.exists())
+
+    def test_rebuild(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        ShoppingCartIngredient.objects.all().delete()
+        cart_totals.rebuild()
+        self.assertCartTotals(self.user)
+
+    def test_recipe_in_cart_once(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        self.assertCartTotals(self.user)
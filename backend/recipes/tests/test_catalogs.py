@@ -0,0 +1,88 @@
+import gzip
+
+from django.core.cache import cache
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from rest_framework.test import APIClient
+
+from recipes.checks import check_shared_cache
+from recipes.models import Ingredient, Tag
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+MEMCACHED = {'default': {
+    'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+    'LOCATION': 'memcached:11211'}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Предупреждение о кэше в памяти процесса."""
+
+    @override_settings(CACHES=LOCMEM)
+    def test_local_cache(self):
+        self.assertEqual(
+            [warning.id for warning in check_shared_cache(None)],
+            ['recipes.W001'])
+
+    @override_settings(CACHES=MEMCACHED)
+    def test_shared_cache(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class CatalogTests(TransactionTestCase):
+    """Кэшированные ответы каталогов тегов и ингредиентов."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        for name in ('мука', 'молоко'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def assertChanged(self, url, change):
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=f'W/{etag}').status_code,
+            304)
+        change()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        return changed
+
+    def test_tags(self):
+        response = self.assertChanged('/api/tags/', lambda: (
+            Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')))
+        self.assertEqual(
+            [tag['slug'] for tag in response.json()], ['breakfast', 'lunch'])
+
+    def test_ingredients(self):
+        ingredient = Ingredient.objects.get(name='мука')
+
+        def rename():
+            ingredient.name = 'мука ржаная'
+            ingredient.save()
+
+        response = self.assertChanged('/api/ingredients/', rename)
+        self.assertIn('мука ржаная',
+                      [item['name'] for item in response.json()])
+        self.assertChanged('/api/ingredients/', ingredient.delete)
+
+    def test_query_cached_separately(self):
+        names = [item['name'] for item in self.client.get(
+            '/api/ingredients/', {'name': 'молок'}).json()]
+        self.assertEqual(names, ['молоко'])
+        self.assertEqual(len(self.client.get('/api/ingredients/').json()), 2)
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_SIZE=10)
+    def test_compressed(self):
+        plain = self.client.get('/api/ingredients/')
+        response = self.client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', response['Vary'])
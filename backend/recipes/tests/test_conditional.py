@@ -0,0 +1,88 @@
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/'
+
+
+class ConditionalGetTests(RecipeAPITestCase):
+    """ETag ответов рецептов: 304 без изменений и новый ETag после
+    изменений, от которых зависит ответ.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([100, 0, 0])
+        self.url = f'{URL}{self.recipe.pk}/'
+
+    def assertChanged(self, client, url, change, changed=True):
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            200 if changed else 304)
+
+    def test_not_modified(self):
+        for url in (self.url, URL, f'{URL}feed/'):
+            response = self.user_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response['ETag']
+            response = self.user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response.content, b'')
+            response = self.user_client.get(
+                url, HTTP_IF_NONE_MATCH='"other"')
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_recipe_changes(self):
+        self.assertChanged(self.user_client, self.url, lambda: (
+            self.author_client.patch(
+                self.url, {'name': 'Оладьи'}, format='json')))
+        self.assertChanged(self.user_client, URL, lambda: (
+            self.author_client.patch(self.url, {'ingredients': [
+                {'id': self.ingredients[1].pk, 'amount': 5},
+            ]}, format='json')))
+        self.assertChanged(self.user_client, self.url, self.tag.save)
+        self.assertChanged(self.user_client, self.url, self.author.save)
+
+    def test_marks(self):
+        favorite = f'{self.url}favorite/'
+        self.assertChanged(
+            self.user_client, self.url,
+            lambda: self.user_client.post(favorite))
+        self.assertChanged(
+            self.user_client, URL,
+            lambda: self.user_client.delete(favorite))
+        self.assertChanged(
+            self.user_client, self.url,
+            lambda: self.other_client.post(favorite), changed=False)
+        self.assertChanged(
+            self.user_client, self.url, lambda: self.user_client.post(
+                f'/api/users/{self.author.pk}/subscribe/'))
+
+    def test_representation(self):
+        etag = self.user_client.get(self.url)['ETag']
+        response = self.user_client.get(
+            self.url, HTTP_ACCEPT='application/msgpack',
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept', response['Vary'])
+        response = self.user_client.get(
+            f'{self.url}?fields=id,name', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_per_representation(self):
+        etags = {
+            self.user_client.get(self.url, **kwargs)['ETag']
+            for kwargs in (
+                {},
+                {'HTTP_ACCEPT': 'application/msgpack'},
+                {'data': {'format': 'msgpack'}},
+                {'data': {'fields': 'id,name'}},
+                {'data': {'omit': 'text'}},
+            )}
+        self.assertEqual(len(etags), 5)
+        self.assertNotEqual(
+            self.user_client.get(self.url)['ETag'],
+            self.other_client.get(self.url)['ETag'])
@@ -0,0 +1,65 @@
+import io
+
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.tests.base import RecipeAPITestCase
+
+
+class CounterTests(RecipeAPITestCase):
+    """Денормализованные счетчики рецепта."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([100, 0, 0])
+
+    def assertCounters(self):
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.favorites_count,
+            Favorite.objects.filter(recipe=self.recipe).count())
+        self.assertEqual(
+            self.recipe.in_carts_count,
+            ShoppingCart.objects.filter(recipe=self.recipe).count())
+
+    def test_marks(self):
+        for action in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{self.recipe.pk}/{action}/'
+            for client in (self.user_client, self.other_client):
+                client.post(url)
+                self.assertCounters()
+            self.user_client.post(url)
+            self.assertCounters()
+            self.user_client.delete(url)
+            self.user_client.delete(url)
+            self.assertCounters()
+
+    def test_batch(self):
+        second = self.create_recipe([0, 10, 0], name='Омлет')
+        ids = [self.recipe.pk, second.pk]
+        for action in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{action}/'
+            self.user_client.post(url, {'recipes': ids}, format='json')
+            self.user_client.post(url, {'recipes': ids}, format='json')
+            self.assertCounters()
+            self.user_client.delete(
+                url, {'recipes': [self.recipe.pk]}, format='json')
+            self.assertCounters()
+        second.refresh_from_db()
+        self.assertEqual(
+            (second.favorites_count, second.in_carts_count), (1, 1))
+
+    def test_user_deleted(self):
+        for action in ('favorite', 'shopping_cart'):
+            self.user_client.post(f'/api/recipes/{self.recipe.pk}/{action}/')
+        self.user.delete()
+        self.assertCounters()
+
+    def test_reconcile(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=5, in_carts_count=0)
+        call_command('reconcile_counters', stdout=io.StringIO())
+        self.assertCounters()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
@@ -0,0 +1,108 @@
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.fieldsets import Fieldset
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/'
+FIELDS = {'id', 'tags', 'author', 'ingredients', 'name', 'image', 'images',
+          'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart'}
+
+
+def fieldset(query=''):
+    return Fieldset(Request(APIRequestFactory().get(f'/?{query}')))
+
+
+class FieldsetTests(SimpleTestCase):
+    """Разбор параметров ``?fields=`` и ``?omit=``."""
+
+    def test_parse(self):
+        self.assertFalse(fieldset().sparse)
+        self.assertIn('text', fieldset())
+        selected = fieldset('fields= name, ,id,&omit=id')
+        self.assertTrue(selected.sparse)
+        self.assertEqual(selected.fields, {'id', 'name'})
+        self.assertIn('name', selected)
+        self.assertNotIn('id', selected)
+        self.assertNotIn('text', selected)
+        self.assertEqual(fieldset('fields=').fields, set())
+        self.assertFalse(fieldset('omit=,').sparse)
+
+    def test_key(self):
+        self.assertEqual(fieldset('fields=name,id').key,
+                         fieldset('fields=id,name').key)
+        self.assertNotEqual(fieldset('fields=id').key,
+                            fieldset('omit=id').key)
+        self.assertNotEqual(fieldset().key, fieldset('fields=').key)
+
+    def test_columns(self):
+        columns = {'name': ('name',), 'image': ('image',),
+                   'images': ('image',), 'text': ('text',)}
+        self.assertEqual(
+            fieldset('fields=id,images,image').columns(columns, 'author'),
+            ['author', 'image'])
+        self.assertEqual(fieldset('omit=text,image').columns(columns),
+                         ['image', 'name'])
+
+
+class SparseFieldsetTests(RecipeAPITestCase):
+    """Выбор полей в ответах API рецептов и сокращение запросов."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([200, 300, 0])
+
+    def fields(self, url, **params):
+        response = self.user_client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return set(data['results'][0] if 'results' in data else data)
+
+    def recipe_queries(self, **params):
+        """SQL запросов строк рецептов при выдаче списка."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                self.user_client.get(URL, params).status_code, 200)
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('SELECT "recipes_recipe"."id", ')]
+
+    def test_fields(self):
+        detail = f'{URL}{self.recipe.pk}/'
+        for url in (URL, detail):
+            self.assertEqual(self.fields(url), FIELDS)
+            self.assertEqual(
+                self.fields(url, fields='id,name,is_favorited'),
+                {'id', 'name', 'is_favorited'})
+            self.assertEqual(
+                self.fields(url, omit='text,ingredients,is_favorited'),
+                FIELDS - {'text', 'ingredients', 'is_favorited'})
+            self.assertEqual(
+                self.fields(url, fields='id,name,text', omit='text'),
+                {'id', 'name'})
+
+    def test_unknown_fields(self):
+        self.assertEqual(self.fields(URL, fields='id,unknown'), {'id'})
+        self.assertEqual(self.fields(URL, omit='unknown'), FIELDS)
+        self.assertEqual(self.fields(URL, fields='unknown'), set())
+
+    def test_only_selected_columns(self):
+        full, = self.recipe_queries()
+        self.assertIn('"recipes_recipe"."text"', full)
+        sparse, = self.recipe_queries(fields='id,name')
+        self.assertIn('"recipes_recipe"."name"', sparse)
+        for column in ('text', 'image', 'cooking_time'):
+            self.assertNotIn(f'"recipes_recipe"."{column}"', sparse)
+        omitted, = self.recipe_queries(omit='text')
+        self.assertNotIn('"recipes_recipe"."text"', omitted)
+        self.assertIn('"recipes_recipe"."image"', omitted)
+
+    def test_user_flags_not_queried(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.user_client.get(URL, {'fields': 'id,name'})
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        for table in ('recipes_favorite', 'recipes_shoppingcart',
+                      'users_subscribe'):
+            self.assertNotIn(table, tables)
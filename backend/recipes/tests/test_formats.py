@@ -0,0 +1,144 @@
+import datetime
+import decimal
+import gzip
+import json
+import uuid
+
+import brotli
+import msgpack
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from recipes.renderers import MessagePackRenderer, ORJSONRenderer
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/'
+MSGPACK = 'application/msgpack'
+DATA = {
+    'name': 'Блины',
+    'values': [1, 2.5, None, True, 2 ** 60],
+    'amount': decimal.Decimal('1.50'),
+    'detail': gettext_lazy('Not found.'),
+    'separators': 'a b c',
+    1: 'int key',
+    'updated_at': timezone.now(),
+    'date': datetime.date(2024, 1, 2),
+    'time': datetime.time(10, 30, 0, 123456),
+    'uuid': uuid.uuid4(),
+}
+
+
+class RendererTests(SimpleTestCase):
+    """orjson и MessagePack пишут данные так же, как JSONRenderer DRF."""
+
+    def test_orjson_parity(self):
+        self.assertEqual(ORJSONRenderer().render(DATA),
+                         JSONRenderer().render(DATA))
+
+    def test_orjson_indent(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            ORJSONRenderer().render(DATA, media_type),
+            JSONRenderer().render(DATA, media_type))
+
+    def test_msgpack(self):
+        data = {key: value for key, value in DATA.items()
+                if isinstance(key, str)}
+        self.assertEqual(
+            msgpack.unpackb(MessagePackRenderer().render(data)),
+            json.loads(ORJSONRenderer().render(data)))
+
+    def test_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+
+class MessagePackTests(RecipeAPITestCase):
+    """Выбор MessagePack заголовком Accept и параметром ``?format=``."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([200, 300, 0])
+
+    def test_negotiation(self):
+        expected = self.user_client.get(URL).json()
+        for kwargs in ({'HTTP_ACCEPT': MSGPACK},
+                       {'data': {'format': 'msgpack'}}):
+            response = self.user_client.get(URL, **kwargs)
+            self.assertEqual(response.status_code, 200, kwargs)
+            self.assertEqual(response['Content-Type'], MSGPACK)
+            self.assertEqual(msgpack.unpackb(response.content), expected)
+        response = self.user_client.get(
+            URL, HTTP_ACCEPT=f'{MSGPACK};q=0.5, application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_catalog(self):
+        response = self.user_client.get('/api/tags/', HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(response['Content-Type'], MSGPACK)
+        self.assertEqual(msgpack.unpackb(response.content),
+                         self.user_client.get('/api/tags/').json())
+
+    def test_request_body(self):
+        response = self.author_client.post(
+            URL, msgpack.packb(self.recipe_payload([100, 0, 0])),
+            content_type=MSGPACK, HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(msgpack.unpackb(response.content)['name'], 'Блины')
+        response = self.author_client.post(
+            URL, b'\xc1', content_type=MSGPACK)
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_SIZE=100)
+class CompressionTests(RecipeAPITestCase):
+    """Какие ответы сжимаются и каким алгоритмом."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([200, 300, 0])
+        self.url = f'{URL}{self.recipe.pk}/'
+
+    def get(self, url=None, encoding='gzip, deflate, br', **kwargs):
+        return self.user_client.get(
+            url or self.url, HTTP_ACCEPT_ENCODING=encoding, **kwargs)
+
+    def test_algorithm(self):
+        body = self.get(encoding='').content
+        response = self.get()
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), body)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response = self.get(encoding='gzip;q=1, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), body)
+        response = self.get(encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, body)
+
+    def test_msgpack(self):
+        response = self.get(HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(
+            msgpack.unpackb(brotli.decompress(response.content))['id'],
+            self.recipe.pk)
+
+    def test_not_compressed(self):
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=100000):
+            self.assertFalse(self.get().has_header('Content-Encoding'))
+        # HTML браузерного API не сжимается (BREACH).
+        response = self.get(HTTP_ACCEPT='text/html')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        # Потоковый список покупок.
+        self.user_client.post(f'{self.url}shopping_cart/')
+        response = self.get(f'{URL}download_shopping_cart/')
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_weak_etag(self):
+        plain = self.get(encoding='')
+        compressed = self.get()
+        self.assertFalse(plain['ETag'].startswith('W/'))
+        self.assertEqual(compressed['ETag'], f'W/{plain["ETag"]}')
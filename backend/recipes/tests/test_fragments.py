@@ -0,0 +1,60 @@
+from recipes.caching import get_recipe_fragments
+from recipes.tests.base import RecipeAPITestCase
+from recipes.versions import bump_version
+
+
+class FragmentTests(RecipeAPITestCase):
+    """Общие представления рецептов в кэше и их сброс."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([100, 0, 0])
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_versions(self):
+        built = []
+
+        def build(recipe):
+            built.append(recipe.pk)
+            return {'id': recipe.pk}
+
+        recipes = [self.recipe]
+        get_recipe_fragments(recipes, build)
+        get_recipe_fragments(recipes, build)
+        self.assertEqual(built, [self.recipe.pk])
+        for name in (f'recipe:{self.recipe.pk}', f'user:{self.author.pk}',
+                     'tags', 'ingredients'):
+            bump_version(name)
+            get_recipe_fragments(recipes, build)
+        self.assertEqual(len(built), 5)
+        get_recipe_fragments(recipes, build, fields=('id',))
+        self.assertEqual(len(built), 6)
+
+    def test_recipe_saved(self):
+        self.assertEqual(self.user_client.get(self.url).json()['name'],
+                         'Блины')
+        self.recipe.name = 'Оладьи'
+        self.recipe.save()
+        self.assertEqual(self.user_client.get(self.url).json()['name'],
+                         'Оладьи')
+
+    def test_author_profile(self):
+        for url in (self.url, '/api/recipes/'):
+            self.user_client.get(url)
+        response = self.author_client.patch(
+            '/api/users/me/', {'first_name': 'Иван'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            self.user_client.get(self.url).json()['author']['first_name'],
+            'Иван')
+        self.assertEqual(
+            self.user_client.get('/api/recipes/').json()[
+                'results'][0]['author']['first_name'],
+            'Иван')
+
+    def test_tag_renamed(self):
+        self.user_client.get(self.url)
+        self.tag.name = 'Ужин'
+        self.tag.save()
+        self.assertEqual(
+            self.user_client.get(self.url).json()['tags'][0]['name'], 'Ужин')
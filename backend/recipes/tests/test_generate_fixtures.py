@@ -0,0 +1,73 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Recipe, ShoppingCart, SimilarRecipe,
+                            Tag, TrendingCheckpoint)
+from users.models import User
+
+
+class GenerateFixturesTests(TestCase):
+    """Генератор синтетических данных на небольшом объеме."""
+
+    def generate(self, **options):
+        options = {'users': 8, 'recipes': 30, 'tags': 4, 'ingredients': 40,
+                   'favorites': 4, 'carts': 2, 'subscriptions': 3,
+                   'batch_size': 7, **options}
+        call_command('generate_fixtures', stdout=io.StringIO(), **options)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        self.generate()
+        self.assertEqual(User.objects.count(), 8)
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertEqual(Tag.objects.count(), 4)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count,
+                Favorite.objects.filter(recipe=recipe).count())
+            self.assertEqual(
+                recipe.in_carts_count,
+                ShoppingCart.objects.filter(recipe=recipe).count())
+        for user in User.objects.all():
+            self.assertEqual(
+                user.recipes_count,
+                Recipe.objects.filter(author=user).count())
+
+    def test_similar_recipes_built(self):
+        self.generate()
+        self.assertFalse(Recipe.objects.filter(similar_stale=True).exists())
+        self.assertTrue(all(
+            0 < score <= 1 + 1e-6
+            for score in SimilarRecipe.objects.values_list(
+                'score', flat=True)))
+
+    def test_trending_scores(self):
+        self.generate()
+        self.assertTrue(TrendingCheckpoint.objects.exists())
+        self.assertTrue(Recipe.objects.filter(trending_score__gt=0).exists())
+        # Вклад события не больше его веса.
+        for recipe in Recipe.objects.all():
+            self.assertLessEqual(
+                recipe.trending_score,
+                recipe.favorites_count + recipe.in_carts_count * 0.5 + 1e-6)
+
+    def test_second_run_appends(self):
+        self.generate()
+        self.generate(tags=2)
+        self.assertEqual(User.objects.count(), 16)
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertEqual(Tag.objects.count(), 4)
+
+    def test_cached_catalogs_reset(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/tags/').json(), [])
+        self.assertEqual(client.get('/api/recipes/').json()['count'], 0)
+        self.generate()
+        self.assertEqual(len(client.get('/api/tags/').json()), 4)
+        self.assertEqual(client.get('/api/recipes/').json()['count'], 30)
@@ -0,0 +1,74 @@
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from recipes import images
+from recipes.models import Recipe
+from recipes.tests.base import RecipeAPITestCase, image
+
+
+class ImageVariantsTests(RecipeAPITestCase):
+    """Картинки по хэшу содержимого и ссылки на их копии в ответах."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([200, 300, 0])
+        self.variants = images.variant_names(self.recipe.image.name)
+
+    def assertVariants(self, data):
+        self.assertEqual(set(data['images']), {'thumbnail', 'detail'})
+        for variant, formats in data['images'].items():
+            self.assertEqual(set(formats), {'webp', 'jpeg'})
+            for image_format, url in formats.items():
+                name = self.variants[variant][image_format]
+                self.assertEqual(url, f'http://testserver/media/{name}')
+                self.assertTrue(default_storage.exists(name))
+
+    def test_stored_by_hash(self):
+        self.assertIsNotNone(self.variants)
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+        other = self.create_recipe([100, 0, 0], name='Пирог')
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        changed = self.create_recipe(
+            [100, 0, 0], name='Торт', image=image(color='blue'))
+        self.assertNotEqual(changed.image.name, self.recipe.image.name)
+
+    def test_variant_size(self):
+        recipe = self.create_recipe(
+            [100, 0, 0], image=image(size=(1600, 900)))
+        variants = images.variant_names(recipe.image.name)
+        for variant, size in (('thumbnail', (400, 225)),
+                              ('detail', (1200, 675))):
+            for name in variants[variant].values():
+                with default_storage.open(name) as file, \
+                        Image.open(file) as variant_image:
+                    self.assertEqual(variant_image.size, size)
+
+    def test_recipe_responses(self):
+        self.assertVariants(self.author_client.get(
+            f'/api/recipes/{self.recipe.pk}/').json())
+        self.assertVariants(
+            self.author_client.get('/api/recipes/').json()['results'][0])
+
+    def test_mark_responses(self):
+        for mark in ('favorite', 'shopping_cart'):
+            response = self.user_client.post(
+                f'/api/recipes/{self.recipe.pk}/{mark}/')
+            self.assertEqual(response.status_code, 201, response.content)
+            data = response.json()
+            self.assertEqual(data['id'], self.recipe.pk)
+            self.assertVariants(data)
+
+    def test_subscription_responses(self):
+        response = self.user_client.post(
+            f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertVariants(response.json()['recipes'][0])
+        self.assertVariants(self.user_client.get(
+            '/api/users/subscriptions/').json()['results'][0]['recipes'][0])
+
+    def test_legacy_image(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image='recipes/images/legacy.png')
+        data = self.user_client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/').json()
+        self.assertIsNone(data['images'])
@@ -0,0 +1,91 @@
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, ShoppingCart
+from recipes.tests.base import RecipeAPITestCase
+
+ACTIONS = {'favorite': Favorite, 'shopping_cart': ShoppingCart}
+
+
+class MarkTests(RecipeAPITestCase):
+    """Добавление в избранное и корзину по одному рецепту и пакетом."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe([100, 0, 0])
+
+    def test_add_response(self):
+        for action, model in ACTIONS.items():
+            url = f'/api/recipes/{self.recipe.pk}/{action}/'
+            response = self.user_client.post(url)
+            self.assertEqual(response.status_code, 201)
+            data = response.json()
+            self.assertEqual(
+                {key: data[key] for key in ('id', 'name', 'cooking_time')},
+                {'id': self.recipe.pk, 'name': 'Блины', 'cooking_time': 20})
+            self.assertEqual(
+                data['image'],
+                f'http://testserver{self.recipe.image.url}')
+            self.assertTrue(model.objects.filter(
+                user=self.user, recipe=self.recipe).exists())
+
+    def test_add_errors(self):
+        for action in ACTIONS:
+            url = f'/api/recipes/{self.recipe.pk}/{action}/'
+            self.user_client.post(url)
+            response = self.user_client.post(url)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                response.json(), {'errors': 'Рецепт уже добавлен в список'})
+            self.assertEqual(
+                self.user_client.post(
+                    f'/api/recipes/999999/{action}/').status_code, 404)
+            self.assertEqual(
+                self.user_client.post(
+                    f'/api/recipes/abc/{action}/').status_code, 404)
+            self.assertEqual(APIClient().post(url).status_code, 401)
+
+    def test_delete(self):
+        for action, model in ACTIONS.items():
+            url = f'/api/recipes/{self.recipe.pk}/{action}/'
+            self.user_client.post(url)
+            self.assertEqual(self.user_client.delete(url).status_code, 204)
+            response = self.user_client.delete(url)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                response.json(), {'errors': 'Рецепт уже удален'})
+            self.assertFalse(model.objects.exists())
+
+    def test_batch(self):
+        second = self.create_recipe([0, 10, 0], name='Омлет')
+        for action, model in ACTIONS.items():
+            url = f'/api/recipes/{action}/'
+            self.user_client.post(url, {'recipes': [self.recipe.pk]},
+                                  format='json')
+            response = self.user_client.post(url, {
+                'recipes': [self.recipe.pk, second.pk, 999999, second.pk],
+            }, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], [
+                {'id': self.recipe.pk, 'status': 'exists',
+                 'errors': 'Рецепт уже добавлен в список'},
+                {'id': second.pk, 'status': 'added'},
+                {'id': 999999, 'status': 'not_found',
+                 'errors': 'Рецепт не найден'},
+            ])
+            self.assertEqual(
+                model.objects.filter(user=self.user).count(), 2)
+            response = self.user_client.delete(url, {
+                'recipes': [second.pk, 999999]}, format='json')
+            self.assertEqual(response.json()['results'], [
+                {'id': second.pk, 'status': 'removed'},
+                {'id': 999999, 'status': 'missing',
+                 'errors': 'Рецепт уже удален'},
+            ])
+
+    def test_batch_invalid(self):
+        url = '/api/recipes/favorite/'
+        for payload in ({}, {'recipes': []}, {'recipes': ['abc']},
+                        {'recipes': list(range(1, 102))}):
+            response = self.user_client.post(url, payload, format='json')
+            self.assertEqual(response.status_code, 400, payload)
+            self.assertIn('recipes', response.json())
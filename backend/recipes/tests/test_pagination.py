@@ -0,0 +1,68 @@
+import base64
+from urllib.parse import parse_qs, urlparse
+
+from recipes.models import Recipe
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/'
+
+
+class PaginationTests(RecipeAPITestCase):
+    """Постраничная и курсорная пагинация списка рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        Recipe.objects.bulk_create(
+            Recipe(author=self.author if number % 2 else self.other,
+                   name=f'Рецепт {number}', text='Текст', cooking_time=10,
+                   image='recipes/images/recipe.png')
+            for number in range(8))
+        self.ids = list(
+            Recipe.objects.order_by('-id').values_list('pk', flat=True))
+
+    def walk(self, url):
+        """Идет по ссылкам ``next`` и собирает id рецептов всех страниц."""
+        ids = []
+        while url:
+            page = self.user_client.get(url).json()
+            self.assertNotIn('count', page)
+            ids += [recipe['id'] for recipe in page['results']]
+            url = page['next']
+            if url:
+                # Позиции уникальны, курсор без смещения.
+                cursor = parse_qs(urlparse(url).query)['cursor'][0]
+                self.assertNotIn('o=', base64.b64decode(cursor).decode())
+        return ids
+
+    def test_page_number(self):
+        page = self.user_client.get(URL, {'limit': 3, 'page': 2}).json()
+        self.assertEqual(page['count'], 8)
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']], self.ids[3:6])
+
+    def test_cursor(self):
+        page = self.user_client.get(URL, {'cursor': '', 'limit': 3}).json()
+        self.assertEqual(list(page), ['next', 'previous', 'results'])
+        self.assertIsNone(page['previous'])
+        self.assertEqual(self.walk(f'{URL}?cursor=&limit=3'), self.ids)
+
+    def test_cursor_filtered(self):
+        self.assertEqual(
+            self.walk(f'{URL}?cursor=&limit=2&author={self.author.pk}'),
+            list(Recipe.objects.filter(author=self.author).order_by(
+                '-id').values_list('pk', flat=True)))
+
+    def test_trending_ties(self):
+        Recipe.objects.filter(pk__in=self.ids[:3]).update(trending_score=2.5)
+        Recipe.objects.filter(pk=self.ids[5]).update(trending_score=4.0)
+        expected = [self.ids[5], *self.ids[:5], *self.ids[6:]]
+        self.assertEqual(
+            self.walk(f'{URL}?ordering=trending&cursor=&limit=2'), expected)
+
+    def test_invalid_cursor(self):
+        for ordering, position in (('', 'abc'), ('trending', '1.0'),
+                                   ('trending', 'abc|1')):
+            cursor = base64.b64encode(f'p={position}'.encode()).decode()
+            response = self.user_client.get(
+                URL, {'cursor': cursor, 'ordering': ordering})
+            self.assertEqual(response.status_code, 404, position)
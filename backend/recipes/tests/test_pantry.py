@@ -0,0 +1,148 @@
+from array import array
+
+from django.test import SimpleTestCase
+
+from recipes import pantry
+from recipes.models import Recipe, RecipeIngredient
+from recipes.pantry import DenseCache, Match, PantryIndex, to_bitset
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/cookable/'
+FLOUR, MILK, SUGAR, SALT = 1, 2, 3, 4
+# Рецепт -> ингредиенты. Соль есть только в двух рецептах с далекими id,
+# поэтому хранится массивом.
+RECIPES = {
+    1: (FLOUR, MILK, SALT),
+    2: (FLOUR,),
+    3: (FLOUR, MILK, SUGAR),
+    4: (SUGAR,),
+    5000: (SALT,),
+}
+
+
+class PantryIndexTests(SimpleTestCase):
+    """Поиск по индексу ингредиентов в памяти."""
+
+    def setUp(self):
+        self.index = PantryIndex()
+        self.index.add(
+            (recipe_id, ingredient_id)
+            for recipe_id, ingredients in RECIPES.items()
+            for ingredient_id in ingredients)
+
+    def search(self, *ingredient_ids):
+        matches = self.index.search(ingredient_ids)
+        return matches[:len(matches)]
+
+    def test_representation(self):
+        self.assertIsInstance(self.index.ingredients[SALT], array)
+        self.assertEqual(list(self.index.ingredients[SALT]), [1, 5000])
+        self.assertEqual(self.index.ingredients[FLOUR], to_bitset([1, 2, 3]))
+
+    def test_order(self):
+        # Доля имеющихся, затем их число, затем новые рецепты выше.
+        self.assertEqual(self.search(FLOUR, MILK), [
+            Match(2, 1, 1), Match(3, 2, 3), Match(1, 2, 3)])
+        self.assertEqual(self.search(FLOUR, SUGAR), [
+            Match(4, 1, 1), Match(2, 1, 1), Match(3, 2, 3), Match(1, 1, 3)])
+        self.assertEqual(self.search(99), [])
+
+    def test_sparse(self):
+        self.assertEqual(
+            self.search(SALT), [Match(5000, 1, 1), Match(1, 1, 3)])
+        self.assertEqual(self.search(SALT, FLOUR, MILK), [
+            Match(1, 3, 3), Match(5000, 1, 1), Match(2, 1, 1),
+            Match(3, 2, 3)])
+
+    def test_slices(self):
+        matches = self.index.search([FLOUR, SUGAR])
+        self.assertEqual(len(matches), 4)
+        self.assertEqual(matches[1:3], [Match(2, 1, 1), Match(3, 2, 3)])
+        self.assertEqual(matches[3:10], [Match(1, 1, 3)])
+
+    def test_remove(self):
+        self.index.search([SALT])
+        self.index.remove([5000, 2])
+        self.assertEqual(self.search(SALT), [Match(1, 1, 3)])
+        self.assertEqual(self.search(FLOUR), [Match(3, 1, 3), Match(1, 1, 3)])
+        self.index.add([(2, SALT)])
+        self.assertEqual(self.search(SALT), [Match(2, 1, 1), Match(1, 1, 3)])
+
+    def test_dense_cache_limit(self):
+        cache = DenseCache(limit=700)
+        first = cache.get('first', array('I', [1, 5000]))
+        self.assertEqual(first, to_bitset([1, 5000]))
+        cache.get('second', array('I', [2, 5000]))
+        self.assertEqual(list(cache.items), ['second'])
+        self.assertLessEqual(cache.size, 700)
+        self.assertEqual(cache.get('plain', 7), 7)
+
+
+class CookableTests(RecipeAPITestCase):
+    """Маршрут /api/recipes/cookable/ и обновление индекса процесса."""
+
+    def setUp(self):
+        super().setUp()
+        self.flour, self.milk, self.sugar = self.ingredients
+        self.pancakes = self.create_recipe([200, 300, 0])
+        self.pie = self.create_recipe([300, 0, 100], name='Пирог')
+        self.omelette = self.create_recipe([0, 100, 0], name='Омлет')
+
+    def cookable(self, *ingredients, **params):
+        response = self.user_client.get(URL, {
+            'ingredients': [ingredient.pk for ingredient in ingredients],
+            **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def ids(self, *ingredients):
+        return [item['id'] for item in self.cookable(*ingredients)]
+
+    def test_common(self):
+        results = self.cookable(self.flour, self.milk)
+        self.assertEqual(
+            [(item['id'], item['coverage']) for item in results],
+            [(self.pancakes.pk, 1.0), (self.omelette.pk, 1.0),
+             (self.pie.pk, 0.5)])
+        self.assertEqual(results[0]['missing_ingredients'], [])
+        self.assertEqual(
+            [item['name'] for item in results[2]['missing_ingredients']],
+            ['сахар'])
+
+    def test_rare(self):
+        rare = Recipe.objects.create(
+            pk=self.omelette.pk + 5000, author=self.author, name='Сироп',
+            text='Сварить', cooking_time=5, image='recipes/images/recipe.png')
+        RecipeIngredient.objects.create(
+            recipe=rare, ingredient=self.sugar, amount=50)
+        results = self.cookable(self.sugar)
+        self.assertEqual([item['id'] for item in results],
+                         [rare.pk, self.pie.pk])
+        self.assertEqual(
+            [item['coverage'] for item in results], [1.0, 0.5])
+        self.assertIsInstance(
+            pantry.get_index().ingredients[self.sugar.pk], array)
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.ids(self.sugar), [self.pie.pk])
+        response = self.author_client.patch(
+            f'/api/recipes/{self.pancakes.pk}/',
+            {'ingredients': [{'id': self.sugar.pk, 'amount': 10}]},
+            format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            self.ids(self.sugar), [self.pancakes.pk, self.pie.pk])
+        self.assertEqual(self.ids(self.flour), [self.pie.pk])
+        self.author_client.delete(f'/api/recipes/{self.pie.pk}/')
+        self.assertEqual(self.ids(self.sugar), [self.pancakes.pk])
+
+    def test_fields(self):
+        results = self.cookable(self.milk, fields='id,coverage')
+        self.assertEqual(results, [
+            {'id': self.omelette.pk, 'coverage': 1.0},
+            {'id': self.pancakes.pk, 'coverage': 0.5}])
+
+    def test_invalid(self):
+        for params in ({}, {'ingredients': 'abc'}, {'ingredients': 0}):
+            response = self.user_client.get(URL, params)
+            self.assertEqual(response.status_code, 400, params)
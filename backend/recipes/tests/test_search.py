@@ -0,0 +1,88 @@
+import base64
+from unittest import skipUnless
+from urllib.parse import parse_qs, urlparse
+
+from django.db import connection
+from django.test import override_settings
+
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/'
+
+
+class SearchTests(RecipeAPITestCase):
+    """Поиск рецептов: полнотекстовый на PostgreSQL, по подстроке на
+    остальных СУБД."""
+
+    def setUp(self):
+        super().setUp()
+        self.pancakes = self.create_recipe(
+            [200, 300, 0], name='Блины', text='Жарить на сковороде')
+        self.pie = self.create_recipe(
+            [300, 0, 100], name='Пирог', text='Подавать с блинами')
+        self.omelette = self.create_recipe(
+            [0, 100, 0], name='Омлет', text='Взбить яйца')
+
+    def ids(self, query, **params):
+        response = self.user_client.get(URL, {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def walk(self, params):
+        """id рецептов всех страниц курсора и число курсоров со смещением."""
+        ids = []
+        offsets = 0
+        response = self.user_client.get(URL, {**params, 'cursor': ''})
+        while True:
+            page = response.json()
+            ids += [recipe['id'] for recipe in page['results']]
+            if not page['next']:
+                return ids, offsets
+            cursor = parse_qs(urlparse(page['next']).query)['cursor'][0]
+            offsets += 'o=' in base64.b64decode(cursor).decode()
+            response = self.user_client.get(page['next'])
+
+    def test_matches(self):
+        self.assertEqual(self.ids('омлет'), [self.omelette.pk])
+        self.assertEqual(self.ids('омлет сковороде'), [])
+        self.assertEqual(self.ids('xyz'), [])
+        self.assertEqual(len(self.ids('')), 3)
+
+    def test_ingredients(self):
+        self.assertEqual(
+            self.ids('сахар'), [self.pie.pk])
+        self.assertEqual(
+            set(self.ids('молоко')), {self.pancakes.pk, self.omelette.pk})
+
+    @skipUnless(connection.vendor != 'postgresql', 'поиск по подстроке')
+    def test_substring_rank(self):
+        # Совпадение в названии выше, при равном ранге новые рецепты выше.
+        self.assertEqual(self.ids('блин'), [self.pancakes.pk, self.pie.pk])
+        self.assertEqual(
+            self.ids('мук'), [self.pie.pk, self.pancakes.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'полнотекстовый поиск')
+    def test_full_text_rank(self):
+        # Словоформы совпадают, название весит больше описания.
+        self.assertEqual(self.ids('блинов'), [self.pancakes.pk, self.pie.pk])
+        self.assertEqual(self.ids('блинами'), [self.pancakes.pk, self.pie.pk])
+        self.assertEqual(
+            self.ids('мука'), [self.pie.pk, self.pancakes.pk])
+
+    def test_cursor_keyset(self):
+        # Все рецепты с одинаковым рангом: страницы листаются по id.
+        for number in range(4):
+            self.create_recipe([10, 0, 0], name=f'Каша {number}')
+        expected = self.ids('мука', limit=10)
+        ids, offsets = self.walk({'search': 'мука', 'limit': 2})
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(offsets, 0)
+
+    @override_settings(SEARCH_RESULTS_LIMIT=2)
+    def test_results_limit(self):
+        response = self.user_client.get(URL, {'search': 'мука'})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(
+            set(self.ids('мука')), {self.pancakes.pk, self.pie.pk})
+        self.assertEqual(self.ids('омлет'), [self.omelette.pk])
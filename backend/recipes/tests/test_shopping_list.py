@@ -0,0 +1,60 @@
+from rest_framework.test import APIClient
+
+from recipes.renderers import ShoppingListRenderer
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListTests(RecipeAPITestCase):
+    """Выгрузка списка покупок в разных форматах."""
+
+    def setUp(self):
+        super().setUp()
+        recipes = [self.create_recipe([200, 300, 0]),
+                   self.create_recipe([100, 0, 5], name='Пирог')]
+        self.user_client.post(
+            '/api/recipes/shopping_cart/',
+            {'recipes': [recipe.pk for recipe in recipes]}, format='json')
+
+    def download(self, **kwargs):
+        response = self.user_client.get(URL, **kwargs)
+        content = b''.join(response.streaming_content)
+        return response, content
+
+    def test_txt(self):
+        response, content = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('filename="buylist.txt"',
+                      response['Content-Disposition'])
+        self.assertEqual(content.decode().splitlines(), [
+            'молоко - 300 г', 'мука - 300 г', 'сахар - 5 г'])
+
+    def test_csv(self):
+        response, content = self.download(data={'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(content.decode('utf-8-sig').splitlines(), [
+            'Ингредиент,Количество,Единица измерения',
+            'молоко,300,г', 'мука,300,г', 'сахар,5,г'])
+
+    def test_pdf(self):
+        response, content = self.download(HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_unsupported_format(self):
+        for kwargs in ({'data': {'format': 'json'}},
+                       {'data': {'format': 'xml'}},
+                       {'HTTP_ACCEPT': 'application/json'}):
+            response = self.user_client.get(URL, **kwargs)
+            self.assertEqual(response.status_code, 406, kwargs)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('txt, csv, pdf', response.json()['detail'])
+
+    def test_anonymous(self):
+        self.assertEqual(APIClient().get(URL).status_code, 401)
+
+    def test_stream_is_abstract(self):
+        with self.assertRaises(TypeError):
+            type('Renderer', (ShoppingListRenderer,), {})()
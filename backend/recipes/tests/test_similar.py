@@ -0,0 +1,80 @@
+import io
+
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, SimilarRecipe
+from recipes.tests.base import RecipeAPITestCase, create_user
+
+# Избранное пользователей: номера рецептов.
+FAVORITES = ({0, 1}, {0, 1}, {0, 1, 2}, {0, 2}, {2, 3}, {2, 3})
+
+
+class SimilarRecipesTests(RecipeAPITestCase):
+    """Похожие рецепты по совместному добавлению в избранное."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author, name=name, text=name, cooking_time=10,
+                image='recipes/images/recipe.png')
+            for name in ('Блины', 'Оладьи', 'Каша', 'Омлет')]
+        for number, favorites in enumerate(FAVORITES):
+            user = create_user(f'fan{number}')
+            for index in favorites:
+                Favorite.objects.create(user=user, recipe=self.recipes[index])
+
+    def build(self, **options):
+        call_command('build_similar_recipes', stdout=io.StringIO(), **options)
+
+    def similar(self, index):
+        response = self.user_client.get(
+            f'/api/recipes/{self.recipes[index].pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        return [self.recipe_index(item['id']) for item in response.json()]
+
+    def recipe_index(self, pk):
+        return [recipe.pk for recipe in self.recipes].index(pk)
+
+    def test_order(self):
+        self.build()
+        # Косинус: 0-1 = 3/√12, 2-3 = 2/√8, 0-2 = 2/4; у 1 и 2 один общий
+        # пользователь, меньше --min-common.
+        self.assertEqual(self.similar(0), [1, 2])
+        self.assertEqual(self.similar(1), [0])
+        self.assertEqual(self.similar(2), [3, 0])
+        self.assertEqual(self.similar(3), [2])
+        score = SimilarRecipe.objects.get(
+            recipe=self.recipes[0], similar=self.recipes[1]).score
+        self.assertAlmostEqual(score, 3 / 12 ** 0.5, places=5)
+
+    def test_options(self):
+        self.build(top_k=1, min_common=1)
+        self.assertEqual(self.similar(0), [1])
+        self.assertEqual(self.similar(1), [0])
+        self.build(full=True, min_common=3)
+        self.assertEqual(self.similar(0), [1])
+        self.assertEqual(self.similar(2), [])
+
+    def test_incremental(self):
+        self.build()
+        self.assertFalse(Recipe.objects.filter(similar_stale=True).exists())
+        # Пересчитываются только рецепты с изменившимся избранным.
+        SimilarRecipe.objects.filter(recipe=self.recipes[0]).delete()
+        for number in range(3):
+            Favorite.objects.create(
+                user=create_user(f'new{number}'), recipe=self.recipes[3])
+            Favorite.objects.create(
+                user=create_user(f'other{number}'), recipe=self.recipes[1])
+        self.assertEqual(
+            set(Recipe.objects.filter(similar_stale=True)),
+            {self.recipes[1], self.recipes[3]})
+        self.build()
+        self.assertEqual(self.similar(0), [])
+        self.assertEqual(self.similar(1), [0])
+        self.assertEqual(self.similar(3), [2])
+        self.assertFalse(Recipe.objects.filter(similar_stale=True).exists())
+
+    def test_missing_recipe(self):
+        response = self.user_client.get('/api/recipes/999999/similar/')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,101 @@
+import io
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from recipes.models import Recipe, TimelineEntry
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/feed/'
+
+
+class TimelineTests(RecipeAPITestCase):
+    """Лента подписок: рассылка при публикации и чтение."""
+
+    def add_recipe(self, name, author=None):
+        return Recipe.objects.create(
+            author=author or self.author, name=name, text=name,
+            cooking_time=10, image='recipes/images/recipe.png')
+
+    def subscribe(self, client=None, author=None):
+        response = (client or self.user_client).post(
+            f'/api/users/{(author or self.author).pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+
+    def feed_ids(self, client=None, limit=10):
+        """id рецептов ленты по всем страницам курсора."""
+        ids = []
+        url = f'{URL}?limit={limit}'
+        while url:
+            response = (client or self.user_client).get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def entries(self, user=None):
+        return set(TimelineEntry.objects.filter(
+            user=user or self.user).values_list('recipe_id', flat=True))
+
+    def test_fan_out(self):
+        self.subscribe()
+        recipes = [self.add_recipe(name) for name in ('Суп', 'Каша', 'Плов')]
+        self.add_recipe('Чужой', author=self.other)
+        self.assertEqual(self.entries(), {recipe.pk for recipe in recipes})
+        self.assertEqual(self.entries(self.other), set())
+        self.assertEqual(
+            self.feed_ids(limit=2), [recipe.pk for recipe in recipes[::-1]])
+
+    def test_follow_backfills(self):
+        recipes = [self.add_recipe(name) for name in ('Суп', 'Каша')]
+        self.assertEqual(self.feed_ids(), [])
+        self.subscribe()
+        self.assertEqual(
+            self.feed_ids(), [recipe.pk for recipe in recipes[::-1]])
+
+    def test_unsubscribe(self):
+        self.subscribe()
+        self.subscribe(author=self.other)
+        self.add_recipe('Суп')
+        other_recipe = self.add_recipe('Каша', author=self.other)
+        response = self.user_client.delete(
+            f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.entries(), {other_recipe.pk})
+        self.assertEqual(self.feed_ids(), [other_recipe.pk])
+
+    def test_recipe_deleted(self):
+        self.subscribe()
+        recipe = self.add_recipe('Суп')
+        recipe.delete()
+        self.assertEqual(self.entries(), set())
+        self.assertEqual(self.feed_ids(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_fan_out_on_read(self):
+        self.subscribe()
+        recipe = self.add_recipe('Суп')
+        self.assertFalse(recipe.in_timelines)
+        self.assertEqual(self.entries(), set())
+        self.assertEqual(self.feed_ids(), [recipe.pk])
+        self.assertEqual(self.feed_ids(self.other_client), [])
+
+    def test_rebuild_timelines(self):
+        self.subscribe()
+        self.subscribe(client=self.other_client)
+        recipes = [self.add_recipe(name) for name in ('Суп', 'Каша')]
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', user=[self.user.pk],
+                     stdout=io.StringIO())
+        self.assertEqual(self.entries(), {recipe.pk for recipe in recipes})
+        self.assertEqual(self.entries(self.other), set())
+        with override_settings(FEED_FANOUT_LIMIT=1):
+            call_command('rebuild_timelines', stdout=io.StringIO())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(
+            Recipe.objects.filter(in_timelines=True).exists())
+        self.assertEqual(
+            self.feed_ids(), [recipe.pk for recipe in recipes[::-1]])
+        call_command('rebuild_timelines', stdout=io.StringIO())
+        self.assertEqual(self.entries(self.other),
+                         {recipe.pk for recipe in recipes})
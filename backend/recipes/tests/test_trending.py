@@ -0,0 +1,112 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from recipes import trending
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.tests.base import RecipeAPITestCase
+
+HOUR = timedelta(hours=1)
+
+
+@override_settings(TRENDING_HALF_LIFE=60 * 60)
+class TrendingTests(RecipeAPITestCase):
+    """Рейтинг в тренде: затухание, новые и удаленные события."""
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author, name=name, text=name, cooking_time=10,
+                image='recipes/images/recipe.png')
+            for name in ('Блины', 'Каша', 'Омлет')]
+
+    def mark(self, model, user, index, age):
+        """Событие ``model`` пользователя ``user`` возраста ``age``."""
+        event = model.objects.create(user=user, recipe=self.recipes[index])
+        model.objects.filter(pk=event.pk).update(created=self.now - age)
+        event.created = self.now - age
+        return event
+
+    def update(self, later=timedelta(), **options):
+        """Пересчет в момент ``self.now + later`` (с учетом COMMIT_LAG)."""
+        moment = self.now + later + trending.COMMIT_LAG
+        with mock.patch('recipes.trending.timezone.now', return_value=moment):
+            call_command('update_trending_scores', stdout=io.StringIO(),
+                         **options)
+
+    def scores(self):
+        return [Recipe.objects.get(pk=recipe.pk).trending_score
+                for recipe in self.recipes]
+
+    def assertScores(self, expected):
+        for score, value in zip(self.scores(), expected):
+            self.assertAlmostEqual(score, value, places=6)
+
+    def test_decay(self):
+        self.assertAlmostEqual(trending.decay(HOUR), 0.5)
+        self.mark(Favorite, self.user, 0, HOUR)
+        self.mark(Favorite, self.other, 0, 2 * HOUR)
+        self.mark(ShoppingCart, self.user, 1, timedelta())
+        self.update()
+        self.assertScores([0.5 + 0.25, 0.5, 0])
+
+    def test_incremental(self):
+        self.mark(Favorite, self.user, 0, timedelta())
+        self.update()
+        self.assertScores([1, 0, 0])
+        self.mark(Favorite, self.user, 1, -HOUR)
+        # Через час старый вклад затух вдвое, новое событие учтено.
+        self.update(later=HOUR)
+        self.assertScores([0.5, 1, 0])
+        self.update(later=2 * HOUR, full=True)
+        self.assertScores([0.25, 0.5, 0])
+
+    def test_min_score(self):
+        self.mark(Favorite, self.user, 0, timedelta())
+        self.update()
+        self.update(later=11 * HOUR)
+        self.assertScores([0, 0, 0])
+
+    def test_event_removed(self):
+        favorite = self.mark(Favorite, self.user, 0, timedelta())
+        self.mark(Favorite, self.other, 0, timedelta())
+        cart = self.mark(ShoppingCart, self.user, 1, timedelta())
+        self.update()
+        self.assertScores([2, 0.5, 0])
+        favorite.delete()
+        self.assertScores([1, 0.5, 0])
+        response = self.user_client.delete(
+            f'/api/recipes/{self.recipes[1].pk}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(ShoppingCart.objects.filter(pk=cart.pk).exists())
+        self.assertScores([1, 0, 0])
+
+    def test_new_event_removed_before_update(self):
+        self.update()
+        self.mark(Favorite, self.user, 0, -HOUR).delete()
+        self.assertScores([0, 0, 0])
+
+    def test_ordering(self):
+        self.mark(Favorite, self.user, 1, timedelta())
+        self.mark(ShoppingCart, self.user, 2, timedelta())
+        self.update()
+        response = self.user_client.get(
+            '/api/recipes/', {'ordering': 'trending'})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.recipes[1].pk, self.recipes[2].pk, self.recipes[0].pk])
+        etag = response['ETag']
+        self.mark(Favorite, self.other, 0, -HOUR)
+        self.update(later=HOUR)
+        response = self.user_client.get(
+            '/api/recipes/', {'ordering': 'trending'},
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['id'], self.recipes[0].pk)
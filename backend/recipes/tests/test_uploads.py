@@ -0,0 +1,107 @@
+import base64
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from recipes.parsers import PayloadTooLarge, SizeLimitedStream
+from recipes.tests.base import RecipeAPITestCase, image, image_content
+
+URL = '/api/recipes/'
+
+
+class SizeLimitedStreamTests(SimpleTestCase):
+    """Поток тела прерывается после ``limit`` байт."""
+
+    def test_limit(self):
+        self.assertEqual(
+            SizeLimitedStream(io.BytesIO(b'12345'), 5).read(), b'12345')
+        stream = SizeLimitedStream(io.BytesIO(b'123456'), 5)
+        self.assertEqual(stream.read(3), b'123')
+        with self.assertRaises(PayloadTooLarge):
+            stream.read()
+
+
+class UploadTests(RecipeAPITestCase):
+    """Загрузка картинки рецепта строкой base64 и файлом multipart."""
+
+    def post(self, payload, **kwargs):
+        return self.author_client.post(URL, payload, format='json', **kwargs)
+
+    def assertImageError(self, response, message):
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn(message, response.json()['image'][0])
+
+    def test_base64_with_whitespace(self):
+        encoded = base64.encodebytes(image_content(size=(400, 300))).decode()
+        self.assertIn('\n', encoded)
+        payload = self.recipe_payload(
+            [100, 0, 0], image=f' data:image/png;base64,{encoded}  ')
+        response = self.post(payload)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            response.json()['image'],
+            self.post(self.recipe_payload(
+                [100, 0, 0], image=image(size=(400, 300)))).json()['image'])
+
+    def test_invalid_base64(self):
+        for value in ('data:image/png;base64,!!!notbase64',
+                      base64.b64encode(b'hello world!').decode()):
+            response = self.post(self.recipe_payload([100, 0, 0], image=value))
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('image', response.json())
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=1000)
+    def test_pixel_limit(self):
+        response = self.post(self.recipe_payload(
+            [100, 0, 0], image=image(size=(40, 25))))
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.post(self.recipe_payload(
+            [100, 0, 0], image=image(size=(40, 26))))
+        self.assertImageError(response, 'больше 1000 пикселей')
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=50)
+    def test_image_size_limit(self):
+        self.assertImageError(
+            self.post(self.recipe_payload([100, 0, 0])), 'больше 50 байт')
+
+    def test_request_too_large(self):
+        recipe = self.create_recipe([100, 0, 0])
+        with override_settings(RECIPE_REQUEST_MAX_SIZE=200):
+            response = self.post(self.recipe_payload([100, 0, 0]))
+            self.assertEqual(response.status_code, 413, response.content)
+            response = self.author_client.patch(
+                f'{URL}{recipe.pk}/', {'text': 'x' * 500}, format='multipart')
+            self.assertEqual(response.status_code, 413, response.content)
+
+    def test_chunked_request(self):
+        response = self.post(
+            self.recipe_payload([100, 0, 0]),
+            CONTENT_LENGTH='', HTTP_TRANSFER_ENCODING='chunked')
+        self.assertEqual(response.status_code, 411, response.content)
+
+    def test_multipart(self):
+        recipe = self.create_recipe([100, 0, 0])
+        content = image_content(size=(400, 300), format='JPEG')
+        response = self.author_client.post(URL, {
+            'name': 'Омлет', 'text': 'Взбить', 'cooking_time': 5,
+            'tags': [self.tag.pk],
+            'ingredients[0]id': self.ingredients[1].pk,
+            'ingredients[0]amount': 200,
+            'image': SimpleUploadedFile(
+                'photo.bin', content, content_type='image/jpeg'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertTrue(data['image'].endswith('/original.jpeg'))
+        self.assertEqual(
+            [item['id'] for item in data['ingredients']],
+            [self.ingredients[1].pk])
+        response = self.author_client.patch(f'{URL}{recipe.pk}/', {
+            'image': SimpleUploadedFile('photo.png', image_content()),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            response.json()['image'],
+            self.author_client.get(f'{URL}{recipe.pk}/').json()['image'])
+        self.assertEqual(len(response.json()['ingredients']), 1)
@@ -0,0 +1,73 @@
+from recipes.models import Recipe, Tag
+from recipes.tests.base import RecipeAPITestCase
+
+URL = '/api/recipes/'
+MISSING = 'Недопустимый первичный ключ "{}" - объект не существует.'
+
+
+class RecipeValidationTests(RecipeAPITestCase):
+    """Продукты и теги рецепта проверяются одним запросом каждые,
+    ошибки возвращаются по позициям списков.
+    """
+
+    def post(self, **fields):
+        return self.author_client.post(
+            URL, self.recipe_payload([100, 200, 0], **fields), format='json')
+
+    def test_ingredient_errors(self):
+        missing = self.ingredients[-1].pk + 100
+        response = self.post(ingredients=[
+            {'id': self.ingredients[0].pk, 'amount': 100},
+            {'id': missing, 'amount': 10},
+            {'id': self.ingredients[1].pk, 'amount': 5},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'ingredients': [
+            {}, {'id': [MISSING.format(missing)]}, {}]})
+
+    def test_ingredient_field_errors(self):
+        response = self.post(ingredients=[
+            {'id': self.ingredients[0].pk, 'amount': 100},
+            {'id': 0, 'amount': 10},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['ingredients']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ['id'])
+
+    def test_tag_errors(self):
+        missing = self.tag.pk + 100
+        response = self.post(tags=[self.tag.pk, missing, 'x'])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['tags']
+        self.assertEqual(list(errors), ['2'])
+        response = self.post(tags=[missing, self.tag.pk, missing + 1])
+        self.assertEqual(response.json(), {'tags': {
+            '0': [MISSING.format(missing)],
+            '2': [MISSING.format(missing + 1)],
+        }})
+
+    def test_one_query_each(self):
+        missing = self.tag.pk + 100
+        with self.assertNumQueries(2):
+            response = self.post(
+                tags=[self.tag.pk, missing],
+                ingredients=[{'id': self.ingredients[0].pk + 100,
+                              'amount': 1}])
+        self.assertEqual(set(response.json()), {'ingredients', 'tags'})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_valid(self):
+        second = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch')
+        response = self.post(
+            tags=[second.pk, self.tag.pk],
+            ingredients=[{'id': self.ingredients[2].pk, 'amount': 1},
+                         {'id': self.ingredients[0].pk, 'amount': 2}])
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertEqual(
+            {tag['id'] for tag in data['tags']}, {second.pk, self.tag.pk})
+        self.assertEqual(
+            {item['id']: item['amount'] for item in data['ingredients']},
+            {self.ingredients[2].pk: 1, self.ingredients[0].pk: 2})
@@ -0,0 +1,110 @@
+"""Ленты подписок.
+
+Рецепт при публикации записывается в TimelineEntry каждого подписчика
+автора (fan-out on write), и лента читается по индексу одного
+пользователя. Рецепты авторов, у которых больше ``FEED_FANOUT_LIMIT``
+подписчиков, в ленты не пишутся (``Recipe.in_timelines = False``) и
+подмешиваются при чтении (fan-out on read).
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Subscribe, User
+
+from .models import Recipe, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def fans_out(author_id):
+    """Рассылать ли новые рецепты автора по лентам подписчиков."""
+    subscribers = User.objects.filter(pk=author_id).values_list(
+        'subscribers_count', flat=True).first()
+    return (subscribers or 0) <= settings.FEED_FANOUT_LIMIT
+
+
+def add_entries(pairs):
+    """Добавляет в ленты пары (пользователь, рецепт) пакетами."""
+    batch = []
+    created = 0
+    for user_id, recipe_id in pairs:
+        batch.append(TimelineEntry(user_id=user_id, recipe_id=recipe_id))
+        if len(batch) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    return created + len(batch)
+
+
+def recipe_published(recipe):
+    """Записывает новый рецепт в ленты подписчиков автора."""
+    if recipe.in_timelines:
+        add_entries(
+            (user_id, recipe.pk)
+            for user_id in Subscribe.objects.filter(
+                author_id=recipe.author_id,
+            ).values_list('user_id', flat=True).iterator(
+                chunk_size=BATCH_SIZE))
+
+
+def author_followed(user_id, author_id):
+    """Добавляет в ленту подписчика разосланные рецепты автора."""
+    add_entries(
+        (user_id, recipe_id)
+        for recipe_id in Recipe.objects.filter(
+            author_id=author_id, in_timelines=True,
+        ).values_list('pk', flat=True).iterator(chunk_size=BATCH_SIZE))
+
+
+def author_unfollowed(user_id, author_id):
+    """Убирает рецепты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()
+
+
+def feed(user):
+    """Рецепты ленты: записи TimelineEntry пользователя и неразосланные
+    рецепты авторов, на которых он подписан.
+    """
+    return Recipe.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(
+            user=user).values('recipe_id'))
+        | Q(in_timelines=False,
+            author__in=Subscribe.objects.filter(
+                user=user).values('author_id'))
+    )
+
+
+def feed_on_read(user):
+    """Та же лента без таблицы TimelineEntry, для сравнения в
+    benchmark_feed.
+    """
+    return Recipe.objects.filter(
+        author__in=Subscribe.objects.filter(user=user).values('author_id'))
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты пользователей (всех, если не указаны).
+
+    Полная пересборка заново решает для каждого рецепта, рассылать ли
+    его, по текущему числу подписчиков автора.
+    """
+    entries = TimelineEntry.objects.all()
+    subscriptions = Subscribe.objects.filter(
+        author__user_recipes__in_timelines=True)
+    if user_ids is None:
+        limit = settings.FEED_FANOUT_LIMIT
+        Recipe.objects.filter(
+            author__subscribers_count__lte=limit, in_timelines=False,
+        ).update(in_timelines=True)
+        Recipe.objects.filter(
+            author__subscribers_count__gt=limit, in_timelines=True,
+        ).update(in_timelines=False)
+    else:
+        entries = entries.filter(user_id__in=user_ids)
+        subscriptions = subscriptions.filter(user_id__in=user_ids)
+    entries.delete()
+    return add_entries(subscriptions.values_list(
+        'user_id', 'author__user_recipes__id').order_by().iterator(
+        chunk_size=BATCH_SIZE))
@@ -0,0 +1,128 @@
+"""Рейтинг рецептов «в тренде».
+
+Каждое добавление рецепта в избранное или корзину дает вклад, который
+убывает вдвое за ``TRENDING_HALF_LIFE`` секунд. ``Recipe.trending_score``
+хранит сумму вкладов на момент ``TrendingCheckpoint.computed_at``, поэтому
+рейтинги всех рецептов сравнимы и сортировка идет по индексу.
+
+``update`` умножает ненулевые рейтинги на общий множитель затухания и
+добавляет события, появившиеся с прошлого пересчета, не перечитывая всю
+историю избранного. Удаление из избранного или корзины сразу вычитает
+уже учтенный вклад (``events_removed``).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Favorite, Recipe, ShoppingCart, TrendingCheckpoint
+from .versions import bump_version_on_commit
+
+WEIGHTS = {
+    Favorite: 1.0,
+    ShoppingCart: 0.5,
+}
+ORDERING = ('-trending_score', '-id')
+# Меньшие рейтинги обнуляются, чтобы не обновлять затухшие рецепты.
+MIN_SCORE = 0.001
+# При полном пересчете читаются события за столько периодов
+# полураспада: более старые дают вклад меньше MIN_SCORE.
+FULL_WINDOW = 10
+# Более свежие события ждут следующего пересчета: их транзакции могут
+# быть еще не зафиксированы.
+COMMIT_LAG = timedelta(minutes=1)
+CHUNK_SIZE = 10000
+
+
+def decay(age):
+    """Множитель затухания вклада события возраста ``age``."""
+    return 0.5 ** (age.total_seconds() / settings.TRENDING_HALF_LIFE)
+
+
+def contributions(since, until):
+    """Вклады событий из (since, until] на момент ``until``:
+    рецепт -> сумма.
+    """
+    scores = defaultdict(float)
+    for model, weight in WEIGHTS.items():
+        events = model.objects.filter(created__gt=since, created__lte=until)
+        for recipe_id, created in events.values_list(
+                'recipe_id', 'created').order_by().iterator(
+                chunk_size=CHUNK_SIZE):
+            scores[recipe_id] += weight * decay(until - created)
+    return scores
+
+
+def add_scores(scores):
+    recipe_ids = sorted(scores)
+    for offset in range(0, len(recipe_ids), CHUNK_SIZE):
+        recipes = list(Recipe.objects.filter(
+            pk__in=recipe_ids[offset:offset + CHUNK_SIZE],
+        ).only('trending_score'))
+        for recipe in recipes:
+            recipe.trending_score += scores[recipe.pk]
+        Recipe.objects.bulk_update(recipes, ('trending_score',))
+
+
+def update(full=False):
+    """Пересчитывает рейтинги на текущий момент.
+    Возвращает число рецептов, получивших новые события.
+    """
+    until = timezone.now() - COMMIT_LAG
+    half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+    with transaction.atomic():
+        checkpoint, _ = TrendingCheckpoint.objects.select_for_update(
+        ).get_or_create(pk=1)
+        since = checkpoint.computed_at
+        if full or since is None:
+            Recipe.objects.filter(trending_score__gt=0).update(
+                trending_score=0)
+            since = until - half_life * FULL_WINDOW
+        elif since >= until:
+            return 0
+        else:
+            factor = decay(until - since)
+            Recipe.objects.filter(
+                trending_score__gt=0, trending_score__lt=MIN_SCORE / factor,
+            ).update(trending_score=0)
+            Recipe.objects.filter(trending_score__gt=0).update(
+                trending_score=F('trending_score') * factor)
+        scores = contributions(since, until)
+        add_scores(scores)
+        checkpoint.computed_at = until
+        checkpoint.save()
+        bump_version_on_commit('trending')
+    return len(scores)
+
+
+def events_removed(model, events):
+    """Вычитает вклады удаленных событий, уже учтенные в рейтинге,
+    одним запросом. У каждого рецепта среди ``events`` не больше одного
+    события.
+    """
+    computed_at = TrendingCheckpoint.objects.values_list(
+        'computed_at', flat=True).first()
+    if computed_at is None:
+        return
+    values = {
+        event.recipe_id: WEIGHTS[model] * decay(computed_at - event.created)
+        for event in events if event.created <= computed_at
+    }
+    values = {pk: value for pk, value in values.items() if value >= MIN_SCORE}
+    if not values:
+        return
+    bump_version_on_commit('trending')
+    Recipe.objects.filter(pk__in=values, trending_score__gt=0).update(
+        trending_score=Greatest(
+            F('trending_score') - Case(
+                *(When(pk=pk, then=Value(value))
+                  for pk, value in values.items()),
+                output_field=FloatField(),
+            ),
+            0.0,
+            output_field=FloatField(),
+        ))
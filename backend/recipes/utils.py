@@ -1,14 +1,27 @@
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 
+CURSOR_CHUNK_SIZE = 2000
 
-def get_shopping_list(ingredients_list):
-    """Метод для скачивания списка покупок"""
-    buy_list = []
-    for item in ingredients_list:
-        buy_list.append(f'{item["ingredient__name"]} - {item["amount"]} '
-                        f'{item["ingredient__measurement_unit"]} \n')
 
-    response = HttpResponse(buy_list, 'Content-Type: text/plain')
+def get_shopping_list(ingredients_list, renderer):
+    """Метод для скачивания списка покупок.
+
+    Строки читаются курсором на стороне сервера и отдаются клиенту
+    по мере формирования файла выбранного формата.
+    """
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    response = StreamingHttpResponse(
+        renderer.stream(ingredients_list.iterator(
+            chunk_size=CURSOR_CHUNK_SIZE)),
+        content_type=content_type,
+    )
     response['Content-Disposition'] = ('attachment; '
-                                       'filename="buylist.txt"')
+                                       f'filename="buylist.{renderer.format}"')
     return response
+
+
+def normalize_name(name):
+    """Приводит название к виду для поиска: нижний регистр, ё -> е."""
+    return ' '.join(name.lower().replace('ё', 'е').split())
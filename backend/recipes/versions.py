@@ -0,0 +1,59 @@
+import time
+from datetime import datetime, timezone
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY = 'version:{}'
+
+
+def new_version():
+    """Новая версия: время смены в микросекундах и случайная часть."""
+    return '{:x}-{}'.format(int(time.time() * 10 ** 6), uuid4().hex[:16])
+
+
+def version_time(version):
+    """Время смены версии, None для версий без времени."""
+    stamp, separator, _ = version.partition('-')
+    if not separator:
+        return None
+    try:
+        return datetime.fromtimestamp(int(stamp, 16) / 10 ** 6, timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def get_version(name):
+    """Текущая версия набора данных ``name``.
+
+    Версии хранятся в общем кэше, поэтому смена версии в одном процессе
+    видна всем воркерам, использующим тот же кэш.
+    """
+    return cache.get_or_set(KEY.format(name), new_version(), None)
+
+
+def bump_version(name):
+    """Выдает набору данных ``name`` новую версию."""
+    version = new_version()
+    cache.set(KEY.format(name), version, None)
+    return version
+
+
+def get_versions(names):
+    """Версии нескольких наборов данных за одно обращение к кэшу."""
+    keys = {KEY.format(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {name: found[key] for key, name in keys.items()}
+
+
+def bump_version_on_commit(name):
+    """Меняет версию после фиксации текущей транзакции, чтобы читатели
+    не успели закэшировать незафиксированное состояние под новой версией.
+    """
+    transaction.on_commit(partial(bump_version, name))
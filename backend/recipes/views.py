@@ -1,29 +1,70 @@
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotAcceptable
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
+from . import marks, pantry, timeline
+from .caching import CachedCatalogMixin, ConditionalGetMixin
+from .fieldsets import Fieldset
 from .filters import IngredientsFilter, RecipeFilter
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingCartIngredient, Tag)
+from .paginator import (CustomPageNumberPaginator, RecipeCursorPagination,
+                        RecipePagination)
+from .parsers import (LimitedJSONParser, LimitedMessagePackParser,
+                      LimitedMultiPartParser, check_content_length)
 from .permissions import IsAuthorOrAdmin
-from .serializers import (AddRecipeSerializer, FavoriteSerializer,
-                          IngredientSerializer, ShowRecipeFullSerializer,
-                          TagSerializer)
+from .renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                        ShoppingListNegotiation, ShoppingListRenderer,
+                        TextShoppingListRenderer)
+from .serializers import (AddRecipeSerializer, CookableQuerySerializer,
+                          FavoriteSerializer, IngredientSerializer,
+                          RecipeIdsSerializer, ShoppingCartSerializer,
+                          ShowRecipeFullSerializer, TagSerializer)
 from .utils import get_shopping_list
 
+MARK_SERIALIZERS = {
+    Favorite: FavoriteSerializer,
+    ShoppingCart: ShoppingCartSerializer,
+}
+BATCH_ERRORS = {
+    marks.EXISTS: 'Рецепт уже добавлен в список',
+    marks.NOT_FOUND: 'Рецепт не найден',
+    marks.MISSING: 'Рецепт уже удален',
+}
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    """Вьюсет для модели рецепта"""
-    queryset = Recipe.objects.all().order_by("-id")
+
+def recipe_pk(value):
+    """Номер рецепта из адреса, 404 для нечислового значения."""
+    try:
+        return int(value)
+    except ValueError:
+        raise Http404
+
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    """Вьюсет для модели рецепта.
+    Рецепт, список и лента отвечают на условные GET (см.
+    recipes.caching.ConditionalGetMixin)."""
+    queryset = Recipe.objects.defer("search_vector").order_by("-id")
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
     serializer_class = ShowRecipeFullSerializer
     permission_classes = (IsAuthorOrAdmin,)
+    pagination_class = RecipePagination
+    parser_classes = (LimitedJSONParser, LimitedMessagePackParser,
+                      LimitedMultiPartParser)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        check_content_length(request)
 
     def get_serializer_class(self):
         """Метод выбора сериализатора в зависимости от запроса."""
@@ -31,27 +72,111 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return ShowRecipeFullSerializer
         return AddRecipeSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = self.select_columns(queryset)
+        return queryset
+
+    def list_response(self, queryset, respond):
+        """Условный ответ со списком рецептов ``queryset``. Состояние
+        списка - число рецептов и время последнего изменения среди них:
+        добавление, удаление и изменение рецепта меняют одно из двух.
+        """
+        state = queryset.order_by().aggregate(
+            count=Count('pk'), updated_at=Max('updated_at'))
+        versions = ['tags', 'ingredients']
+        if self.request.query_params.get('ordering') == 'trending':
+            versions.append('trending')
+        return self.conditional_response(
+            respond, (state['count'], state['updated_at']),
+            state['updated_at'], versions, modified_versions=('recipes',))
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        def respond():
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return self.list_response(queryset, respond)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs['pk'])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        state = Recipe.objects.filter(pk=pk).values_list(
+            'author_id', 'updated_at').first()
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)
+        author_id, updated_at = state
+        return self.conditional_response(
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs),
+            state, updated_at,
+            ('tags', 'ingredients', f'recipe:{pk}', f'user:{author_id}'))
+
+    def select_columns(self, queryset):
+        """С ``?fields=`` или ``?omit=`` читает только столбцы выбранных
+        полей (см. recipes.fieldsets)."""
+        fieldset = Fieldset(self.request)
+        if not fieldset.sparse:
+            return queryset
+        # Автор нужен для ключа кэша представления, рейтинг - для курсора
+        # при ?ordering=trending.
+        return queryset.only(*fieldset.columns(
+            ShowRecipeFullSerializer.FIELD_COLUMNS,
+            'author', 'trending_score'))
+
     def add_recipe(self, model, user, pk):
         """Метод для добавления"""
-        if model.objects.filter(user=user, recipe__id=pk).exists():
+        pk = recipe_pk(pk)
+        with transaction.atomic():
+            state = marks.add(model, user, [pk])[pk]
+        if state == marks.NOT_FOUND:
+            raise Http404
+        if state == marks.EXISTS:
             return Response({
-                'errors': 'Рецепт уже добавлен в список'
+                'errors': BATCH_ERRORS[state]
             }, status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = FavoriteSerializer(recipe)
+        serializer = MARK_SERIALIZERS[model](
+            model.objects.select_related('recipe').get(user=user, recipe=pk),
+            context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_recipe(self, model, user, pk):
         """Метод для удаления"""
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        pk = recipe_pk(pk)
+        with transaction.atomic():
+            state = marks.remove(model, user, [pk])[pk]
+        if state == marks.REMOVED:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({
-            'errors': 'Рецепт уже удален'
+            'errors': BATCH_ERRORS[state]
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    def mark_recipes(self, model, request):
+        """Пакетное добавление или удаление ``{"recipes": [1, 2]}``.
+        Возвращает результат для каждого рецепта."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(
+            serializer.validated_data['recipes']))
+        with transaction.atomic():
+            if request.method == 'POST':
+                states = marks.add(model, request.user, recipe_ids)
+            else:
+                states = marks.remove(model, request.user, recipe_ids)
+        results = []
+        for pk in recipe_ids:
+            result = {'id': pk, 'status': states[pk]}
+            if states[pk] in BATCH_ERRORS:
+                result['errors'] = BATCH_ERRORS[states[pk]]
+            results.append(result)
+        return Response({'results': results})
+
     @action(
         detail=True,
         methods=["POST", "DELETE"],
@@ -78,26 +203,126 @@ class RecipeViewSet(viewsets.ModelViewSet):
         else:
             return self.delete_recipe(ShoppingCart, request.user, pk)
 
+    @action(
+        detail=False,
+        methods=["POST", "DELETE"],
+        url_path="favorite",
+        url_name="favorite-batch",
+        permission_classes=[IsAuthenticated],
+    )
+    def favorite_batch(self, request):
+        """Пакетное добавление/удаление из избранного"""
+        return self.mark_recipes(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=["POST", "DELETE"],
+        url_path="shopping_cart",
+        url_name="shopping-cart-batch",
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart_batch(self, request):
+        """Пакетное добавление/удаление из продуктовой корзины"""
+        return self.mark_recipes(ShoppingCart, request)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        permission_classes=[IsAuthenticated],
+        pagination_class=RecipeCursorPagination,
+    )
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь.
+        Листается курсором ``?cursor=``."""
+        queryset = self.filter_queryset(self.select_columns(
+            timeline.feed(request.user).defer('search_vector')))
+
+        def respond():
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return self.list_response(queryset, respond)
+
+    @action(detail=True, methods=["GET"])
+    def similar(self, request, pk=None):
+        """Рецепты, которые часто добавляют в избранное вместе с этим.
+        Список заранее посчитан командой build_similar_recipes."""
+        recipes = list(self.select_columns(
+            Recipe.objects.defer('search_vector').filter(
+                similar_for__recipe_id=pk,
+            ).order_by('-similar_for__score')))
+        if not recipes:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        pagination_class=CustomPageNumberPaginator,
+    )
+    def cookable(self, request):
+        """Рецепты из имеющихся ингредиентов ?ingredients=1&ingredients=2.
+        Сортируются по доле имеющихся ингредиентов рецепта, к каждому
+        добавляются доля и недостающие ингредиенты."""
+        query = CookableQuerySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients')})
+        query.is_valid(raise_exception=True)
+        ingredient_ids = query.validated_data['ingredients']
+        page = self.paginate_queryset(
+            pantry.get_index().search(ingredient_ids))
+        recipes = self.select_columns(
+            Recipe.objects.defer('search_vector')).in_bulk(
+            [match.recipe_id for match in page])
+        # Рецепт мог быть удален после последнего обновления индекса.
+        page = [match for match in page if match.recipe_id in recipes]
+        fieldset = Fieldset(request)
+        if 'missing_ingredients' in fieldset:
+            missing = pantry.missing_ingredients(
+                list(recipes), ingredient_ids)
+        data = self.get_serializer(
+            [recipes[match.recipe_id] for match in page], many=True).data
+        for item, match in zip(data, page):
+            if 'coverage' in fieldset:
+                item['coverage'] = round(match.owned / match.total, 2)
+            if 'missing_ingredients' in fieldset:
+                item['missing_ingredients'] = IngredientSerializer(
+                    missing[match.recipe_id], many=True).data
+        return self.get_paginated_response(data)
+
     @action(
         detail=False,
         methods=["GET"],
         permission_classes=[IsAuthenticated],
         url_path="download_shopping_cart",
+        renderer_classes=(TextShoppingListRenderer, CSVShoppingListRenderer,
+                          PDFShoppingListRenderer),
+        content_negotiation_class=ShoppingListNegotiation,
     )
     def download_shopping_cart(self, request):
         """Метод для получения и скачивания
-        списка продуктов из продуктовой корзины"""
-        ingredients_list = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
+        списка продуктов из продуктовой корзины.
+        Формат выбирается параметром ?format=txt|csv|pdf или заголовком
+        Accept, для других форматов ответ 406."""
+        if not isinstance(request.accepted_renderer, ShoppingListRenderer):
+            raise NotAcceptable(
+                'Список покупок доступен в форматах: '
+                + ', '.join(renderer.format
+                            for renderer in self.get_renderers()))
+        ingredients_list = ShoppingCartIngredient.objects.filter(
+            user=request.user
         ).values(
             "ingredient__name",
-            "ingredient__measurement_unit"
-        ).annotate(amount=Sum("amount"))
-        return get_shopping_list(ingredients_list)
+            "ingredient__measurement_unit",
+            "amount",
+        ).order_by("ingredient__name")
+        return get_shopping_list(ingredients_list, request.accepted_renderer)
 
 
-class IngredientsViewSet(viewsets.ModelViewSet):
+class IngredientsViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
     """Вьюсет для модели ингридиента"""
+    catalog_version = 'ingredients'
     pagination_class = None
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -107,8 +332,9 @@ class IngredientsViewSet(viewsets.ModelViewSet):
     search_fields = ("^name",)
 
 
-class TagsViewSet(viewsets.ModelViewSet):
+class TagsViewSet(CachedCatalogMixin, viewsets.ModelViewSet):
     """Вьюсет для модели тега"""
+    catalog_version = 'tags'
     pagination_class = None
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -31,6 +31,12 @@ class User(AbstractUser):
     email = models.EmailField('E-mail',
                               unique=True,
                               max_length=254)
+    recipes_count = models.PositiveIntegerField('Рецептов',
+                                                default=0,
+                                                editable=False)
+    subscribers_count = models.PositiveIntegerField('Подписчиков',
+                                                    default=0,
+                                                    editable=False)
 
     @property
     def is_admin(self):
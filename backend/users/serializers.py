@@ -1,7 +1,11 @@
+from collections import defaultdict
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db.models import Manager
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from recipes.fields import ImageVariantsField
+from recipes.fieldsets import SparseFieldsetMixin
 from recipes.models import Recipe
 from rest_framework import serializers
 
@@ -29,6 +33,8 @@ class CustomUserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         """ Метод обработки параметра is_subscribed"""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         return (user.is_authenticated
                 and Subscribe.objects.filter(user=user, author=obj).exists())
@@ -63,13 +69,33 @@ class SubscribeUserSerializer(serializers.ModelSerializer):
 
 class SubscribingRecipesSerializers(serializers.ModelSerializer):
     """Сериализатор списка рецептов подписанных авторов"""
+    images = ImageVariantsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+
+class SubscribeListSerializer(serializers.ListSerializer):
+    """Список подписок: рецепты всех авторов страницы одним запросом"""
 
+    def to_representation(self, data):
+        authors = list(data.all() if isinstance(data, Manager) else data)
+        if authors and 'recipes' in self.child.fields:
+            limit = self.child.get_recipes_limit()
+            recipes = defaultdict(list)
+            for recipe in Recipe.objects.latest_per_author(
+                    [author.pk for author in authors], limit):
+                recipes[recipe.author_id].append(recipe)
+            for author in authors:
+                author.latest_recipes = recipes[author.pk]
+        return [self.child.to_representation(author) for author in authors]
 
-class SubscribeViewSerializer(serializers.ModelSerializer):
-    """Сериализатор подписок"""
+
+class SubscribeViewSerializer(SparseFieldsetMixin,
+                              serializers.ModelSerializer):
+    """Сериализатор подписок. Поля выбираются параметрами ``?fields=``
+    и ``?omit=`` (см. recipes.fieldsets)."""
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
@@ -79,22 +105,42 @@ class SubscribeViewSerializer(serializers.ModelSerializer):
         fields = ('id', 'email', 'username', 'first_name', 'last_name',
                   'is_subscribed', 'recipes', 'recipes_count')
         read_only_fields = fields
+        list_serializer_class = SubscribeListSerializer
+
+    # Столбцы пользователя, которые читают поля представления.
+    FIELD_COLUMNS = {
+        'email': ('email',),
+        'username': ('username',),
+        'first_name': ('first_name',),
+        'last_name': ('last_name',),
+        'recipes_count': ('recipes_count',),
+    }
 
     def get_is_subscribed(self, obj):
         """ Метод обработки параметра is_subscribed"""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return (self.context.get('request').user.is_authenticated
                 and Subscribe.objects.filter(author=obj, user=self.context['request'].user).exists())
 
+    def get_recipes_limit(self):
+        """Число рецептов автора из параметра ``recipes_limit``.
+        Нечисловое значение игнорируется, отрицательное считается нулем.
+        """
+        try:
+            limit = int(self.context['request'].GET['recipes_limit'])
+        except (KeyError, ValueError):
+            return settings.RECIPES_LIMIT
+        return max(limit, 0)
+
     def get_recipes(self, obj):
         """Метод получения данных рецептов автора"""
-        recipes_limit = int(self.context['request'].GET.get(
-            'recipes_limit', settings.RECIPES_LIMIT))
-        user = get_object_or_404(User, pk=obj.pk)
-        recipes = Recipe.objects.filter(author=user)[:recipes_limit]
-
-        return SubscribingRecipesSerializers(recipes, many=True).data
+        recipes = getattr(obj, 'latest_recipes', None)
+        if recipes is None:
+            recipes = obj.user_recipes.all()[:self.get_recipes_limit()]
+        return SubscribingRecipesSerializers(
+            recipes, many=True, context=self.context).data
 
     def get_recipes_count(self, obj):
         """Метод подсчета количества рецептов автора."""
-        user = get_object_or_404(User, pk=obj.pk)
-        return Recipe.objects.filter(author=user).count()
+        return obj.recipes_count
@@ -0,0 +1,45 @@
+from django.test import TestCase
+
+from recipes.models import Recipe
+from recipes.tests.base import client_for, create_user
+from users.models import Subscribe
+
+
+class CounterTests(TestCase):
+    """Денормализованные счетчики пользователя."""
+
+    def setUp(self):
+        self.author, self.user, self.other = (
+            create_user(name) for name in ('author', 'user', 'other'))
+
+    def assertCounters(self, user):
+        user.refresh_from_db()
+        self.assertEqual(
+            user.recipes_count, Recipe.objects.filter(author=user).count())
+        self.assertEqual(
+            user.subscribers_count,
+            Subscribe.objects.filter(author=user).count())
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            author=self.author, name=name, text=name, cooking_time=10,
+            image='recipes/images/recipe.png')
+
+    def test_recipes_count(self):
+        recipes = [self.create_recipe(name) for name in ('Суп', 'Каша')]
+        self.assertCounters(self.author)
+        recipes[0].delete()
+        self.assertCounters(self.author)
+
+    def test_subscribers_count(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        clients = {user: client_for(user) for user in (self.user, self.other)}
+        for client in clients.values():
+            self.assertEqual(client.post(url).status_code, 201)
+            self.assertCounters(self.author)
+        self.assertEqual(clients[self.user].delete(url).status_code, 204)
+        self.assertEqual(clients[self.user].delete(url).status_code, 404)
+        self.assertCounters(self.author)
+        self.other.delete()
+        self.assertCounters(self.author)
+        self.assertEqual(self.author.subscribers_count, 0)
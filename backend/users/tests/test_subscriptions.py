@@ -0,0 +1,87 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Recipe
+from recipes.tests.base import client_for, create_user
+from users.models import Subscribe
+
+URL = '/api/users/subscriptions/'
+
+
+class SubscriptionTestCase(TestCase):
+    """Пользователь, подписанный на автора с тремя рецептами."""
+
+    def setUp(self):
+        self.author, self.user = (
+            create_user(name) for name in ('author', 'user'))
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.author, name=name, text=name, cooking_time=10,
+                image='recipes/images/recipe.png')
+            for name in ('Суп', 'Каша', 'Блины')]
+        Subscribe.objects.create(user=self.user, author=self.author)
+        self.client = client_for(self.user)
+
+
+class SubscriptionListTests(SubscriptionTestCase):
+    """Список подписок и параметр ``recipes_limit``."""
+
+    def recipe_ids(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id']
+                for recipe in response.json()['results'][0]['recipes']]
+
+    def test_limit(self):
+        newest = [recipe.pk for recipe in reversed(self.recipes)]
+        self.assertEqual(self.recipe_ids(), newest)
+        self.assertEqual(self.recipe_ids(recipes_limit=2), newest[:2])
+        self.assertEqual(self.recipe_ids(recipes_limit=0), [])
+
+    def test_invalid_limit(self):
+        newest = [recipe.pk for recipe in reversed(self.recipes)]
+        for value in ('abc', '', '1.5'):
+            self.assertEqual(self.recipe_ids(recipes_limit=value), newest)
+        self.assertEqual(self.recipe_ids(recipes_limit=-1), [])
+
+    def test_subscribe_with_limit(self):
+        other = create_user('other')
+        for value, count in (('abc', 3), ('-5', 0), ('1', 1)):
+            response = client_for(other).post(
+                f'/api/users/{self.author.pk}/subscribe/?recipes_limit='
+                f'{value}')
+            self.assertEqual(response.status_code, 201, value)
+            self.assertEqual(len(response.json()['recipes']), count)
+            Subscribe.objects.filter(user=other).delete()
+
+
+class SubscriptionFieldsetTests(SubscriptionTestCase):
+    """Выбор полей списка подписок параметрами ``?fields=`` и ``?omit=``."""
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0], [
+            query['sql'] for query in queries.captured_queries]
+
+    def test_fields(self):
+        author, _ = self.get(fields='id, recipes_count,unknown')
+        self.assertEqual(author, {'id': self.author.pk, 'recipes_count': 3})
+        author, _ = self.get(omit='recipes,email')
+        self.assertEqual(set(author), {
+            'id', 'username', 'first_name', 'last_name', 'is_subscribed',
+            'recipes_count'})
+
+    def test_only_selected_columns(self):
+        _, queries = self.get(fields='id,username')
+        users, = [sql for sql in queries if 'FROM "users_user"' in sql
+                  and 'INNER JOIN "users_subscribe"' in sql
+                  and 'COUNT' not in sql]
+        self.assertIn('"users_user"."username"', users)
+        self.assertNotIn('"users_user"."email"', users)
+        self.assertNotIn('"users_user"."password"', users)
+        # Рецепты авторов не запрашиваются без поля recipes.
+        self.assertFalse(
+            [sql for sql in queries if 'FROM "recipes_recipe"' in sql])
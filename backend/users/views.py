@@ -1,4 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import BooleanField, Value
+from recipes.fieldsets import Fieldset
 from rest_framework import generics, permissions, status
 from rest_framework.generics import get_object_or_404
 from rest_framework.pagination import PageNumberPagination
@@ -21,7 +24,9 @@ class SubscribeApiView(APIView):
         author = get_object_or_404(User, pk=pk)
         user = request.user
         obj = Subscribe(author=author, user=user)
-        obj.save()
+        with transaction.atomic():
+            obj.save()
+        author.is_subscribed = True
 
         serializer = SubscribeViewSerializer(
             author, context={'request': request})
@@ -52,5 +57,16 @@ class ListSubscribeViewSet(generics.ListAPIView):
     pagination_class = PageNumberPagination
 
     def get_queryset(self):
+        """Авторы, на которых подписан пользователь. Рецепты авторов
+        страницы загружает SubscribeListSerializer. С ``?fields=`` или
+        ``?omit=`` читаются только столбцы выбранных полей.
+        """
         user = self.request.user
-        return User.objects.filter(subscribing__user=user)
+        queryset = User.objects.filter(subscribing__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
+        fieldset = Fieldset(self.request)
+        if fieldset.sparse:
+            queryset = queryset.only(*fieldset.columns(
+                SubscribeViewSerializer.FIELD_COLUMNS, 'id'))
+        return queryset